@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_compile
+
+    Compares the compilation of the ``.po`` files of a locale tree one after
+    the other, as ``pybabel compile`` does, to `compile_parallel` on a cold
+    tree, which validates them too, and on a tree whose ``.mo`` files are
+    all up to date.
+
+    The parallel compilation only gains with several CPUs. Run it from the
+    root of the repository::
+
+        $ python benchmarks/bench_compile.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import cpu_count
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from babel.messages.catalog import Catalog
+from babel.messages.mofile import write_mo
+from babel.messages.pofile import read_po, write_po
+
+from tornadobabel.frontend import compile_parallel, iter_po_files
+
+from suite import LOCALES, message, plural
+
+
+def make_po_tree(directory, locales, domains, messages):
+    """Writes a ``.po`` file of `messages` singular and `messages` / 10
+    plural messages for each domain of each of the `locales`.
+    """
+    for lang in locales:
+        messages_dir = os.path.join(directory, lang, 'LC_MESSAGES')
+        os.makedirs(messages_dir)
+        catalog = Catalog(locale=lang, fuzzy=False)
+        for index in xrange(messages):
+            catalog.add(message(index), u'Traduction %d' % index)
+        for index in xrange(messages // 10):
+            catalog.add(plural(index), [
+                u'%%(num)d pomme %d' % index
+            ] * catalog.num_plurals)
+        for domain in domains:
+            filename = os.path.join(messages_dir, domain + '.po')
+            with open(filename, 'wb') as fileobj:
+                write_po(fileobj, catalog)
+
+
+def serial(directory):
+    for lang, domain, po_path in iter_po_files(directory):
+        with open(po_path, 'rb') as fileobj:
+            catalog = read_po(fileobj, lang, domain)
+        with open(po_path[:-3] + '.mo', 'wb') as fileobj:
+            write_mo(fileobj, catalog)
+
+
+def main(locales=10, domains=4, messages=2000, repeat=3):
+    directory = tempfile.mkdtemp()
+    try:
+        make_po_tree(directory, LOCALES[:locales],
+                     ['domain%d' % index for index in xrange(domains)],
+                     messages)
+        files = locales * domains
+        print "%d files of %d messages, %d CPUs" % (
+            files, messages + messages // 10, cpu_count()
+        )
+        for name, func in (
+                ('serial', lambda: serial(directory)),
+                ('parallel', lambda: compile_parallel(directory, force=True)),
+                ('up to date', lambda: compile_parallel(directory))):
+            elapsed = []
+            for _ in xrange(repeat):
+                started = time.time()
+                func()
+                elapsed.append(time.time() - started)
+            print "%-10s %8.3f s, %6.2f ms/file" % (
+                name, min(elapsed), min(elapsed) / files * 1e3
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
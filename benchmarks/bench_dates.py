@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_dates
+
+    Compares formatting a column of datetimes with `babel.dates`, which
+    parses the pattern of the format on every call, and with the patterns
+    cached on the `Locale`.
+
+    Run it from the root of the repository::
+
+        $ python benchmarks/bench_dates.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import sys
+import os
+import timeit
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from babel import dates
+from tornadobabel.locale import Locale
+
+
+def main(number=20, rows=1000):
+    locale = Locale.parse('fr_FR')
+    start = datetime(2012, 1, 1)
+    column = [start + timedelta(minutes=7 * row) for row in xrange(rows)]
+    cases = (
+        ('babel', lambda: [
+            dates.format_datetime(value, 'medium', locale=locale)
+            for value in column
+        ]),
+        ('cached', lambda: [
+            locale.format_datetime(value, 'medium') for value in column
+        ]),
+        ('batch', lambda: locale.format_datetimes(column, 'medium')),
+    )
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print "%-8s %8.3f us/value" % (
+            name, elapsed / (number * rows) * 1e6
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_domains
+
+    Compares loading many domains for a language by merging them into a
+    single catalog, as `load_gettext_translations` used to, and by keeping
+    them apart in a `DomainCatalog`, added in place or to a copy of the
+    catalog as a registry does, and the cost of a lookup in each.
+
+    Run it from the root of the repository::
+
+        $ python benchmarks/bench_domains.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from babel.messages.catalog import Catalog
+from babel.messages.mofile import write_mo
+from babel.support import Translations
+
+from tornadobabel.catalog import CompiledCatalog, DomainCatalog
+
+
+def make_domains(directory, domains, messages):
+    messages_dir = os.path.join(directory, 'fr_FR', 'LC_MESSAGES')
+    os.makedirs(messages_dir)
+    for domain in domains:
+        catalog = Catalog(locale='fr_FR', domain=domain)
+        for index in xrange(messages):
+            catalog.add(
+                u'%s %d' % (domain, index), u'%s fr %d' % (domain, index)
+            )
+        with open(os.path.join(messages_dir, domain + '.mo'), 'wb') as mo:
+            write_mo(mo, catalog)
+
+
+def main(count=40, messages=5000):
+    directory = tempfile.mkdtemp()
+    domains = ['plugin%02d' % index for index in xrange(count)]
+    try:
+        make_domains(directory, domains, messages)
+        catalogs = [
+            Translations.load(directory, ['fr_FR'], domain)
+            for domain in domains
+        ]
+
+        def merged():
+            translations = Translations.load(directory, ['fr_FR'], domains[0])
+            for domain in domains[1:]:
+                translations.merge(
+                    Translations.load(directory, ['fr_FR'], domain)
+                )
+            return translations
+
+        def separate():
+            translations = DomainCatalog()
+            for domain in domains:
+                translations.add(
+                    domain, Translations.load(directory, ['fr_FR'], domain)
+                )
+            return translations
+
+        def merge_only():
+            translations = catalogs[0]
+            for catalog in catalogs[1:]:
+                translations.merge(catalog)
+
+        def add_only():
+            translations = DomainCatalog()
+            for domain, catalog in zip(domains, catalogs):
+                translations.add(domain, catalog)
+
+        def copy_on_write():
+            # As a registry adds a domain to a copy of the catalog in use
+            translations = DomainCatalog()
+            for domain, catalog in zip(domains, catalogs):
+                translations = translations.copy()
+                translations.add(domain, catalog)
+            return translations
+
+        for name, func in (('merged', merged), ('separate', separate),
+                           ('merge only', merge_only),
+                           ('add only', add_only),
+                           ('copy', copy_on_write)):
+            elapsed = min(timeit.repeat(func, number=3, repeat=3)) / 3
+            print "load %-10s %8.2f ms for %d domains" % (
+                name, elapsed * 1e3, count
+            )
+
+        lookups = [u'%s %d' % (domain, 7) for domain in domains]
+        lookups.append(u'Missing')
+        for name, translations in (
+                ('merged', merged()), ('separate', separate()),
+                ('copy', copy_on_write()),
+                ('compiled', CompiledCatalog(separate()))):
+            elapsed = min(timeit.repeat(
+                lambda: [translations.ugettext(msg) for msg in lookups],
+                number=2000, repeat=3
+            ))
+            print "lookup %-8s %8.3f us/message" % (
+                name, elapsed / (2000 * len(lookups)) * 1e6
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_gettext
+
+    Compares the time and the objects allocated per ``_()`` call of
+    `TornadoBabelMixin` before and after the gettext function was cached
+    per request and the lazy strings memoised.
+
+    Run it from the root of the repository::
+
+        $ python benchmarks/bench_gettext.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import gc
+import sys
+import os
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tornadobabel import locale
+from tornadobabel.mixin import TornadoBabelMixin, make_lazy_gettext
+
+LOCALES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'locales'
+)
+
+
+class Handler(TornadoBabelMixin):
+    def __init__(self, locale):
+        self.locale = locale
+
+
+class EagerHandler(Handler):
+    lazy_gettext = False
+
+
+def legacy_call(handler):
+    """The `_` property and lazy strings before the change"""
+    string = make_lazy_gettext(lambda: handler.locale.translate)('Welcome')
+    unicode(string), unicode(string)
+    return string
+
+
+def cached_call(handler):
+    string = handler._('Welcome')
+    unicode(string), unicode(string)
+    return string
+
+
+def allocations(func, handler, number=1000):
+    """Returns the number of objects tracked by the garbage collector which
+    are allocated by a call, the results being kept alive.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        before = len(gc.get_objects())
+        results = [func(handler) for _ in xrange(number)]
+        after = len(gc.get_objects())
+    finally:
+        gc.enable()
+    del results
+    return float(after - before - 1) / number
+
+
+def main(number=20000):
+    locale.load_gettext_translations(LOCALES_DIR, 'messages')
+    fr_FR = locale.get('fr_FR')
+    cases = (
+        ('legacy', legacy_call, Handler),
+        ('memoized', cached_call, Handler),
+        ('eager', cached_call, EagerHandler),
+    )
+    for name, func, handler_class in cases:
+        handler = handler_class(fr_FR)
+        elapsed = min(timeit.repeat(
+            lambda: func(handler), number=number, repeat=3
+        ))
+        print "%-8s %8.3f us/call %6.2f objects/call" % (
+            name, elapsed / number * 1e6, allocations(func, handler)
+        )
+
+
+if __name__ == '__main__':
+    main()
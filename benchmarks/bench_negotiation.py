@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_negotiation
+
+    Compares the negotiation of the locale of Accept-Language headers as
+    real world browsers send them, by the parser splitting the header and
+    sorting its ranges with a key function, as `negotiate` used to, and by
+    the RFC 4647 lookup with the precompiled parser, with and without the
+    negotiation cache.
+
+    Run it from the root of the repository::
+
+        $ python benchmarks/bench_negotiation.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tornadobabel import locale
+from tornadobabel.catalog import DomainCatalog
+
+from bench_resolution import SUPPORTED
+
+
+#: Accept-Language headers of real world browsers and clients
+HEADERS = [
+    'en-US,en;q=0.9',
+    'en-US,en;q=0.5',
+    'en-GB,en-US;q=0.9,en;q=0.8',
+    'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
+    'fr-CA,fr;q=0.9,en-CA;q=0.8,en;q=0.7',
+    'de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7',
+    'de-CH,de;q=0.9,fr;q=0.8,it;q=0.7,en;q=0.6',
+    'es-419,es;q=0.9',
+    'es-ES,es;q=0.8,en-US;q=0.5,en;q=0.3',
+    'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+    'it-IT,it;q=0.8,en-US;q=0.6,en;q=0.4',
+    'ja,en-US;q=0.9,en;q=0.8',
+    'ja-JP',
+    'zh-CN,zh;q=0.9',
+    'zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7',
+    'ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7',
+    'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+    'nl-NL, nl;q=0.9, en;q=0.5, *;q=0.1',
+    'pl,en-US;q=0.7,en;q=0.3',
+    'tr-TR,tr;q=0.8,en-US;q=0.5,en;q=0.3',
+    'sv-SE,sv;q=0.8,en-US;q=0.5,en;q=0.3',
+    'da, en-gb;q=0.8, en;q=0.7',
+    'en',
+    '*',
+]
+
+
+def legacy_parse(header):
+    """The parser `negotiate` used before the RFC 4647 lookup"""
+    locales = []
+    for language in header.split(","):
+        parts = language.strip().split(";")
+        if len(parts) > 1 and parts[1].startswith("q="):
+            try:
+                score = float(parts[1][2:])
+            except (ValueError, TypeError):
+                score = 0.0
+        else:
+            score = 1.0
+        locales.append((parts[0], score))
+    locales.sort(key=lambda (l, s): s, reverse=True)
+    return [l[0] for l in locales]
+
+
+def main(number=300, repeat=30):
+    registry = locale.LocaleRegistry()
+    with registry._lock:
+        registry._publish(dict(
+            (code, DomainCatalog()) for code in SUPPORTED
+        ))
+
+    def legacy():
+        for header in HEADERS:
+            codes = legacy_parse(header)
+            if codes:
+                registry.get_closest(*codes)
+
+    def parse():
+        for header in HEADERS:
+            legacy_parse(header)
+
+    def parse_ranges():
+        for header in HEADERS:
+            locale.parse_accept_language(header)
+
+    def lookup():
+        for header in HEADERS:
+            registry._lookup(header)
+
+    def cached():
+        for header in HEADERS:
+            registry.negotiate(header)
+
+    headers = number * len(HEADERS)
+    for name, func in (('legacy parse', parse), ('parse', parse_ranges),
+                       ('legacy', legacy), ('lookup', lookup),
+                       ('cached', cached)):
+        elapsed = min(timeit.repeat(func, number=number, repeat=repeat))
+        print "%-12s %8.3f us/header" % (name, elapsed / headers * 1e6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_numbers
+
+    Compares formatting a column of amounts with `babel.numbers`, which
+    parses the number pattern on every call, and with the patterns cached
+    on the `Locale`.
+
+    Run it from the root of the repository::
+
+        $ python benchmarks/bench_numbers.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import sys
+import os
+import timeit
+from array import array
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from babel import numbers
+from tornadobabel.locale import Locale
+
+
+def main(number=20, rows=1000):
+    locale = Locale.parse('de_DE')
+    column = array('d', (row * 12.34 for row in xrange(rows)))
+    cases = (
+        ('babel', lambda: [
+            numbers.format_currency(value, 'EUR', locale=locale)
+            for value in column
+        ]),
+        ('cached', lambda: [
+            locale.format_currency(value, 'EUR') for value in column
+        ]),
+        ('batch', lambda: locale.format_currencies(column, 'EUR')),
+    )
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print "%-8s %8.3f us/value" % (
+            name, elapsed / (number * rows) * 1e6
+        )
+
+
+if __name__ == '__main__':
+    main()
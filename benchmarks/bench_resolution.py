@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_resolution
+
+    Compares the locale code resolution done by `Locale.get_closest` before
+    and after the resolution index was introduced.
+
+    Run it from the root of the repository::
+
+        $ python benchmarks/bench_resolution.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import sys
+import os
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tornadobabel.locale import build_resolution_index, resolve_locale_code
+
+
+SUPPORTED = frozenset([
+    'en_US', 'en_GB', 'fr_FR', 'fr_CA', 'de_DE', 'es_ES', 'es_MX', 'it_IT',
+    'pt_BR', 'pt_PT', 'nl_NL', 'sv_SE', 'da_DK', 'fi_FI', 'nb_NO', 'pl_PL',
+    'cs_CZ', 'ru_RU', 'uk_UA', 'tr_TR', 'el_GR', 'he_IL', 'ar_SA', 'hi_IN',
+    'ja_JP', 'ko_KR', 'zh_CN', 'zh_TW', 'th_TH', 'vi_VN', 'id_ID', 'ms_MY',
+    'ro_RO', 'hu_HU', 'bg_BG', 'hr_HR', 'sk_SK', 'sl_SI', 'lt_LT', 'lv_LV',
+    'fr', 'de', 'es', 'pt', 'en',
+])
+
+#: Candidate codes as they appear in real world Accept-Language headers
+CORPUS = [
+    'en-US', 'en', 'en-GB', 'fr-FR', 'fr', 'de-DE', 'de', 'es-ES', 'es-419',
+    'es', 'pt-BR', 'pt', 'it-IT', 'it', 'nl', 'ja', 'ja-JP', 'zh-CN', 'zh',
+    'zh-TW', 'zh-Hant-TW', 'ko-KR', 'ko', 'ru-RU', 'ru', 'pl', 'tr-TR',
+    'sv-SE', 'da', 'nb', 'fi', 'en-us', 'EN-US', 'fr-ca', 'de-AT', 'de-CH',
+    'en-IN', 'en-AU', 'xx-YY', '*',
+]
+
+
+def legacy_resolve(code, supported):
+    """The resolution done by `Locale.get_closest` before the index"""
+    code = code.replace("-", "_")
+    parts = code.split("_")
+    if len(parts) > 2:
+        return None
+    elif len(parts) == 2:
+        code = parts[0].lower() + "_" + parts[1].upper()
+    if code in supported:
+        return code
+    if parts[0].lower() in supported:
+        return parts[0].lower()
+    return None
+
+
+def main(number=2000):
+    index = build_resolution_index(SUPPORTED)
+
+    def legacy():
+        for code in CORPUS:
+            legacy_resolve(code, SUPPORTED)
+
+    def indexed():
+        for code in CORPUS:
+            resolve_locale_code(code, index)
+
+    lookups = number * len(CORPUS)
+    for name, func in (('legacy', legacy), ('indexed', indexed)):
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print "%-8s %8.3f us/lookup" % (name, elapsed / lookups * 1e6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_store
+
+    Compares the memory private to each forked worker process, once it has
+    translated every message, when the catalogs are parsed by babel before
+    the fork and when they are looked up in a shared catalog store. Also
+    compares the time taken to load the catalogs and the time of a lookup
+    in both, and the time of a lookup in a store catalog against a
+    `DictCatalog` of the same messages.
+
+    Linux only, as the memory is read from ``/proc``. Run it from the root
+    of the repository::
+
+        $ python benchmarks/bench_store.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tornadobabel import locale
+from tornadobabel.catalog import DictCatalog
+from tornadobabel.store import CatalogStore, build_store
+
+from suite import LOCALES, make_locale_tree, message
+
+
+def private_memory():
+    """Returns the private memory of the process in kB"""
+    total = 0
+    with open('/proc/self/smaps') as smaps:
+        for line in smaps:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1])
+    return total
+
+
+def worker(langs, messages, pipe):
+    before = private_memory()
+    for lang in langs:
+        translate = locale.get(lang).translate
+        for index in xrange(messages):
+            translate(message(index))
+    os.write(pipe, '%d\n' % (private_memory() - before))
+    os._exit(0)
+
+
+def fork_workers(langs, messages, workers=4):
+    """Returns the private memory grown by each of the forked workers"""
+    read, write = os.pipe()
+    for _ in xrange(workers):
+        if os.fork() == 0:
+            os.close(read)
+            worker(langs, messages, write)
+    os.close(write)
+    for _ in xrange(workers):
+        os.wait()
+    with os.fdopen(read) as pipe:
+        return [int(line) for line in pipe]
+
+
+def time_lookups(translations, sample, number=20):
+    """Returns the time of a ``ugettext`` of the catalog in us"""
+    ugettext = translations.ugettext
+    elapsed = min(timeit.repeat(
+        lambda: [ugettext(msgid) for msgid in sample],
+        number=number, repeat=3
+    ))
+    return elapsed / (number * len(sample)) * 1e6
+
+
+def main(languages=10, messages=10000):
+    directory = tempfile.mkdtemp()
+    langs = LOCALES[:languages]
+    try:
+        make_locale_tree(directory, langs, messages)
+        path = os.path.join(directory, 'catalogs.store')
+        build_store(directory, path)
+
+        sample = [message(index) for index in xrange(0, messages, 7)]
+        for mode in ('parsed', 'store'):
+            started = time.time()
+            if mode == 'store':
+                locale.load_catalog_store(path)
+            else:
+                locale.load_gettext_translations(directory, 'messages')
+            loaded = time.time() - started
+            grown = fork_workers(langs, messages)
+            translate = locale.get(langs[0]).translate
+            elapsed = min(timeit.repeat(
+                lambda: [translate(msgid) for msgid in sample],
+                number=20, repeat=3
+            ))
+            print "%-7s %8.3f s load %8d kB private per worker " \
+                "%8.3f us/lookup" % (
+                    mode, loaded, sum(grown) / len(grown),
+                    elapsed / (20 * len(sample)) * 1e6
+                )
+
+        # The lookup alone, without the Locale and the catalogs of the
+        # domains around it
+        store = CatalogStore(path)
+        try:
+            catalog = store.catalog(langs[0]).catalogs[0][2]
+            for name, translations in (
+                    ('dict', DictCatalog(dict(catalog.iteritems()))),
+                    ('store', catalog)):
+                print "%-7s %8.3f us/ugettext" % (
+                    name, time_lookups(translations, sample)
+                )
+        finally:
+            store.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
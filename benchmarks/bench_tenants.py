@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_tenants
+
+    Compares the memory taken by many tenants overriding a few messages of
+    the same catalogs, when each tenant loads the catalogs into a registry
+    of its own (leaving its few overrides out) and when its overrides are
+    laid over the catalogs of a shared registry with an `OverlayRegistry`.
+    Also compares the time of a lookup in both.
+
+    Linux only, as the memory is read from ``/proc``. Run it from the root
+    of the repository::
+
+        $ python benchmarks/bench_tenants.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tornadobabel import locale
+
+from suite import LOCALES, make_locale_tree, message
+
+
+def resident_memory():
+    """Returns the resident memory of the process in kB"""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+def overrides(tenant, count):
+    return dict(
+        (message(index), u'%s %d' % (tenant, index))
+        for index in xrange(count)
+    )
+
+
+def copies(directory, langs, tenants, count):
+    registries = []
+    for tenant in xrange(tenants):
+        registry = locale.LocaleRegistry()
+        registry.load_gettext_translations(directory, 'messages')
+        for lang in langs:
+            registry.get(lang)
+        registries.append(registry)
+    return registries
+
+
+def overlays(directory, langs, tenants, count):
+    base = locale.LocaleRegistry()
+    base.load_gettext_translations(directory, 'messages')
+    registries = []
+    for tenant in xrange(tenants):
+        registry = locale.OverlayRegistry(base)
+        for lang in langs:
+            registry.add_messages(lang, overrides(tenant, count))
+            registry.get(lang)
+        registries.append(registry)
+    return registries
+
+
+def measure(func, *args):
+    """Returns the resident memory grown by a call, made in a forked
+    process so that the measures do not disturb each other.
+    """
+    read, write = os.pipe()
+    if os.fork() == 0:
+        os.close(read)
+        gc.collect()
+        before = resident_memory()
+        kept = func(*args)
+        gc.collect()
+        os.write(write, '%d\n' % (resident_memory() - before))
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as pipe:
+        grown = int(pipe.read())
+    os.wait()
+    return grown
+
+
+def main(langs=10, messages=2000, tenants=50, count=10):
+    langs = LOCALES[:langs]
+    directory = tempfile.mkdtemp()
+    try:
+        make_locale_tree(directory, langs, messages)
+        lookups = [message(index) for index in xrange(0, 40, 2)]
+        for name, func in (('copies', copies), ('overlays', overlays)):
+            grown = measure(func, directory, langs, tenants, count)
+            print "%-8s %8d kB for %d tenants" % (name, grown, tenants)
+
+            translate = func(directory, langs, 1, count)[0].get(
+                langs[0]
+            ).translate
+            elapsed = min(timeit.repeat(
+                lambda: [translate(msg) for msg in lookups],
+                number=2000, repeat=3
+            ))
+            print "lookup %-8s %6.3f us/message" % (
+                name, elapsed / (2000 * len(lookups)) * 1e6
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_translate_many
+
+    Compares translating the strings of a page with a loop over
+    `Locale.translate` and with a single `Locale.translate_many` call,
+    with a catalog merged from two domains and its compiled version.
+
+    Run it from the root of the repository::
+
+        $ python benchmarks/bench_translate_many.py
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import sys
+import os
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from babel.support import Translations
+from tornadobabel import locale
+from tornadobabel.catalog import CompiledCatalog
+
+LOCALES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'locales'
+)
+
+
+def main(number=200, size=500):
+    translations = Translations.load(LOCALES_DIR, ['fr_FR'], 'messages')
+    translations.add(Translations.load(LOCALES_DIR, ['fr_FR'], 'addit'))
+    # Most of the strings of a page are missing from the first catalog
+    messages = (['Welcome', 'Goodbye'] + [
+        'Option %d' % index for index in xrange(size)
+    ]) * 2
+    fr_FR = locale.Locale.parse('fr_FR')
+    for name, catalog in (('babel', translations),
+                          ('compiled', CompiledCatalog(translations))):
+        fr_FR.translations = catalog
+        cases = (
+            ('loop', lambda: [
+                fr_FR.translate(message) for message in messages
+            ]),
+            ('many', lambda: fr_FR.translate_many(messages)),
+        )
+        for case, func in cases:
+            elapsed = min(timeit.repeat(func, number=number, repeat=3))
+            print "%-8s %-4s %8.3f us/message" % (
+                name, case, elapsed / (number * len(messages)) * 1e6
+            )
+
+
+if __name__ == '__main__':
+    main()
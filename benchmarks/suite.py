@@ -0,0 +1,546 @@
+# -*- coding: utf-8 -*-
+"""
+    suite
+
+    Benchmark suite of the hot paths of tornadobabel: locale resolution,
+    Accept-Language negotiation, translation, lazy strings, page renders,
+    catalog loading and message extraction.
+
+    Everything runs offline on synthetic data generated in a temporary
+    directory, and the results are written as JSON so that the results of
+    two releases could be compared::
+
+        $ python benchmarks/suite.py -o before.json
+        $ python benchmarks/suite.py -o after.json --compare before.json
+
+    With ``--compare``, the command exits with status 1 if any benchmark is
+    slower than in the baseline by more than the ``--threshold``.
+
+    The benchmarks of the features a release does not have are skipped, so
+    that the suite could be copied into an older release to produce its
+    baseline.
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from optparse import OptionParser
+from StringIO import StringIO
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import babel
+import tornado
+from babel.messages.catalog import Catalog
+from babel.messages.extract import DEFAULT_KEYWORDS
+from babel.messages.mofile import write_mo
+from tornado import template, testing, web
+
+from tornadobabel import locale
+from tornadobabel.extract import extract_tornado
+from tornadobabel.mixin import TornadoBabelMixin
+try:
+    from tornadobabel.template import TranslatingLoader
+except ImportError:
+    # An older release, without pre-translated templates
+    TranslatingLoader = None
+
+#: Version of the format of the results
+FORMAT_VERSION = 1
+
+#: Locales of the synthetic locale tree, real ones so that babel has data
+LOCALES = [
+    'fr_FR', 'de_DE', 'es_ES', 'it_IT', 'pt_BR', 'pt_PT', 'nl_NL', 'sv_SE',
+    'da_DK', 'fi_FI', 'nb_NO', 'pl_PL', 'cs_CZ', 'ru_RU', 'uk_UA', 'tr_TR',
+    'el_GR', 'he_IL', 'ar_SA', 'hi_IN', 'ja_JP', 'ko_KR', 'zh_CN', 'zh_TW',
+    'th_TH', 'vi_VN', 'id_ID', 'ro_RO', 'hu_HU', 'bg_BG',
+]
+
+#: Candidate codes as they appear in real world Accept-Language headers
+CODES = [
+    'en-US', 'en', 'en-GB', 'fr-FR', 'fr', 'de-DE', 'de', 'es-ES', 'es-419',
+    'pt-BR', 'pt', 'it-IT', 'nl', 'ja', 'ja-JP', 'zh-CN', 'zh-TW', 'ko-KR',
+    'ru-RU', 'pl', 'tr-TR', 'sv-SE', 'da', 'EN-US', 'fr-ca', 'de-AT',
+    'xx-YY', '*',
+]
+
+HEADERS = [
+    'en-US,en;q=0.9',
+    'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
+    'de-DE,de;q=0.9,en;q=0.8',
+    'es-419,es;q=0.9',
+    'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+    'ja,en-US;q=0.9,en;q=0.8',
+    'zh-CN,zh;q=0.9',
+    'nl-NL, nl;q=0.9, en;q=0.5, *;q=0.1',
+    'xx-YY;q=0.5, *',
+    '',
+]
+
+PAGE_TEMPLATE = '''<html><head><title>{{ _("Message 0") }}</title></head>
+<body>
+{%% for index in xrange(%(rows)d) %%}
+  <p>{{ _("Message 1") }} {{ index }} {{ _("Missing message") }}</p>
+{%% end %%}
+%(strings)s
+</body></html>
+'''
+
+
+def message(index):
+    return u'Message %d' % index
+
+
+def plural(index):
+    return (u'%%(num)d apple %d' % index, u'%%(num)d apples %d' % index)
+
+
+def make_locale_tree(directory, locales, messages, domain='messages'):
+    """Writes a catalog of `messages` singular and `messages` / 10 plural
+    messages for each of the `locales` to a gettext locale tree.
+    """
+    catalog = Catalog(locale='fr_FR', domain=domain)
+    for index in xrange(messages):
+        catalog.add(message(index), u'Traduction %d' % index)
+    for index in xrange(messages // 10):
+        catalog.add(plural(index), (
+            u'%%(num)d pomme %d' % index, u'%%(num)d pommes %d' % index
+        ))
+    fileobj = StringIO()
+    write_mo(fileobj, catalog)
+    data = fileobj.getvalue()
+    for lang in locales:
+        messages_dir = os.path.join(directory, lang, 'LC_MESSAGES')
+        os.makedirs(messages_dir)
+        with open(os.path.join(messages_dir, domain + '.mo'), 'wb') as mo:
+            mo.write(data)
+
+
+def make_template_tree(directory, templates, strings=40):
+    """Writes `templates` templates, spread over sub directories, each
+    translating `strings` messages.
+    """
+    rng = random.Random(templates)
+    for index in xrange(templates):
+        subdir = os.path.join(directory, 'section%d' % (index % 10))
+        if not os.path.isdir(subdir):
+            os.makedirs(subdir)
+        lines = []
+        for line in xrange(strings):
+            lines.append(
+                '<li>{{ _("%s") }} {{ name }}</li>' % message(
+                    rng.randrange(strings * 10)
+                )
+            )
+            if line % 10 == 0:
+                lines.append(
+                    '{% if user %}{{ escape(user.name) }}{% end %}\n'
+                    '<div class="row">{{ len(items) }} items</div>'
+                )
+        with open(os.path.join(subdir, 'page%d.html' % index), 'w') as page:
+            page.write('\n'.join(lines))
+
+
+class Unsupported(Exception):
+    """Raised by a benchmark of a feature the release does not have"""
+
+
+def require(obj, *names):
+    """Raises :class:`Unsupported` unless the object has all the named
+    attributes.
+    """
+    for name in names:
+        if not hasattr(obj, name):
+            raise Unsupported(name)
+
+
+def accepts(func, *names):
+    """Returns whether the function takes all the named arguments"""
+    spec = inspect.getargspec(func)
+    return spec.keywords is not None or set(names) <= set(spec.args)
+
+
+def load_translations(directory, lazy=False, workers=None):
+    """Loads the ``messages`` domain of a locale tree, with the arguments
+    the release takes.
+    """
+    kwargs = {}
+    if lazy and accepts(locale.load_gettext_translations, 'lazy'):
+        kwargs['lazy'] = True
+    if workers and accepts(locale.load_gettext_translations, 'workers'):
+        kwargs['workers'] = workers
+    locale.load_gettext_translations(directory, 'messages', **kwargs)
+
+
+def reset_locale():
+    """Forgets all the loaded translations"""
+    registry = getattr(locale, 'default_registry', None)
+    if registry is not None:
+        registry.clear()
+    else:
+        # Older releases keep the translations in the module
+        locale._translations = {}
+        locale._supported_locales = frozenset([locale._default_locale])
+
+
+class Handler(TornadoBabelMixin):
+    """The gettext part of a request handler"""
+    def __init__(self, locale):
+        self.locale = locale
+
+
+class PageHandler(TornadoBabelMixin, web.RequestHandler):
+    def get_user_locale(self):
+        return locale.get(self.get_argument('locale', 'en_US'))
+
+    def get(self):
+        self.render('page.html')
+
+
+class RenderCase(testing.AsyncHTTPTestCase):
+    """A page rendered through tornado's test HTTP client and server"""
+    template_loader = None
+
+    def get_app(self):
+        settings = {'template_path': self.template_path}
+        if self.template_loader is not None:
+            settings['template_loader'] = self.template_loader
+        return web.Application([('/', PageHandler)], **settings)
+
+    def runTest(self):
+        pass
+
+
+class Suite(object):
+    """Runs the benchmarks on data generated in a temporary directory"""
+
+    def __init__(self, messages=10000, locales=len(LOCALES), templates=200,
+                 repeat=3, scale=1.0):
+        self.messages = messages
+        self.locales = LOCALES[:locales]
+        self.templates = templates
+        self.repeat = repeat
+        self.scale = scale
+        self.results = {}
+
+    def parameters(self):
+        return {
+            'messages': self.messages,
+            'locales': len(self.locales),
+            'templates': self.templates,
+            'repeat': self.repeat,
+            'scale': self.scale,
+        }
+
+    def measure(self, name, func, number, ops=1, unit='op'):
+        """Records the time taken by an operation, `func` doing `ops` of
+        them per call.
+        """
+        number = max(1, int(number * self.scale))
+        timings = timeit.repeat(func, number=number, repeat=self.repeat)
+        per_op = [elapsed / (number * ops) * 1e6 for elapsed in timings]
+        self.results[name] = {
+            'unit': 'us/%s' % unit,
+            'best': min(per_op),
+            'mean': sum(per_op) / len(per_op),
+            'ops': number * ops,
+        }
+        sys.stderr.write('%-32s %12.3f us/%s\n' % (name, min(per_op), unit))
+
+    def run(self, selected=None):
+        self.directory = tempfile.mkdtemp(prefix='tornadobabel-bench-')
+        try:
+            self.locale_dir = os.path.join(self.directory, 'locales')
+            self.template_dir = os.path.join(self.directory, 'templates')
+            self.page_dir = os.path.join(self.directory, 'pages')
+            make_locale_tree(self.locale_dir, self.locales, self.messages)
+            make_template_tree(self.template_dir, self.templates)
+            os.makedirs(self.page_dir)
+            with open(os.path.join(self.page_dir, 'page.html'), 'w') as page:
+                page.write(PAGE_TEMPLATE % {
+                    'rows': 20,
+                    'strings': '\n'.join(
+                        '{{ _("%s") }}' % message(index)
+                        for index in xrange(50)
+                    ),
+                })
+
+            for name in sorted(dir(self)):
+                if not name.startswith('bench_'):
+                    continue
+                if selected and not [
+                        pattern for pattern in selected if pattern in name]:
+                    continue
+                reset_locale()
+                try:
+                    getattr(self, name)()
+                except Unsupported, error:
+                    sys.stderr.write(
+                        '%-32s skipped, needs %s\n' % (name[6:], error)
+                    )
+        finally:
+            reset_locale()
+            shutil.rmtree(self.directory)
+        return self.results
+
+    def bench_load(self):
+        def load(workers=None):
+            reset_locale()
+            load_translations(self.locale_dir, workers=workers)
+        self.measure('load.serial', load, 1, unit='load')
+        if accepts(locale.load_gettext_translations, 'workers'):
+            # Parsing holds the GIL, so from a local disk this only
+            # measures the overhead of the threads
+            self.measure('load.workers4', lambda: load(4), 1, unit='load')
+
+        def load_lazy():
+            reset_locale()
+            load_translations(self.locale_dir, lazy=True)
+            locale.get(self.locales[0])
+        if accepts(locale.load_gettext_translations, 'lazy'):
+            self.measure('load.lazy_first_use', load_lazy, 1, unit='load')
+
+    def bench_resolution(self):
+        load_translations(self.locale_dir, lazy=True)
+
+        def get_closest():
+            for code in CODES:
+                locale.Locale.get_closest(code)
+        self.measure(
+            'locale.get_closest', get_closest, 2000, len(CODES), 'lookup'
+        )
+
+    def bench_negotiation(self):
+        require(locale, 'negotiate', 'parse_accept_language')
+        load_translations(self.locale_dir, lazy=True)
+
+        def parse():
+            for header in HEADERS:
+                locale.parse_accept_language(header)
+        self.measure(
+            'negotiation.parse', parse, 2000, len(HEADERS), 'header'
+        )
+
+        def negotiate():
+            for header in HEADERS:
+                locale.negotiate(header)
+        self.measure(
+            'negotiation.cached', negotiate, 2000, len(HEADERS), 'header'
+        )
+        if not hasattr(locale, 'set_negotiation_cache_size'):
+            return
+        size = locale.get_negotiation_cache_info()['maxsize']
+        locale.set_negotiation_cache_size(0)
+        try:
+            self.measure(
+                'negotiation.uncached', negotiate, 500, len(HEADERS), 'header'
+            )
+        finally:
+            locale.set_negotiation_cache_size(size)
+
+    def _sample(self, size=1000):
+        """Returns messages of which about one in ten is missing"""
+        rng = random.Random(size)
+        return [
+            message(rng.randrange(int(self.messages * 1.1)))
+            for _ in xrange(size)
+        ]
+
+    def bench_translate(self):
+        locale.load_gettext_translations(self.locale_dir, 'messages')
+        fr_FR = locale.get(self.locales[0])
+        sample = self._sample()
+
+        def singular():
+            for msgid in sample:
+                fr_FR.translate(msgid)
+        self.measure(
+            'translate.singular', singular, 50, len(sample), 'message'
+        )
+
+        plurals = [
+            plural(index) + (index % 5,)
+            for index in xrange(0, self.messages // 10, 10)
+        ]
+
+        def translate_plural():
+            for msgid1, msgid2, count in plurals:
+                fr_FR.translate(msgid1, msgid2, count)
+        self.measure(
+            'translate.plural', translate_plural, 100, len(plurals), 'message'
+        )
+        if hasattr(fr_FR, 'translate_many'):
+            self.measure(
+                'translate.many', lambda: fr_FR.translate_many(sample), 50,
+                len(sample), 'message'
+            )
+
+        if not hasattr(locale, 'set_compiled_catalogs'):
+            return
+        locale.set_compiled_catalogs(True)
+        try:
+            fr_FR = locale.get(self.locales[0])
+            self.measure(
+                'translate.compiled', singular, 50, len(sample), 'message'
+            )
+        finally:
+            locale.set_compiled_catalogs(False)
+
+    def bench_lazy_gettext(self):
+        locale.load_gettext_translations(self.locale_dir, 'messages')
+        fr_FR = locale.get(self.locales[0])
+        sample = self._sample(50)
+
+        def request():
+            # A request translating the strings of a page, twice each
+            _ = Handler(fr_FR)._
+            for msgid in sample:
+                string = _(msgid)
+                unicode(string), unicode(string)
+        self.measure('mixin.lazy_gettext', request, 500, len(sample), 'call')
+
+    def _render(self, name, template_loader=None):
+        case = RenderCase()
+        case.template_path = self.page_dir
+        case.template_loader = template_loader
+        case.setUp()
+        try:
+            path = '/?locale=%s' % self.locales[0]
+            response = case.fetch(path)
+            assert response.code == 200, response.code
+            self.measure(name, lambda: case.fetch(path), 200, unit='request')
+        finally:
+            case.tearDown()
+
+    def bench_render(self):
+        locale.load_gettext_translations(self.locale_dir, 'messages')
+        self._render('render.page')
+        if TranslatingLoader is not None:
+            self._render(
+                'render.translating_loader', TranslatingLoader(self.page_dir)
+            )
+
+        # The template alone, without the request around it
+        fr_FR = locale.get(self.locales[0])
+        page = template.Loader(self.page_dir).load('page.html')
+        self.measure(
+            'render.generate',
+            lambda: page.generate(locale=fr_FR, _=fr_FR.translate),
+            500, unit='page'
+        )
+        if TranslatingLoader is None:
+            return
+        page = TranslatingLoader(self.page_dir).load('page.html')
+        self.measure(
+            'render.generate_translated',
+            lambda: page.generate(locale=fr_FR, _=fr_FR.translate),
+            500, unit='page'
+        )
+
+    def bench_extract(self):
+        filenames = []
+        for root, _, files in os.walk(self.template_dir):
+            filenames.extend(os.path.join(root, name) for name in files)
+        filenames.sort()
+        keywords = DEFAULT_KEYWORDS.keys()
+
+        def extract():
+            for filename in filenames:
+                with open(filename) as fileobj:
+                    list(extract_tornado(fileobj, keywords, [], {}))
+        self.measure(
+            'extract.tornado', extract, 3, len(filenames), 'template'
+        )
+
+
+def compare(results, baseline, threshold):
+    """Writes the ratio of each result to its baseline and returns the
+    names of the benchmarks slower by more than `threshold`.
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name]['best'] / baseline[name]['best']
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        sys.stderr.write('%-32s %8.2fx%s\n' % (name, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = OptionParser(
+        usage='%prog [options]',
+        description='run the tornadobabel benchmarks and write the '
+                    'results as JSON'
+    )
+    parser.add_option('-o', '--output', dest='output', metavar='FILE',
+                      help='write the results to FILE instead of stdout')
+    parser.add_option('-k', '--select', dest='selected', action='append',
+                      metavar='NAME', help='only run the benchmarks whose '
+                      'name contains NAME')
+    parser.add_option('--quick', dest='quick', action='store_true',
+                      help='smaller data and fewer iterations, for a '
+                           'rough check')
+    parser.add_option('--compare', dest='baseline', metavar='FILE',
+                      help='compare the results with those in FILE')
+    parser.add_option('--threshold', dest='threshold', type='float',
+                      help='ratio above which a slow down is a regression '
+                           '(default %default)')
+    parser.set_defaults(threshold=0.1, quick=False, selected=[])
+    options, args = parser.parse_args(argv)
+
+    if options.quick:
+        suite = Suite(messages=1000, locales=5, templates=20, scale=0.1)
+    else:
+        suite = Suite()
+    started = time.time()
+    results = suite.run(options.selected)
+    report = {
+        'version': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'duration': time.time() - started,
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'tornado': tornado.version,
+            'babel': babel.__version__,
+        },
+        'parameters': suite.parameters(),
+        'results': results,
+    }
+
+    data = json.dumps(
+        report, indent=2, sort_keys=True, separators=(',', ': ')
+    )
+    if options.output:
+        with open(options.output, 'w') as fileobj:
+            fileobj.write(data + '\n')
+    else:
+        sys.stdout.write(data + '\n')
+
+    if options.baseline:
+        with open(options.baseline) as fileobj:
+            baseline = json.load(fileobj)
+        if baseline.get('parameters') != report['parameters']:
+            sys.stderr.write(
+                'warning: the baseline was run with other parameters\n'
+            )
+        if compare(results, baseline['results'], options.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -30,5 +30,8 @@ setup(
     entry_points="""
     [babel.extractors]
     tornado = tornadobabel.extract:extract_tornado
+
+    [console_scripts]
+    tornadobabel = tornadobabel.frontend:main
     """,
 )
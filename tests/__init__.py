@@ -11,14 +11,32 @@ import sys
 from unittest import TestSuite, TestLoader
 sys.path.append('../')
 
-from test_locale import TestLocale
+from test_locale import TestLocale, TestLazyLocale, TestAsyncLoad, \
+    TestRegistry, TestOverlay
 from test_extract import TestExtract
 from test_merge import TestMerge
+from test_catalog import TestMoCatalog
+from test_watcher import TestWatcher
+from test_frontend import TestFrontend, TestCompile
+from test_template import TestTemplate
+from test_format import TestFormat
+from test_store import TestStore
 
 def test_all():
     loader = TestLoader()
     suite = TestSuite()
     suite.addTests(loader.loadTestsFromTestCase(TestLocale))
+    suite.addTests(loader.loadTestsFromTestCase(TestLazyLocale))
+    suite.addTests(loader.loadTestsFromTestCase(TestAsyncLoad))
+    suite.addTests(loader.loadTestsFromTestCase(TestRegistry))
+    suite.addTests(loader.loadTestsFromTestCase(TestOverlay))
     suite.addTests(loader.loadTestsFromTestCase(TestExtract))
     suite.addTests(loader.loadTestsFromTestCase(TestMerge))
+    suite.addTests(loader.loadTestsFromTestCase(TestMoCatalog))
+    suite.addTests(loader.loadTestsFromTestCase(TestWatcher))
+    suite.addTests(loader.loadTestsFromTestCase(TestFrontend))
+    suite.addTests(loader.loadTestsFromTestCase(TestCompile))
+    suite.addTests(loader.loadTestsFromTestCase(TestTemplate))
+    suite.addTests(loader.loadTestsFromTestCase(TestFormat))
+    suite.addTests(loader.loadTestsFromTestCase(TestStore))
     return suite
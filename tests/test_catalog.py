@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+    test_catalog
+
+    Test the alternative message catalogs
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import mmap
+import os
+import shutil
+import tempfile
+import unittest
+
+from babel.messages.catalog import Catalog
+from babel.messages.mofile import write_mo
+from babel.support import Translations
+
+from tornadobabel.catalog import MoCatalog, MoFile, CompiledCatalog, \
+    DomainCatalog, MappedMoCatalog, ugettext_many, ungettext_many
+
+LOCALES_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'locales')
+
+
+def make_mo_file(directory, domain='messages', welcome=u'Bienvenue'):
+    """Writes a catalog with a few plural messages to `directory`"""
+    catalog = Catalog(locale='fr_FR', domain=domain)
+    catalog.add(u'Welcome', welcome)
+    catalog.add(u'Caf\xe9', u'Caf\xe9 cr\xe8me')
+    catalog.add(
+        (u'%(num)d apple', u'%(num)d apples'),
+        (u'%(num)d pomme', u'%(num)d pommes')
+    )
+    filename = os.path.join(directory, '%s.mo' % domain)
+    # Renamed over the file, which may be mapped
+    with open(filename + '.tmp', 'wb') as fileobj:
+        write_mo(fileobj, catalog)
+    os.rename(filename + '.tmp', filename)
+    return filename
+
+
+class TestMoCatalog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookup(self):
+        catalog = MoCatalog([MoFile(make_mo_file(self.directory))])
+        self.assertEqual(catalog.ugettext(u'Welcome'), u'Bienvenue')
+        self.assertEqual(catalog.ugettext(u'Caf\xe9'), u'Caf\xe9 cr\xe8me')
+        self.assertEqual(catalog.ugettext(u'Missing'), u'Missing')
+        self.assertEqual(
+            catalog.ungettext(u'%(num)d apple', u'%(num)d apples', 1),
+            u'%(num)d pomme'
+        )
+        self.assertEqual(
+            catalog.ungettext(u'%(num)d apple', u'%(num)d apples', 2),
+            u'%(num)d pommes'
+        )
+        self.assertEqual(
+            catalog.ungettext(u'%(num)d pear', u'%(num)d pears', 2),
+            u'%(num)d pears'
+        )
+
+    def test_cache(self):
+        catalog = MoCatalog([MoFile(make_mo_file(self.directory))])
+        catalog.ugettext(u'Welcome')
+        catalog.ugettext(u'Missing')
+        catalog.ungettext(u'%(num)d apple', u'%(num)d apples', 2)
+        self.assertEqual(catalog._found, {u'Welcome': u'Bienvenue'})
+        self.assertEqual(list(catalog._forms), [u'%(num)d apple'])
+        self.assertEqual(catalog.ugettext(u'Welcome'), u'Bienvenue')
+        self.assertEqual(
+            catalog.ungettext(u'%(num)d apple', u'%(num)d apples', 1),
+            u'%(num)d pomme'
+        )
+
+    def test_rewritten_file(self):
+        filename = make_mo_file(self.directory)
+        catalog = MoCatalog([MoFile(filename)])
+        # Rewritten in place, as pybabel compile does
+        with open(filename, 'wb') as fileobj:
+            fileobj.write('')
+        self.assertEqual(catalog.ugettext(u'Welcome'), u'Bienvenue')
+
+        catalog = MappedMoCatalog.load(LOCALES_DIR, ['fr_FR'], 'messages')
+        self.assertTrue(isinstance(catalog.files[0]._map, mmap.mmap))
+        self.assertEqual(catalog.ugettext(u'Welcome'), u'bienvenu')
+        catalog.files[0].close()
+
+    def test_merge(self):
+        catalog = MoCatalog.load(LOCALES_DIR, ['fr_FR'], 'messages')
+        catalog.merge(MoCatalog.load(LOCALES_DIR, ['fr_FR'], 'addit'))
+        self.assertEqual(catalog.ugettext('Welcome'), u'bienvenu')
+        self.assertEqual(catalog.ugettext('Goodbye'), u'Au revoir')
+
+        # Merged catalogs take precedence
+        catalog.merge(MoCatalog([MoFile(make_mo_file(self.directory))]))
+        self.assertEqual(catalog.ugettext('Welcome'), u'Bienvenue')
+
+    def test_compile(self):
+        filename = make_mo_file(self.directory)
+        compiled = CompiledCatalog(MoCatalog([MoFile(filename)]))
+        with open(filename, 'rb') as fileobj:
+            expected = CompiledCatalog(Translations(fileobj))
+        self.assertEqual(compiled.messages, expected.messages)
+        self.assertEqual(compiled.plurals, expected.plurals)
+
+    def test_many(self):
+        filename = make_mo_file(self.directory)
+        with open(filename, 'rb') as fileobj:
+            translations = Translations(fileobj)
+        fallback = Translations.load(LOCALES_DIR, ['fr_FR'], 'addit')
+        translations.add_fallback(fallback)
+        messages = [u'Welcome', u'Goodbye', u'Caf\xe9', u'Missing']
+        plurals = [
+            (u'%(num)d apple', u'%(num)d apples', count)
+            for count in (0, 1, 2)
+        ] + [(u'%(num)d pear', u'%(num)d pears', 1)]
+
+        catalogs = (
+            translations, CompiledCatalog(translations),
+            MoCatalog([MoFile(filename)]),
+        )
+        for catalog in catalogs:
+            self.assertEqual(
+                ugettext_many(catalog, messages),
+                [catalog.ugettext(message) for message in messages]
+            )
+            self.assertEqual(
+                ungettext_many(catalog, plurals),
+                [catalog.ungettext(*message) for message in plurals]
+            )
+        self.assertEqual(
+            ugettext_many(translations, messages),
+            [u'Bienvenue', u'Au revoir', u'Caf\xe9 cr\xe8me', u'Missing']
+        )
+
+    def test_domain_catalog(self):
+        filename = make_mo_file(self.directory, welcome=u'Salut')
+        catalog = DomainCatalog()
+        catalog.add('messages', Translations.load(
+            LOCALES_DIR, ['fr_FR'], 'messages'
+        ))
+        catalog.add('addit', Translations.load(
+            LOCALES_DIR, ['fr_FR'], 'addit'
+        ))
+        self.assertEqual(catalog.domains, ['addit', 'messages'])
+        self.assertEqual(catalog.ugettext(u'Welcome'), u'bienvenu')
+
+        # Catalogs added last take precedence, whatever their class
+        catalog.add('plugin', MoCatalog([MoFile(filename)]))
+        self.assertEqual(catalog.ugettext(u'Welcome'), u'Salut')
+        self.assertEqual(catalog.ugettext(u'Goodbye'), u'Au revoir')
+        self.assertEqual(
+            catalog.dugettext('messages', u'Welcome'), u'bienvenu'
+        )
+        self.assertEqual(
+            catalog.ungettext(u'%(num)d apple', u'%(num)d apples', 2),
+            u'%(num)d pommes'
+        )
+        self.assertEqual(catalog.dungettext(
+            'addit', u'%(num)d apple', u'%(num)d apples', 2
+        ), u'%(num)d apples')
+        messages = [u'Welcome', u'Goodbye', u'Missing']
+        self.assertEqual(
+            ugettext_many(catalog, messages),
+            [catalog.ugettext(message) for message in messages]
+        )
+
+        # As if they had been merged
+        compiled = CompiledCatalog(catalog)
+        for message in messages:
+            self.assertEqual(
+                compiled.ugettext(message), catalog.ugettext(message)
+            )
+
+    def test_domain_catalog_copy(self):
+        def table(domain, count):
+            translations = Translations()
+            translations._catalog = dict(
+                (u'%s %d' % (domain, index), u'%s fr' % domain)
+                for index in xrange(count)
+            )
+            translations._catalog[u'Welcome'] = domain
+            return translations
+
+        catalog = DomainCatalog()
+        catalog.add('messages', table('messages', 8))
+        copies = [catalog]
+        for index, count in enumerate((1, 2, 4, 1, 20)):
+            domain = 'plugin%d' % index
+            catalog = catalog.copy()
+            catalog.add(domain, table(domain, count))
+            copies.append(catalog)
+        # Adding to a copy leaves the catalogs it was copied from alone
+        self.assertEqual(
+            [copy.ugettext(u'Welcome') for copy in copies],
+            [u'messages', u'plugin0', u'plugin1', u'plugin2', u'plugin3',
+             u'plugin4']
+        )
+        self.assertEqual(copies[0].ugettext(u'plugin0 0'), u'plugin0 0')
+        self.assertEqual(copies[1].ugettext(u'plugin1 0'), u'plugin1 0')
+        for domain, count in (('messages', 8), ('plugin2', 4)):
+            self.assertEqual(
+                catalog.ugettext(u'%s %d' % (domain, count - 1)),
+                u'%s fr' % domain
+            )
+        # The dictionaries as large as the ones before are merged
+        self.assertTrue(len(catalog._layers) <= 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
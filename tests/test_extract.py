@@ -11,6 +11,9 @@ import sys
 sys.path.append('../')
 
 from StringIO import StringIO
+import os
+import shutil
+import tempfile
 import unittest
 
 from tornadobabel.extract import extract_tornado
@@ -68,6 +71,46 @@ class TestExtract(unittest.TestCase):
         self.assertEqual(string[1], '_')  # Function name
         self.assertEqual(string[2], "Test String")  # Translatable string
 
+    def test_keywords(self):
+        source = """
+        {{ _("Test String") }}
+        {{ translate("Other String") }}
+        """
+        strings = list(extract_tornado(
+            StringIO(source), ['translate'], None, {}
+        ))
+        self.assertEqual(strings, [(3, 'translate', 'Other String', [])])
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            options = {'cache_dir': cache_dir}
+            for keywords, expected in ((['_'], 'Test String'),
+                                       (['translate'], 'Other String')):
+                strings = list(extract_tornado(
+                    StringIO(source), keywords, None, options
+                ))
+                self.assertEqual([string[2] for string in strings], [expected])
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_cached_extract(self):
+        source = """
+        {{ _("Test String") }}
+        {{ user_name(count) }}
+        """
+        cache_dir = tempfile.mkdtemp()
+        try:
+            options = {'cache_dir': cache_dir}
+            strings = list(extract_tornado(StringIO(source), None, None, options))
+            self.assertEqual(strings, [(2, '_', 'Test String', [])])
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            strings = list(extract_tornado(StringIO(source), None, None, options))
+            self.assertEqual(strings, [(2, '_', 'Test String', [])])
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+        finally:
+            shutil.rmtree(cache_dir)
+
 
 if __name__ == "__main__":
     unittest.main()
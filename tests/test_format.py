@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+    test_format
+
+    Test the formatting methods of the locale
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import unittest
+from array import array
+from datetime import datetime, time, timedelta, tzinfo
+from decimal import Decimal
+
+from babel import dates, numbers
+from tornadobabel.locale import Locale
+
+
+class FixedOffset(tzinfo):
+    def utcoffset(self, dt):
+        return timedelta(hours=5, minutes=30)
+
+    def dst(self, dt):
+        return timedelta(0)
+
+    def tzname(self, dt):
+        return 'IST'
+
+
+class TestFormat(unittest.TestCase):
+    formats = ('full', 'long', 'medium', 'short')
+
+    def test_dates(self):
+        dt = datetime(2007, 4, 1, 15, 30)
+        for code in ('en_US', 'fr_FR', 'pt_BR', 'ja_JP'):
+            locale = Locale.parse(code)
+            for format in self.formats + ('yyyy.MM.dd G HH:mm:ss zzzz',):
+                for tz in (None, FixedOffset()):
+                    self.assertEqual(
+                        locale.format_datetime(dt, format, tz),
+                        dates.format_datetime(dt, format, tz, locale=code)
+                    )
+            for format in self.formats:
+                self.assertEqual(
+                    locale.format_date(dt, format),
+                    dates.format_date(dt, format, locale=code)
+                )
+                for value in (dt, time(3, 4)):
+                    self.assertEqual(
+                        locale.format_time(value, format, FixedOffset()),
+                        dates.format_time(
+                            value, format, FixedOffset(), locale=code
+                        )
+                    )
+
+    def test_pattern_cache(self):
+        locale = Locale.parse('fr_FR')
+        locale.format_date(datetime(2007, 4, 1), 'long')
+        pattern = locale._date_patterns[('date', 'long')]
+        locale.format_date(datetime(2012, 1, 2), 'long')
+        self.assertTrue(locale._date_patterns[('date', 'long')] is pattern)
+
+    def test_batch(self):
+        locale = Locale.parse('en_US')
+        values = [datetime(2007, 4, 1, 15, 30), datetime(2012, 1, 2, 8, 5)]
+        self.assertEqual(
+            locale.format_datetimes(values, 'short'),
+            [locale.format_datetime(value, 'short') for value in values]
+        )
+        self.assertEqual(
+            locale.format_dates(values),
+            [u'Apr 1, 2007', u'Jan 2, 2012']
+        )
+        self.assertEqual(
+            locale.format_times(values, 'short'), [u'3:30 PM', u'8:05 AM']
+        )
+
+    def test_numbers(self):
+        values = (0, -1234567.891, 0.345, 12345678901234, Decimal('1.2345'))
+        for code in ('en_US', 'fr_FR', 'de_DE', 'hi_IN'):
+            locale = Locale.parse(code)
+            for value in values:
+                self.assertEqual(
+                    locale.format_decimal(value),
+                    numbers.format_decimal(value, locale=code)
+                )
+                self.assertEqual(
+                    locale.format_decimal(value, '#,##0.00'),
+                    numbers.format_decimal(value, '#,##0.00', locale=code)
+                )
+                self.assertEqual(
+                    locale.format_currency(value, 'EUR'),
+                    numbers.format_currency(value, 'EUR', locale=code)
+                )
+                self.assertEqual(
+                    locale.format_percent(value),
+                    numbers.format_percent(value, locale=code)
+                )
+            self.assertEqual(
+                locale.parse_decimal(locale.format_decimal(1234.5)), 1234.5
+            )
+            self.assertEqual(
+                locale.parse_number(locale.format_number(1234567)), 1234567
+            )
+
+        locale = Locale.parse('en_US')
+        self.assertRaises(
+            numbers.NumberFormatError, locale.parse_decimal, '1,2,x'
+        )
+        self.assertEqual(
+            locale.format_decimals(array('d', [1234.5, 0.25])),
+            [u'1,234.5', u'0.25']
+        )
+        self.assertEqual(
+            locale.format_currencies([1, 2.5], 'USD'), [u'$1.00', u'$2.50']
+        )
+        self.assertEqual(locale.format_percents([0.5, 1]), [u'50%', u'100%'])
+        self.assertTrue(('currency', None) in locale._number_patterns)
+
+
+if __name__ == "__main__":
+    unittest.main()
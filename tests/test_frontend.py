@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+    test_frontend
+
+    Test the tornadobabel command line interface
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from babel.messages.catalog import Catalog
+from babel.messages.extract import DEFAULT_KEYWORDS, extract_from_dir
+from babel.messages.pofile import write_po
+
+from tornadobabel import frontend
+from tornadobabel.frontend import extract_parallel, ExtractionManifest, \
+    compile_parallel
+from tornadobabel.locale import LocaleRegistry
+
+TEST_DIR = os.path.abspath(os.path.dirname(__file__))
+
+METHOD_MAP = [
+    ('*.html', 'tornadobabel.extract:extract_tornado'),
+    ('*.py', 'python'),
+]
+
+
+class TestFrontend(unittest.TestCase):
+    def test_extract_parallel(self):
+        serial = [
+            (os.path.normpath(os.path.join(TEST_DIR, filename)),
+                lineno, message, comments)
+            for filename, lineno, message, comments in extract_from_dir(
+                TEST_DIR, METHOD_MAP, {}, DEFAULT_KEYWORDS
+            )
+        ]
+        self.assertTrue(serial)
+        for processes in (1, 3):
+            parallel = list(extract_parallel(
+                [TEST_DIR], METHOD_MAP, {}, DEFAULT_KEYWORDS,
+                processes=processes
+            ))
+            self.assertEqual(parallel, serial)
+
+    def test_incremental_extract(self):
+        directory = tempfile.mkdtemp()
+        manifest_path = os.path.join(directory, 'manifest')
+        templates = os.path.join(directory, 'templates')
+        os.mkdir(templates)
+
+        def write(name, content):
+            with open(os.path.join(templates, name), 'w') as fileobj:
+                fileobj.write(content)
+
+        def extract():
+            manifest = ExtractionManifest(manifest_path)
+            messages = list(extract_parallel(
+                [templates], METHOD_MAP, {}, DEFAULT_KEYWORDS,
+                processes=1, manifest=manifest
+            ))
+            return manifest, [message[2] for message in messages]
+
+        try:
+            write('a.html', '{{ _("A") }}')
+            write('b.html', '{{ _("B") }}')
+            manifest, messages = extract()
+            self.assertEqual(messages, ['A', 'B'])
+            self.assertEqual((manifest.hits, manifest.misses), (0, 2))
+
+            manifest, messages = extract()
+            self.assertEqual(messages, ['A', 'B'])
+            self.assertEqual((manifest.hits, manifest.misses), (2, 0))
+
+            write('a.html', '{{ _("A changed") }}')
+            later = time.time() + 10
+            os.utime(os.path.join(templates, 'a.html'), (later, later))
+            os.remove(os.path.join(templates, 'b.html'))
+            write('c.html', '{{ _("C") }}')
+            manifest, messages = extract()
+            self.assertEqual(messages, ['A changed', 'C'])
+            self.assertEqual((manifest.hits, manifest.misses), (0, 2))
+            self.assertEqual(len(manifest.entries), 2)
+        finally:
+            shutil.rmtree(directory)
+
+
+def write_po_file(directory, lang, messages, domain='messages'):
+    """Writes a catalog of ``(msgid, msgstr)`` messages to a locale tree"""
+    messages_dir = os.path.join(directory, lang, 'LC_MESSAGES')
+    if not os.path.isdir(messages_dir):
+        os.makedirs(messages_dir)
+    catalog = Catalog(locale=lang, domain=domain, fuzzy=False)
+    for msgid, msgstr in messages:
+        catalog.add(msgid, msgstr)
+    filename = os.path.join(messages_dir, domain + '.po')
+    with open(filename, 'wb') as fileobj:
+        write_po(fileobj, catalog)
+    return filename
+
+
+class TestCompile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compile_parallel(self):
+        write_po_file(self.directory, 'fr_FR', [
+            (u'Hello %(name)s', u'Bonjour %(name)s'),
+            ((u'%d apple', u'%d apples'), (u'%d pomme', u'%d pommes')),
+        ])
+        es_path = write_po_file(self.directory, 'es_ES', [
+            (u'Hello %(name)s', u'Hola %(name)s'),
+        ])
+        report = compile_parallel(self.directory, processes=2)
+        self.assertEqual(len(report.compiled), 2)
+        self.assertEqual((report.skipped, report.errors), ([], []))
+
+        registry = LocaleRegistry()
+        registry.load_gettext_translations(self.directory, 'messages')
+        self.assertEqual(
+            registry.get('fr_FR').translate(u'Hello %(name)s'),
+            u'Bonjour %(name)s'
+        )
+        self.assertEqual(
+            registry.get('fr_FR').translate(u'%d apple', u'%d apples', 2),
+            u'%d pommes'
+        )
+
+        report = compile_parallel(self.directory, processes=2)
+        self.assertEqual((report.compiled, len(report.skipped)), ([], 2))
+
+        later = time.time() + 10
+        os.utime(es_path, (later, later))
+        report = compile_parallel(self.directory, processes=1)
+        self.assertEqual([path for path, _ in report.compiled], [es_path])
+        self.assertEqual(len(report.skipped), 1)
+
+        report = compile_parallel(self.directory, ['messages'], force=True)
+        self.assertEqual(len(report.compiled), 2)
+        self.assertEqual(compile_parallel(self.directory, ['other']).skipped,
+                         [])
+
+    def test_validation(self):
+        fr_path = write_po_file(self.directory, 'fr_FR', [
+            (u'Hello %(name)s', u'Bonjour %(nom)s'),
+            (u'%s of %d', u'%s sur'),
+        ])
+        # Written by hand as babel writes all the plural forms
+        with open(fr_path, 'ab') as fileobj:
+            fileobj.write(
+                '\nmsgid "%d apple"\nmsgid_plural "%d apples"\n'
+                'msgstr[0] "%d pomme"\n'
+            )
+        es_path = write_po_file(self.directory, 'es_ES', [
+            (u'Hello %(name)s', u'Hola'),
+            (u'%d apple', u'%d manzana'),
+        ])
+        with open(es_path, 'rb') as fileobj:
+            content = fileobj.read()
+        with open(es_path, 'wb') as fileobj:
+            fileobj.write(content.replace('nplurals=2', 'nplurals=3'))
+        report = compile_parallel(self.directory, processes=1)
+        self.assertEqual([path for path, _ in report.compiled], [es_path])
+        self.assertEqual(
+            sorted((msgid, problem) for _, _, msgid, problem in report.errors),
+            [
+                (u'%d apple', 'expected 2 plural forms, found 1'),
+                (u'%s of %d', 'expected 2 positional placeholders, found 1'),
+                (u'Hello %(name)s', u'unknown placeholder %(nom)s'),
+            ]
+        )
+        self.assertEqual(set(error[0] for error in report.errors),
+                         set([fr_path]))
+        self.assertFalse(os.path.exists(fr_path[:-3] + '.mo'))
+        self.assertEqual(report.warnings, [
+            (es_path, None, 'declares 3 plural forms, es_ES has 2'),
+            (es_path, u'%d apple', 'has no plural, unlike in %s' % fr_path),
+        ])
+
+        self.assertEqual(frontend.main(['compile', self.directory]), 1)
+        write_po_file(self.directory, 'fr_FR', [
+            (u'Hello %(name)s', u'Bonjour %(name)s'),
+        ])
+        self.assertEqual(frontend.main(['compile', self.directory]), 0)
+        self.assertTrue(os.path.exists(fr_path[:-3] + '.mo'))
+
+    def test_validation_formats(self):
+        write_po_file(self.directory, 'fr_FR', [
+            # Percent signs in messages which are no format strings
+            (u'Save 50% off', u'\xc9conomisez 50 %'),
+            (u'100% sure', u's\xfbr \xe0 100%'),
+            # A plural form leaving the count out
+            ((u'One apple', u'%d apples'), (u'une pomme', u'%d pommes')),
+        ])
+        write_po_file(self.directory, 'ru_RU', [
+            ((u'One apple', u'%d apples'), (
+                u'%d \u044f\u0431\u043b\u043e\u043a\u043e',
+                u'%d \u044f\u0431\u043b\u043e\u043a\u0430',
+                u'%d \u044f\u0431\u043b\u043e\u043a'
+            )),
+            ((u'%(num)d pear', u'%(num)d pears'), (
+                u'%(num)d \u0433\u0440\u0443\u0448\u0430',
+                u'%(count)d \u0433\u0440\u0443\u0448\u0438',
+                u'%(num)d \u0433\u0440\u0443\u0448'
+            )),
+        ])
+        report = compile_parallel(self.directory, processes=1)
+        self.assertEqual(len(report.compiled), 1)
+        self.assertEqual(
+            [error[2:] for error in report.errors],
+            [(u'%(num)d pear', u'unknown placeholder %(count)d')]
+        )
+        self.assertEqual(report.warnings, [])
+
+    def test_write_error(self):
+        po_path = write_po_file(self.directory, 'fr_FR', [
+            (u'Hello', u'Bonjour'),
+        ])
+
+        def write_mo(fileobj, catalog, use_fuzzy=False):
+            fileobj.write('partial')
+            raise IOError('No space left on device')
+
+        original, frontend.write_mo = frontend.write_mo, write_mo
+        try:
+            self.assertRaises(
+                IOError, compile_parallel, self.directory, processes=1
+            )
+        finally:
+            frontend.write_mo = original
+        self.assertEqual(
+            os.listdir(os.path.dirname(po_path)),
+            [os.path.basename(po_path)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,12 +8,20 @@
     :license: BSD, see LICENSE for more details.
 """
 import os
+import shutil
+import tempfile
 import unittest
 
 from tornado import web
 from tornado import testing
 from tornadobabel import locale
-from tornadobabel.mixin import TornadoBabelMixin
+from tornadobabel.mixin import TornadoBabelMixin, make_lazy_gettext
+
+from test_catalog import LOCALES_DIR, make_mo_file
+
+#: The registries of the tenants, over the default registry
+TENANTS = {'acme': locale.OverlayRegistry()}
+TENANTS['acme'].add_messages('es_ES', {u'Welcome': u'bienvenido a Acme'})
 
 
 class IndexHandler(web.RequestHandler):
@@ -34,6 +42,37 @@ class Indexi18nHandler(TornadoBabelMixin, web.RequestHandler):
         self.render('index.html')
 
 
+class BrowserLocaleHandler(TornadoBabelMixin, web.RequestHandler):
+    def get(self):
+        self.write(str(self.locale))
+
+
+class GettextHandler(Indexi18nHandler):
+    def get(self):
+        _ = self._
+        assert _ is self._
+        welcome = _('Welcome')
+        self.write(u'%s %s' % (welcome, type(welcome).__name__))
+
+
+class EagerGettextHandler(GettextHandler):
+    lazy_gettext = False
+
+
+class TenantHandler(TornadoBabelMixin, web.RequestHandler):
+    def get_locale_registry(self):
+        return TENANTS.get(self.get_argument('tenant', None)) or \
+            locale.default_registry
+
+    def get_user_locale(self):
+        return self.get_locale_registry().get_closest(
+            self.get_argument('locale', 'en_US')
+        )
+
+    def get(self):
+        self.write(self.locale.translate('Welcome'))
+
+
 class TestLocale(testing.AsyncHTTPTestCase):
     def get_app(self):
         test_dir = os.path.abspath(
@@ -45,11 +84,15 @@ class TestLocale(testing.AsyncHTTPTestCase):
         return web.Application([
             ('/', IndexHandler),
             ('/i18n', Indexi18nHandler),
+            ('/browser', BrowserLocaleHandler),
+            ('/gettext', GettextHandler),
+            ('/eager-gettext', EagerGettextHandler),
+            ('/tenant', TenantHandler),
         ])
 
     def test_0010_locales(self):
-        self.assertTrue("es_ES" in locale._supported_locales)
-        self.assertTrue("fr_FR" in locale._supported_locales)
+        self.assertTrue("es_ES" in locale.default_registry.supported_locales)
+        self.assertTrue("fr_FR" in locale.default_registry.supported_locales)
 
         es_ES = locale.get('es_ES')
         self.assertEqual(es_ES.translate('Welcome'), "bienvenido")
@@ -72,6 +115,382 @@ class TestLocale(testing.AsyncHTTPTestCase):
         self.assertEqual(response.code, 200)
         self.assertEqual(response.body, "bienvenido\n")
 
+    def test_gettext(self):
+        response = self.fetch('/gettext?locale=fr_FR')
+        self.assertEqual(response.body, "bienvenu MemoizedLazyString")
+
+        response = self.fetch('/eager-gettext?locale=es_ES')
+        self.assertEqual(response.body, "bienvenido unicode")
+
+    def test_memoized_lazy_gettext(self):
+        calls = []
+
+        def translate(message, *args, **kwargs):
+            calls.append((message, args, kwargs))
+            return message.upper()
+
+        lazy_gettext = make_lazy_gettext(lambda: translate, memoize=True)
+        yes, no = lazy_gettext(u'yes'), lazy_gettext(u'no', 1, count=2)
+        self.assertEqual(
+            [unicode(yes), unicode(no), unicode(yes)], [u'YES', u'NO', u'YES']
+        )
+        self.assertEqual(
+            calls, [(u'yes', (), {}), (u'no', (1,), {'count': 2})]
+        )
+        self.assertTrue(lazy_gettext(yes) is yes)
+
+    def test_browser_locale(self):
+        headers = {'Accept-Language': 'de;q=0.5, fr-fr;q=0.8, es-ES'}
+        response = self.fetch('/browser', headers=headers)
+        self.assertEqual(response.body, "es_ES")
+
+        response = self.fetch('/browser', headers={'Accept-Language': 'de'})
+        self.assertEqual(response.body, "en_US")
+
+        response = self.fetch('/browser')
+        self.assertEqual(response.body, "en_US")
+
+    def test_tenant(self):
+        response = self.fetch('/tenant?tenant=acme&locale=es_ES')
+        self.assertEqual(response.body, 'bienvenido a Acme')
+        response = self.fetch('/tenant?locale=es_ES')
+        self.assertEqual(response.body, 'bienvenido')
+        response = self.fetch('/tenant?tenant=acme&locale=fr_FR')
+        self.assertEqual(response.body, 'bienvenu')
+
+    def test_resolution(self):
+        self.assertEqual(str(locale.get('FR-fr')), 'fr_FR')
+        self.assertEqual(str(locale.get('es_es', 'fr_FR')), 'es_ES')
+        self.assertEqual(str(locale.get('de-DE')), 'en_US')
+
+        index = locale.build_resolution_index(['zh_Hant_TW', 'pt'])
+        for code in ('zh_Hant_TW', 'zh-hant-tw', 'zh-TW'):
+            self.assertEqual(
+                locale.resolve_locale_code(code, index), 'zh_Hant_TW'
+            )
+        self.assertEqual(locale.resolve_locale_code('pt-BR', index), 'pt')
+        self.assertEqual(locale.resolve_locale_code('zh', index), None)
+        # Extensions and private use parts are dropped as in RFC 4647
+        for code in ('zh-Hant-TW-u-ca-chinese', 'zh-Hant-TW-x-foo',
+                     'zh-hant-tw-x-a-b'):
+            self.assertEqual(
+                locale.resolve_locale_code(code, index), 'zh_Hant_TW'
+            )
+        self.assertEqual(
+            locale.resolve_locale_code('pt-BR-u-nu-latn-x-foo', index), 'pt'
+        )
+        self.assertEqual(locale.resolve_locale_code('x-pt', index), None)
+        directory = tempfile.mkdtemp()
+        try:
+            messages_dir = os.path.join(
+                directory, 'zh_Hant_TW', 'LC_MESSAGES'
+            )
+            os.makedirs(messages_dir)
+            make_mo_file(messages_dir)
+            registry = locale.LocaleRegistry()
+            registry.load_gettext_translations(directory, 'messages')
+            zh_Hant_TW, ranked = registry.negotiate_ranked(
+                'zh-Hant-TW-u-ca-chinese, en;q=0.5'
+            )
+            self.assertEqual(str(zh_Hant_TW), 'zh_Hant_TW')
+            self.assertEqual(ranked, ('zh_Hant_TW',))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_negotiation(self):
+        self.assertEqual(
+            locale.parse_accept_language('en_US, fr;q=0.3, es;q=1.5, de;q=0'),
+            ['en_US', 'fr']
+        )
+        self.assertEqual(locale.parse_accept_language(''), [])
+
+        fr_FR, ranked = locale.negotiate_ranked(
+            'xx;q=0.9, fr-CH-x-foo;q=abc, es-ES;q=0.5, fr-FR;q=0.8, *;q=0.1'
+        )
+        self.assertEqual(str(fr_FR), 'fr_FR')
+        self.assertEqual(ranked, ('fr_FR', 'es_ES', 'en_US'))
+        # The wildcard stands for the default locale
+        self.assertEqual(
+            locale.negotiate_ranked('*, es-ES;q=0.5')[1], ('en_US', 'es_ES')
+        )
+        # Locales which are not acceptable are never negotiated
+        self.assertEqual(
+            str(locale.negotiate('es-MX, es-ES;q=0, fr-FR;q=0.5')), 'fr_FR'
+        )
+        self.assertEqual(str(locale.negotiate('es-ES;q=0, *')), 'en_US')
+        self.assertEqual(locale.negotiate('; q=1, 12'), None)
+
+        # A range with q=0 does not exclude the locale it falls back to
+        directory = tempfile.mkdtemp()
+        try:
+            messages_dir = os.path.join(directory, 'fr', 'LC_MESSAGES')
+            os.makedirs(messages_dir)
+            make_mo_file(messages_dir)
+            registry = locale.LocaleRegistry()
+            registry.load_gettext_translations(directory, 'messages')
+            self.assertEqual(str(registry.negotiate('fr-CH;q=0, fr')), 'fr')
+            self.assertEqual(
+                str(registry.negotiate('fr;q=0, fr-CH, *')), 'en_US'
+            )
+        finally:
+            shutil.rmtree(directory)
+
+    def test_negotiation_cache(self):
+        header = 'fr-FR, es;q=0.5'
+        self.assertEqual(str(locale.negotiate(header)), 'fr_FR')
+        info = locale.get_negotiation_cache_info()
+        self.assertEqual(str(locale.negotiate(header)), 'fr_FR')
+        self.assertEqual(
+            locale.get_negotiation_cache_info()['hits'], info['hits'] + 1
+        )
+
+        # Changing the supported locales invalidates the cache
+        locale.set_default_locale('en_US')
+        self.assertEqual(locale.get_negotiation_cache_info()['size'], 0)
+
+        locale.set_negotiation_cache_size(0)
+        try:
+            self.assertEqual(str(locale.negotiate(header)), 'fr_FR')
+            self.assertEqual(locale.get_negotiation_cache_info()['size'], 0)
+        finally:
+            locale.set_negotiation_cache_size(512)
+
+    def test_instrumentation(self):
+        events = []
+        locale.set_instrumentation(callback=lambda *args: events.append(args))
+        try:
+            fr_FR = locale.get('fr_FR')
+            fr_FR.translate('Welcome')
+            fr_FR.translate_many(['Welcome', 'Missing'])
+            fr_FR.translate('apple', 'apples', 2)
+            locale.get('de_DE')
+            locale.negotiate('')
+
+            stats = locale.get_stats()
+            counters = stats['counters']
+            self.assertEqual(counters['translate.lookups'], 4)
+            self.assertEqual(counters['translate.misses'], 2)
+            # de_DE is not supported, the empty header names no locale
+            self.assertEqual(counters['locale.fallbacks'], 1)
+            self.assertEqual(counters['negotiation.unmatched'], 1)
+            caches = stats['caches']
+            self.assertEqual(
+                caches['locale']['hits'] + caches['locale']['misses'], 2
+            )
+            self.assertEqual(stats['timings']['negotiation']['count'], 1)
+            self.assertTrue(('counter', 'locale.fallbacks', 1) in events)
+        finally:
+            locale.set_instrumentation(False)
+        self.assertEqual(locale.get_stats(), {})
+
+
+class TestLazyLocale(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for lang in ('it_IT', 'nl_NL'):
+            messages_dir = os.path.join(self.directory, lang, 'LC_MESSAGES')
+            os.makedirs(messages_dir)
+            make_mo_file(messages_dir)
+        self.registry = locale.LocaleRegistry()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lazy_load(self):
+        self.registry.load_gettext_translations(
+            self.directory, 'messages', lazy=True
+        )
+        self.assertTrue('it_IT' in self.registry.supported_locales)
+        self.assertFalse('it_IT' in self.registry.translations)
+
+        it_IT = self.registry.get_closest('it-IT')
+        self.assertEqual(it_IT.translate('Welcome'), u'Bienvenue')
+        self.assertTrue('it_IT' in self.registry.translations)
+        self.assertFalse('nl_NL' in self.registry.translations)
+
+    def test_eviction(self):
+        self.registry.load_gettext_translations(
+            self.directory, 'messages', lazy=True
+        )
+        self.registry.set_locale_eviction(max_locales=1)
+        self.registry.get('it_IT')
+        self.registry.get('nl_NL')
+        self.assertFalse('it_IT' in self.registry.translations)
+        self.assertTrue('nl_NL' in self.registry.translations)
+
+        # Evicted locales are loaded again when needed
+        self.assertEqual(
+            self.registry.get('it_IT').translate('Welcome'), u'Bienvenue'
+        )
+
+        self.registry.set_locale_eviction(max_idle=0)
+        self.assertEqual(self.registry.evict_locales(), ['it_IT'])
+
+
+class TestAsyncLoad(testing.AsyncTestCase):
+    def setUp(self):
+        super(TestAsyncLoad, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        for lang in ('it_IT', 'nl_NL'):
+            messages_dir = os.path.join(self.directory, lang, 'LC_MESSAGES')
+            os.makedirs(messages_dir)
+            make_mo_file(messages_dir)
+            make_mo_file(messages_dir, 'plugin', welcome=u'Benvenuto')
+        self.registry = locale.LocaleRegistry()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestAsyncLoad, self).tearDown()
+
+    def test_async_load(self):
+        self.registry.load_gettext_translations(self.directory, 'messages')
+        it_IT = self.registry.get('it_IT')
+        self.registry.load_gettext_translations_async(
+            self.directory, 'plugin', callback=self.stop,
+            io_loop=self.io_loop
+        )
+        # Nothing changes until the catalogs are installed on the IOLoop
+        self.assertTrue(self.registry.get('it_IT') is it_IT)
+        self.assertEqual(it_IT.translations.domains, ['messages'])
+
+        result = self.wait()
+        self.assertEqual(sorted(result['locales']), ['it_IT', 'nl_NL'])
+        self.assertEqual(it_IT.translate('Welcome'), u'Bienvenue')
+        it_IT = self.registry.get('it_IT')
+        self.assertEqual(it_IT.translations.domains, ['messages', 'plugin'])
+        self.assertEqual(it_IT.translate('Welcome'), u'Benvenuto')
+        self.assertEqual(
+            it_IT.dtranslate('messages', 'Welcome'), u'Bienvenue'
+        )
+
+    def test_async_load_lazy(self):
+        self.registry.load_gettext_translations(
+            self.directory, 'messages', lazy=True
+        )
+        self.registry.get('nl_NL')
+        self.registry.load_gettext_translations_async(
+            self.directory, 'plugin', callback=self.stop,
+            io_loop=self.io_loop
+        )
+        result = self.wait()
+        self.assertEqual(sorted(result['locales']), ['nl_NL'])
+        self.assertFalse('it_IT' in self.registry.translations)
+        # The lazy languages are loaded with the new domain when needed
+        for lang in ('it_IT', 'nl_NL'):
+            self.assertEqual(
+                self.registry.get(lang).translate('Welcome'), u'Benvenuto'
+            )
+
+    def test_async_load_error(self):
+        self.registry.load_gettext_translations_async(
+            os.path.join(self.directory, 'missing'), 'messages',
+            callback=self.stop, io_loop=self.io_loop
+        )
+        self.assertRaises(OSError, self.wait)
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.messages_dir = os.path.join(
+            self.directory, 'it_IT', 'LC_MESSAGES'
+        )
+        os.makedirs(self.messages_dir)
+        make_mo_file(self.messages_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_registries(self):
+        registry = locale.LocaleRegistry(default_locale='de_DE')
+        registry.load_gettext_translations(self.directory, 'messages')
+        self.assertEqual(
+            registry.supported_locales, frozenset(['de_DE', 'it_IT'])
+        )
+        self.assertEqual(str(registry.get_closest('it-it')), 'it_IT')
+        self.assertEqual(str(registry.get_closest('es')), 'de_DE')
+        self.assertEqual(str(registry.negotiate('it-IT')), 'it_IT')
+        # The registries are independent
+        self.assertFalse('it_IT' in locale.default_registry.translations)
+        self.assertFalse(registry.get('it_IT') is locale.get('it_IT'))
+
+        other = locale.LocaleRegistry()
+        self.assertEqual(str(other.get_closest('it-it')), 'en_US')
+
+    def test_copy_on_write(self):
+        registry = locale.LocaleRegistry()
+        registry.load_gettext_translations(self.directory, 'messages')
+        it_IT = registry.get('it_IT')
+        translations = registry.translations
+        catalog = translations['it_IT']
+
+        make_mo_file(self.messages_dir, 'plugin', welcome=u'Benvenuto')
+        registry.load_gettext_translations(self.directory, 'plugin')
+        # The snapshot and the Locale in use are not changed
+        self.assertTrue(translations['it_IT'] is catalog)
+        self.assertEqual(catalog.domains, ['messages'])
+        self.assertEqual(it_IT.translate('Welcome'), u'Bienvenue')
+
+        self.assertFalse(registry.get('it_IT') is it_IT)
+        self.assertEqual(
+            registry.get('it_IT').translate('Welcome'), u'Benvenuto'
+        )
+
+
+class TestOverlay(unittest.TestCase):
+    def setUp(self):
+        self.base = locale.LocaleRegistry()
+        self.base.load_gettext_translations(LOCALES_DIR, 'messages')
+        self.overlay = locale.OverlayRegistry(self.base)
+        self.overlay.add_messages('fr_FR', {u'Welcome': u'Salut'})
+
+    def test_overlay(self):
+        fr_FR = self.overlay.get('fr_FR')
+        self.assertEqual(fr_FR.translate('Welcome'), u'Salut')
+        self.assertEqual(fr_FR.dtranslate('messages', 'Welcome'), u'bienvenu')
+        self.assertEqual(
+            self.base.get('fr_FR').translate('Welcome'), u'bienvenu'
+        )
+        # The catalogs of the base are shared, not copied
+        base = self.base.translations['fr_FR']
+        self.assertTrue(fr_FR.translations.catalogs[0][2] is
+                        base.catalogs[0][2])
+        # The languages without overrides use the Locale of the base
+        self.assertTrue(self.overlay.get('es_ES') is self.base.get('es_ES'))
+        self.assertEqual(
+            str(self.overlay.negotiate('fr-FR, es;q=0.5')), 'fr_FR'
+        )
+        locale_, codes = self.overlay.negotiate_ranked('fr-FR, es-ES;q=0.5')
+        self.assertTrue(locale_ is fr_FR)
+        self.assertEqual(codes, ('fr_FR', 'es_ES'))
+
+    def test_follow_base(self):
+        directory = tempfile.mkdtemp()
+        try:
+            messages_dir = os.path.join(directory, 'it_IT', 'LC_MESSAGES')
+            os.makedirs(messages_dir)
+            make_mo_file(messages_dir, welcome=u'Benvenuto')
+            self.assertFalse('it_IT' in self.overlay.supported_locales)
+            self.base.load_gettext_translations(directory, 'messages')
+            self.assertEqual(
+                self.overlay.get('it_IT').translate('Welcome'), u'Benvenuto'
+            )
+
+            # Overrides loaded from a locale tree
+            make_mo_file(messages_dir, 'tenant', welcome=u'Ciao')
+            self.overlay.load_gettext_translations(directory, 'tenant')
+            self.assertEqual(
+                self.overlay.get('it_IT').translate('Welcome'), u'Ciao'
+            )
+            self.assertEqual(
+                self.overlay.get('fr_FR').translate('Welcome'), u'Salut'
+            )
+            self.assertEqual(
+                self.base.get('it_IT').translate('Welcome'), u'Benvenuto'
+            )
+        finally:
+            shutil.rmtree(directory)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -14,6 +14,7 @@ import unittest
 from tornado import web
 from tornado import testing
 from tornadobabel import locale
+from tornadobabel.catalog import CompiledCatalog
 from tornadobabel.mixin import TornadoBabelMixin
 
 
@@ -98,6 +99,77 @@ class TestMerge(testing.AsyncHTTPTestCase):
         self.assertEqual(response.code, 200)
         self.assertEqual(response.body, "bienvenido / Adios\n")
 
+    def test_parallel_load(self):
+        test_dir = os.path.abspath(os.path.dirname(__file__))
+        timings = locale.load_gettext_translations(
+            os.path.join(test_dir, 'locales'), 'addit', workers=4
+        )
+        self.assertEqual(
+            sorted(timings['locales'].keys()), ['es_ES', 'fr_FR']
+        )
+        self.assertTrue(timings['total'] >= 0)
+
+        response = self.fetch('/mixed?locale=es_ES')
+        self.assertEqual(response.body, "bienvenido / Adios\n")
+
+    def test_compiled_catalogs(self):
+        locale.set_compiled_catalogs(True)
+        try:
+            fr_FR = locale.get('fr_FR')
+            self.assertTrue(isinstance(fr_FR.translations, CompiledCatalog))
+            self.assertEqual(fr_FR.translate('Goodbye'), "Au revoir")
+
+            response = self.fetch('/mixed?locale=fr_FR')
+            self.assertEqual(response.body, "bienvenu / Au revoir\n")
+        finally:
+            locale.set_compiled_catalogs(False)
+        self.assertFalse(
+            isinstance(locale.get('fr_FR').translations, CompiledCatalog)
+        )
+
+    def test_translate_many(self):
+        fr_FR = locale.get('fr_FR')
+        self.assertEqual(
+            fr_FR.translate_many(['Welcome', 'Goodbye', 'Missing']),
+            [u'bienvenu', u'Au revoir', u'Missing']
+        )
+        self.assertEqual(
+            fr_FR.translate_many({'title': 'Welcome', 'bye': 'Goodbye'}),
+            {'title': u'bienvenu', 'bye': u'Au revoir'}
+        )
+        self.assertEqual(
+            fr_FR.translate_plurals([('Goodbye', 'Goodbyes', 2)]),
+            [u'Goodbyes']
+        )
+
+    def test_domains(self):
+        fr_FR = locale.get('fr_FR')
+        self.assertEqual(fr_FR.dtranslate('messages', 'Welcome'), u'bienvenu')
+        self.assertEqual(fr_FR.dtranslate('addit', 'Welcome'), u'Welcome')
+        self.assertEqual(fr_FR.dtranslate('addit', 'Goodbye'), u'Au revoir')
+        self.assertEqual(
+            fr_FR.dtranslate('addit', 'Goodbye', 'Goodbyes', 2), u'Goodbyes'
+        )
+
+        # Loading a domain again replaces its catalog
+        translations = locale.default_registry.translations
+        catalogs = len(translations['fr_FR'].catalogs)
+        test_dir = os.path.abspath(os.path.dirname(__file__))
+        locale.load_gettext_translations(
+            os.path.join(test_dir, 'locales'), 'addit'
+        )
+        self.assertEqual(
+            len(locale.default_registry.translations['fr_FR'].catalogs),
+            catalogs
+        )
+
+        locale.set_compiled_catalogs(True)
+        try:
+            fr_FR = locale.get('fr_FR')
+            self.assertEqual(fr_FR.dtranslate('addit', 'Welcome'), u'Welcome')
+        finally:
+            locale.set_compiled_catalogs(False)
+
 
 if __name__ == "__main__":
     unittest.main()
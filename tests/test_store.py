@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+    test_store
+
+    Test the catalog store shared by the worker processes
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from babel.support import Translations
+
+from tornadobabel import locale
+from tornadobabel.catalog import DomainCatalog
+from tornadobabel.frontend import main
+from tornadobabel.store import CatalogStore, build_store, hash_slot, \
+    perfect_hash, write_store
+
+from test_catalog import LOCALES_DIR, make_mo_file
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'catalogs.store')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store(self):
+        catalogs = {}
+        for lang in ('es_ES', 'fr_FR'):
+            catalogs[lang] = DomainCatalog()
+            for domain in ('messages', 'addit'):
+                catalogs[lang].add(
+                    domain, Translations.load(LOCALES_DIR, [lang], domain)
+                )
+        with open(make_mo_file(self.directory), 'rb') as fileobj:
+            catalogs['fr_FR'].add('plugin', Translations(fileobj))
+        write_store(self.path, catalogs)
+
+        store = CatalogStore(self.path)
+        try:
+            self.assertEqual(store.languages, ['es_ES', 'fr_FR'])
+            messages = [u'Welcome', u'Goodbye', u'Caf\xe9', u'Missing']
+            for lang in store.languages:
+                stored = store.catalog(lang)
+                for message in messages:
+                    self.assertEqual(
+                        stored.ugettext(message),
+                        catalogs[lang].ugettext(message)
+                    )
+                for count in (0, 1, 2):
+                    plural = (u'%(num)d apple', u'%(num)d apples', count)
+                    self.assertEqual(
+                        stored.ungettext(*plural),
+                        catalogs[lang].ungettext(*plural)
+                    )
+            self.assertEqual(
+                store.catalog('fr_FR').ungettext(
+                    u'%(num)d apple', u'%(num)d apples', 2
+                ), u'%(num)d pommes'
+            )
+            stored = store.catalog('fr_FR')
+            self.assertEqual(stored.domains, ['addit', 'messages', 'plugin'])
+            for domain in stored.domains:
+                for message in messages:
+                    self.assertEqual(
+                        stored.dugettext(domain, message),
+                        catalogs['fr_FR'].dugettext(domain, message)
+                    )
+        finally:
+            store.close()
+
+    def test_perfect_hash(self):
+        keys = ['Message %d' % index for index in xrange(5000)] + ['']
+        displacements, slots = perfect_hash(keys)
+        self.assertTrue(len(slots) >= len(keys))
+        found = [
+            slots[hash_slot(key, displacements, len(slots))] for key in keys
+        ]
+        self.assertEqual(found, range(len(keys)))
+
+    def test_build_store(self):
+        self.assertEqual(build_store(LOCALES_DIR, self.path), 4)
+        store = CatalogStore(self.path)
+        try:
+            self.assertEqual(
+                [entry[:2] for entry in store.entries], [
+                    ('es_ES', 'addit'), ('es_ES', 'messages'),
+                    ('fr_FR', 'addit'), ('fr_FR', 'messages'),
+                ]
+            )
+            catalog = store.catalog('es_ES')
+            self.assertEqual(
+                catalog.ugettext(u'Welcome'),
+                Translations.load(LOCALES_DIR, ['es_ES']).ugettext(u'Welcome')
+            )
+            self.assertEqual(catalog.ugettext(u'Missing'), u'Missing')
+        finally:
+            store.close()
+
+        self.assertEqual(main([
+            'build', '-o', self.path, '-D', 'messages', LOCALES_DIR
+        ]), 0)
+        store = CatalogStore(self.path)
+        try:
+            self.assertEqual(
+                [entry[:2] for entry in store.entries],
+                [('es_ES', 'messages'), ('fr_FR', 'messages')]
+            )
+        finally:
+            store.close()
+
+    def test_load_catalog_store(self):
+        registry = locale.LocaleRegistry()
+        registry.load_gettext_translations(LOCALES_DIR, 'messages')
+        registry.save_catalog_store(self.path)
+        store = registry.load_catalog_store(self.path)
+        es_ES = registry.get('es_ES')
+        self.assertTrue(
+            es_ES.translations.catalogs[0][2].files[0]._map is store._map
+        )
+        self.assertEqual(es_ES.translate('Welcome'), u'bienvenido')
+        self.assertEqual(
+            es_ES.dtranslate('messages', 'Welcome'), u'bienvenido'
+        )
+
+if __name__ == "__main__":
+    unittest.main()
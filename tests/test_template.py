@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+    test_template
+
+    Test the templates compiled for a locale
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import unittest
+
+from tornado import web
+from tornado import testing
+from tornadobabel import locale
+from tornadobabel.template import TranslatedTemplate, TranslatingLoader, \
+    translate_expression
+
+from test_merge import BaseHandler, MixedHandler
+
+
+class FakeLocale(object):
+    def __init__(self, messages):
+        self.translate = messages.get
+
+
+class TestTemplate(testing.AsyncHTTPTestCase):
+    def get_app(self):
+        test_dir = os.path.abspath(os.path.dirname(__file__))
+        locale.load_gettext_translations(
+            os.path.join(test_dir, 'locales'), 'messages'
+        )
+        locale.load_gettext_translations(
+            os.path.join(test_dir, 'locales'), 'addit'
+        )
+        self.loader = TranslatingLoader(test_dir)
+        return web.Application([
+            ('/', BaseHandler),
+            ('/mixed', MixedHandler),
+        ], template_loader=self.loader)
+
+    def test_render(self):
+        response = self.fetch('/mixed?locale=fr_FR')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, "bienvenu / Au revoir\n")
+
+        response = self.fetch('/mixed')
+        self.assertEqual(response.body, "Welcome / Goodbye\n")
+
+        # The translations are part of the compiled template
+        template = self.loader.for_locale(locale.get('es_ES')).load('mixed.html')
+        self.assertTrue("'bienvenido'" in template.code)
+        self.assertFalse("_(" in template.code)
+
+    def test_tenant_loaders(self):
+        base = locale.LocaleRegistry()
+        base.load_gettext_translations(
+            os.path.join(os.path.dirname(__file__), 'locales'), 'messages'
+        )
+        tenants = []
+        for welcome in (u'Salut', u'Coucou'):
+            tenant = locale.OverlayRegistry(base)
+            tenant.add_messages('fr_FR', {u'Welcome': welcome})
+            tenants.append(tenant.get('fr_FR'))
+
+        # Each tenant keeps its loader while requests alternate between them
+        loaders = [self.loader.for_locale(fr_FR) for fr_FR in tenants]
+        self.assertTrue(loaders[0] is not loaders[1])
+        for fr_FR, loader in zip(tenants, loaders):
+            self.assertTrue(self.loader.for_locale(fr_FR) is loader)
+            template = loader.load('mixed.html')
+            self.assertTrue(loader.load('mixed.html') is template)
+        self.assertEqual(
+            loaders[1].load('mixed.html').generate(), "Coucou / Goodbye\n"
+        )
+
+    def test_static_text(self):
+        fr_FR = FakeLocale({'Tom & Jerry': u'Tom & J\xe9r\xf4me'})
+        template = TranslatedTemplate(
+            '{{ _("Tom & Jerry") }}|{% raw _("Tom & Jerry") %}', locale=fr_FR
+        )
+        self.assertFalse("xhtml_escape" in template.code)
+        self.assertEqual(
+            template.generate(),
+            'Tom &amp; J\xc3\xa9r\xc3\xb4me|Tom & J\xc3\xa9r\xc3\xb4me'
+        )
+        # The translations are not escaped with unknown functions
+        template = TranslatedTemplate(
+            '{% autoescape upper %}{{ _("Tom & Jerry") }}', locale=fr_FR
+        )
+        self.assertEqual(
+            template.generate(upper=lambda s: s.upper()),
+            'TOM & J\xc3\xa9R\xc3\xb4ME'
+        )
+
+    def test_translate_expression(self):
+        translate = {'Hello': u'H\xe9llo "you"'}.get
+        self.assertEqual(
+            translate_expression('_("Hello") % name', translate),
+            "u'H\\xe9llo \"you\"' % name"
+        )
+        self.assertEqual(
+            translate_expression('obj._("Hello")', translate),
+            'obj._("Hello")'
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+    test_watcher
+
+    Test the reload of translations when their files change
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from tornado import testing
+from tornadobabel import locale
+from tornadobabel.watcher import TranslationsWatcher
+
+from test_catalog import make_mo_file
+
+
+class TestWatcher(testing.AsyncTestCase):
+    def setUp(self):
+        super(TestWatcher, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.messages_dir = os.path.join(self.directory, 'pt_PT', 'LC_MESSAGES')
+        os.makedirs(self.messages_dir)
+        make_mo_file(self.messages_dir, welcome=u'Bem-vindo')
+        self.registry = locale.LocaleRegistry()
+        self.registry.load_gettext_translations(self.directory, 'messages')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestWatcher, self).tearDown()
+
+    def test_reload(self):
+        watcher = TranslationsWatcher(
+            io_loop=self.io_loop, registry=self.registry
+        )
+        watcher.start()
+        try:
+            pt_PT = self.registry.get('pt_PT')
+            self.assertEqual(pt_PT.translate('Welcome'), u'Bem-vindo')
+
+            # Nothing changed
+            watcher.check()
+            self.assertTrue(self.registry.get('pt_PT') is pt_PT)
+
+            filename = make_mo_file(self.messages_dir, welcome=u'Ola')
+            later = time.time() + 10
+            os.utime(filename, (later, later))
+            watcher.check()
+            self.io_loop.add_callback(self.stop)
+            self.wait()
+        finally:
+            watcher.stop()
+
+        self.assertEqual(
+            self.registry.get('pt_PT').translate('Welcome'), u'Ola'
+        )
+        # Locale objects in use keep their catalog
+        self.assertEqual(pt_PT.translate('Welcome'), u'Bem-vindo')
+
+    def _check(self, watcher):
+        watcher.check()
+        self.io_loop.add_callback(self.stop)
+        self.wait()
+
+    def test_reload_file(self):
+        make_mo_file(self.messages_dir, 'addit', welcome=u'Ola')
+        self.registry.load_gettext_translations(self.directory, 'addit')
+        messages_source = self.registry.sources[0]
+        watcher = TranslationsWatcher(
+            io_loop=self.io_loop, registry=self.registry
+        )
+        watcher.start()
+        try:
+            catalogs = dict(
+                (entry[0], entry[2]) for entry in
+                self.registry.translations['pt_PT'].catalogs
+            )
+            self.assertEqual(
+                self.registry.get('pt_PT').translate('Welcome'), u'Ola'
+            )
+
+            # Only the catalog of the changed file is loaded again
+            filename = make_mo_file(
+                self.messages_dir, 'addit', welcome=u'Oi'
+            )
+            later = time.time() + 10
+            os.utime(filename, (later, later))
+            self._check(watcher)
+            catalog = self.registry.translations['pt_PT']
+            self.assertEqual(catalog.ugettext('Welcome'), u'Oi')
+            self.assertEqual(
+                [entry[0] for entry in catalog.catalogs],
+                self.registry.sources
+            )
+            self.assertTrue(catalog.catalogs[0][2] is
+                            catalogs[messages_source])
+
+            # The catalog of a removed file is dropped
+            os.remove(filename)
+            self._check(watcher)
+            catalog = self.registry.translations['pt_PT']
+            self.assertEqual(catalog.ugettext('Welcome'), u'Bem-vindo')
+            self.assertEqual(len(catalog), 1)
+            self.assertTrue(catalog.catalogs[0][2] is
+                            catalogs[messages_source])
+
+            # A file created again takes precedence as it did
+            make_mo_file(self.messages_dir, 'addit', welcome=u'Ola')
+            self._check(watcher)
+            self.assertEqual(
+                self.registry.get('pt_PT').translate('Welcome'), u'Ola'
+            )
+            filename = os.path.join(self.messages_dir, 'messages.mo')
+            os.remove(filename)
+            self._check(watcher)
+            make_mo_file(self.messages_dir, welcome=u'Bem-vindo')
+            self._check(watcher)
+            catalog = self.registry.translations['pt_PT']
+            self.assertEqual(
+                [entry[0] for entry in catalog.catalogs],
+                self.registry.sources
+            )
+            self.assertEqual(catalog.ugettext('Welcome'), u'Ola')
+        finally:
+            watcher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
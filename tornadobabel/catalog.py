@@ -0,0 +1,872 @@
+# -*- coding: utf-8 -*-
+"""
+    catalog
+
+    Alternative message catalogs which could be used by
+    :class:`tornadobabel.locale.Locale` in place of babel's `Translations`.
+
+    All the catalogs implement the ``ugettext`` and ``ungettext`` methods
+    of :class:`gettext.NullTranslations`, so they are interchangeable with
+    the translations loaded by babel.
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import codecs
+import gettext
+import mmap
+import struct
+from array import array
+
+
+#: Number of counts for which the plural form is precomputed
+PLURAL_TABLE_SIZE = 100
+
+
+def _default_plural(n):
+    return int(n != 1)
+
+
+def iter_messages(translations):
+    """Returns an iterator over the ``(key, message)`` pairs of a catalog, the
+    keys of plural messages being ``(msgid, index)`` tuples as in
+    :class:`gettext.GNUTranslations`.
+    """
+    if hasattr(translations, 'iteritems'):
+        return translations.iteritems()
+    return getattr(translations, '_catalog', {}).iteritems()
+
+
+class DictCatalog(gettext.GNUTranslations):
+    """A catalog of the messages of a dictionary, like the few messages a
+    tenant overrides (see :meth:`DomainCatalog.overlay`).
+
+    The keys of plural messages are ``(msgid, index)`` tuples as in
+    :class:`gettext.GNUTranslations`, whose lookups the catalog uses.
+
+    >>> catalog = DictCatalog({u'Save': u'Sauvegarder'})
+    >>> catalog.ugettext(u'Save'), catalog.ugettext(u'Cancel')
+    (u'Sauvegarder', u'Cancel')
+
+    :param messages: the dictionary of the messages
+    :param plural: the function returning the index of the plural form for
+                   a count, the English one by default
+    """
+    def __init__(self, messages, plural=None):
+        gettext.GNUTranslations.__init__(self)
+        self._catalog = dict(messages)
+        self.plural = plural or _default_plural
+
+
+class CompiledCatalog(object):
+    """A read only catalog flattened from a translations object and its
+    fallbacks into plain dictionaries.
+
+    Singular messages are stored as `msgid -> message` and plural messages
+    as `msgid -> tuple of forms`. The plural form for the counts below
+    :data:`PLURAL_TABLE_SIZE` is computed once when the catalog is built, so
+    a lookup never evaluates the plural expression of the catalog for them.
+
+    >>> translations = gettext.NullTranslations()
+    >>> translations._catalog = {
+    ...     u'Apple': u'Pomme',
+    ...     (u'%d apple', 0): u'%d pomme', (u'%d apple', 1): u'%d pommes'}
+    >>> catalog = CompiledCatalog(translations)
+    >>> catalog.ugettext(u'Apple'), catalog.ugettext(u'Pear')
+    (u'Pomme', u'Pear')
+    >>> catalog.ungettext(u'%d apple', u'%d apples', 2)
+    u'%d pommes'
+    """
+    def __init__(self, translations):
+        chain = []
+        while translations is not None:
+            chain.append(translations)
+            translations = getattr(translations, '_fallback', None)
+
+        self.messages = messages = {}
+        plurals = {}
+        # Walk the fallbacks first so that the primary catalog wins
+        for translations in reversed(chain):
+            for key, value in iter_messages(translations):
+                if isinstance(key, tuple):
+                    msgid, index = key
+                    plurals.setdefault(msgid, {})[index] = value
+                else:
+                    messages[key] = value
+
+        self.plurals = {}
+        for msgid, forms in plurals.iteritems():
+            self.plurals[msgid] = tuple(
+                forms.get(index) for index in xrange(max(forms) + 1)
+            )
+
+        self.plural = getattr(chain[0], 'plural', _default_plural)
+        self.plural_table = tuple(
+            self.plural(n) for n in xrange(PLURAL_TABLE_SIZE)
+        )
+        #: The catalog compiled, for the lookups in a single domain
+        self.source = chain[0]
+
+    def find(self, message):
+        """Returns the translation of the message, or None if the catalog
+        has none.
+        """
+        return self.messages.get(message)
+
+    def find_plural(self, msgid1, n):
+        """Returns the plural form of the translation of the message for
+        `n`, or None if the catalog has none.
+        """
+        forms = self.plurals.get(msgid1)
+        if forms is not None:
+            if type(n) is int and 0 <= n < PLURAL_TABLE_SIZE:
+                index = self.plural_table[n]
+            else:
+                index = self.plural(n)
+            if index < len(forms):
+                return forms[index]   # None if the form is missing
+        return None
+
+    def ugettext(self, message):
+        # A miss costs less than with a KeyError raised and caught
+        result = self.messages.get(message)
+        if result is None:
+            return unicode(message)
+        return result
+
+    def ungettext(self, msgid1, msgid2, n):
+        # find_plural inlined
+        forms = self.plurals.get(msgid1)
+        if forms is not None:
+            if type(n) is int and 0 <= n < PLURAL_TABLE_SIZE:
+                index = self.plural_table[n]
+            else:
+                index = self.plural(n)
+            if index < len(forms):
+                result = forms[index]
+                if result is not None:
+                    return result
+        if n == 1:
+            return unicode(msgid1)
+        return unicode(msgid2)
+
+    def dugettext(self, domain, message):
+        """Translates the message with the catalogs of the domain only, if
+        the catalog compiled kept its domains apart.
+        """
+        if hasattr(self.source, 'dugettext'):
+            return self.source.dugettext(domain, message)
+        return self.ugettext(message)
+
+    def dungettext(self, domain, msgid1, msgid2, n):
+        if hasattr(self.source, 'dungettext'):
+            return self.source.dungettext(domain, msgid1, msgid2, n)
+        return self.ungettext(msgid1, msgid2, n)
+
+    def iteritems(self):
+        for item in self.messages.iteritems():
+            yield item
+        for msgid, forms in self.plurals.iteritems():
+            for index, form in enumerate(forms):
+                if form is not None:
+                    yield (msgid, index), form
+
+    def __len__(self):
+        return len(self.messages) + len(self.plurals)
+
+
+class MoFile(object):
+    """A read only view of a compiled gettext ``.mo`` file which is read as
+    a single string instead of being parsed into a dictionary.
+
+    Messages are looked up with a binary search on the table of original
+    strings of the file, and only the message found is copied out of it.
+    The processes forked after loading a catalog share its pages.
+
+    If `mapped` is True, the file is memory mapped instead of read, and its
+    pages are also shared by all the processes mapping the same file. A
+    mapped file must then only be replaced by renaming a new file over it,
+    as ``tornadobabel compile`` does: a process whose mapped file is
+    truncated or rewritten in place, as ``pybabel compile`` does, is killed
+    by a bus error on its next lookup.
+
+    The ``.mo`` data could also be read from a `buffer` already mapped,
+    starting at `offset`, in which case the buffer is not closed with the
+    file. If the original strings are known to be sorted, `presorted`
+    skips checking them.
+    """
+    LE_MAGIC = 0x950412deL
+    BE_MAGIC = 0xde120495L
+
+    def __init__(self, filename, buffer=None, offset=0, presorted=False,
+            mapped=False):
+        self.filename = filename
+        self._owns_map = buffer is None and mapped
+        if buffer is None:
+            with open(filename, 'rb') as fileobj:
+                if mapped:
+                    buffer = mmap.mmap(
+                        fileobj.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                else:
+                    buffer = fileobj.read()
+        self._map = buf = buffer
+        self._base = offset
+        magic, = struct.unpack_from('<I', buf, offset)
+        if magic == self.LE_MAGIC:
+            order = '<'
+        elif magic == self.BE_MAGIC:
+            order = '>'
+        else:
+            raise IOError(0, 'Bad magic number', filename)
+        self._pair = struct.Struct(order + 'II')
+        version, self._count, originals, translations = \
+            struct.unpack_from(order + '4I', buf, offset + 4)
+        if version >> 16 not in (0, 1):
+            raise IOError(0, 'Bad version number', filename)
+        self._originals = offset + originals
+        self._translations = offset + translations
+        self._order = None
+        if not presorted and not self._is_sorted():
+            self._order = array('I', sorted(
+                xrange(self._count), key=self._original
+            ))
+
+        self.charset = 'utf-8'
+        self.plural = _default_plural
+        self.plural_forms = None
+        header = self.lookup('')
+        if header:
+            self._parse_header(header)
+
+    def _parse_header(self, header):
+        for line in header.splitlines():
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            if name == 'content-type' and 'charset=' in value:
+                self.charset = value.split('charset=')[1].strip()
+                try:
+                    # The canonical name of the codec, for which decoding
+                    # takes a shortcut
+                    self.charset = codecs.lookup(self.charset).name
+                except LookupError:
+                    pass
+            elif name == 'plural-forms' and 'plural=' in value:
+                self.plural_forms = value.strip()
+                self.plural = gettext.c2py(
+                    value.split('plural=')[1].split(';')[0].strip()
+                )
+
+    def _string(self, table, index):
+        length, offset = self._pair.unpack_from(self._map, table + 8 * index)
+        offset += self._base
+        return self._map[offset:offset + length]
+
+    def _original(self, index):
+        """Returns the msgid of the entry, without its plural msgid"""
+        original = self._string(self._originals, index)
+        end = original.find('\0')
+        if end >= 0:
+            return original[:end]
+        return original
+
+    def _is_sorted(self):
+        previous = None
+        for index in xrange(self._count):
+            original = self._original(index)
+            if previous is not None and original < previous:
+                return False
+            previous = original
+        return True
+
+    def lookup(self, msgid):
+        """Returns the translation of the byte string `msgid` as a byte
+        string (the plural forms separated by NUL), or None if the file has
+        no translation for it.
+        """
+        # The reading of the strings is inlined, as this is called for every
+        # lookup, and unpacking a slice is faster than unpacking the mapping
+        buf, base, unpack = self._map, self._base, self._pair.unpack
+        originals = self._originals
+        low, high = 0, self._count
+        order = self._order
+        while low < high:
+            middle = (low + high) // 2
+            index = middle if order is None else order[middle]
+            position = originals + 8 * index
+            length, offset = unpack(buf[position:position + 8])
+            offset += base
+            original = buf[offset:offset + length]
+            end = original.find('\0')
+            if end >= 0:
+                original = original[:end]
+            if original < msgid:
+                low = middle + 1
+            elif original > msgid:
+                high = middle
+            else:
+                return self._string(self._translations, index)
+        return None
+
+    def __len__(self):
+        return self._count
+
+    def iteritems(self):
+        charset = self.charset
+        for index in xrange(self._count):
+            original = self._string(self._originals, index)
+            message = self._string(self._translations, index)
+            if '\0' in original:
+                msgid = original.split('\0')[0].decode(charset)
+                for form, plural in enumerate(message.split('\0')):
+                    yield (msgid, form), plural.decode(charset)
+            else:
+                yield original.decode(charset), message.decode(charset)
+
+    def close(self):
+        if self._owns_map:
+            self._map.close()
+
+
+class MoCatalog(gettext.NullTranslations):
+    """A catalog which looks messages up in ``.mo`` files left unparsed,
+    see :class:`MoFile`. It could be used in place of babel's
+    `Translations` by passing it as the `catalog_class` of
+    :func:`tornadobabel.locale.load_gettext_translations`.
+
+    Merging another `MoCatalog` into the catalog does not copy any message,
+    the files of both are searched, the merged ones first.
+
+    Searching the files and decoding the message found takes many times as
+    long as the dictionary lookup of a parsed catalog, so the messages found
+    are kept decoded and only their first lookup pays for it. The catalog
+    then trades the memory of the messages used by each process for the
+    load time and the memory of the messages it never translates.
+    """
+    #: Whether the files loaded are memory mapped, see :class:`MoFile`
+    mapped = False
+    #: Whether the messages found are kept decoded
+    cache = True
+
+    def __init__(self, files=(), domain=None):
+        gettext.NullTranslations.__init__(self)
+        self.files = list(files)
+        self.domain = domain
+        if self.files:
+            self.plural = self.files[0].plural
+        else:
+            self.plural = _default_plural
+        self._clear_cache()
+
+    def _clear_cache(self):
+        # message -> its translation, msgid -> its plural forms
+        if self.cache:
+            self._found, self._forms = {}, {}
+        else:
+            self._found = self._forms = None
+
+    @classmethod
+    def load(cls, dirname=None, locales=None, domain='messages'):
+        """Loads the catalog of the given domain with the same lookup as
+        babel's `Translations.load`. Returns a
+        :class:`gettext.NullTranslations` if there is no such catalog.
+        """
+        if locales is not None:
+            if not isinstance(locales, (list, tuple)):
+                locales = [locales]
+            locales = [str(locale) for locale in locales]
+        filename = gettext.find(domain, dirname, locales)
+        if not filename:
+            return gettext.NullTranslations()
+        return cls([MoFile(filename, mapped=cls.mapped)], domain)
+
+    def merge(self, translations):
+        """Merges the files of the given `MoCatalog` in front of the files of
+        this catalog, so that its messages take precedence.
+        """
+        if isinstance(translations, MoCatalog):
+            self.files[:0] = translations.files
+            if self.files:
+                self.plural = self.files[0].plural
+            self._clear_cache()
+        return self
+
+    def _lookup(self, message):
+        # The message is only encoded again for a file of another charset
+        msgid = message
+        charset = None
+        for mofile in self.files:
+            if isinstance(message, unicode) and mofile.charset != charset:
+                charset = mofile.charset
+                msgid = message.encode(charset)
+            translation = mofile.lookup(msgid)
+            if translation is not None:
+                return mofile, translation
+        return None, None
+
+    def find(self, message):
+        """Returns the translation of the message in the files, or None if
+        they have none.
+        """
+        found = self._found
+        if found is not None:
+            result = found.get(message)
+            if result is not None:
+                return result
+        mofile, translation = self._lookup(message)
+        if mofile is None or '\0' in translation:
+            return None
+        result = unicode(translation, mofile.charset)
+        if found is not None:
+            found[message] = result
+        return result
+
+    def find_plural(self, msgid1, n):
+        """Returns the plural form of the translation of the message for
+        `n` in the files, or None if they have none.
+        """
+        forms = self._forms
+        entry = forms.get(msgid1) if forms is not None else None
+        if entry is None:
+            mofile, translation = self._lookup(msgid1)
+            if mofile is None:
+                return None
+            entry = (mofile.plural, [
+                unicode(form, mofile.charset)
+                for form in translation.split('\0')
+            ])
+            if forms is not None:
+                forms[msgid1] = entry
+        plural, translations = entry
+        index = plural(n)
+        if index < len(translations):
+            return translations[index]
+        return None
+
+    def ugettext(self, message):
+        result = self.find(message)
+        if result is not None:
+            return result
+        if self._fallback:
+            return self._fallback.ugettext(message)
+        return unicode(message)
+
+    def ungettext(self, msgid1, msgid2, n):
+        result = self.find_plural(msgid1, n)
+        if result is not None:
+            return result
+        if self._fallback:
+            return self._fallback.ungettext(msgid1, msgid2, n)
+        if n == 1:
+            return unicode(msgid1)
+        return unicode(msgid2)
+
+    def iteritems(self):
+        """Iterates over the messages of all the files, the ones of the
+        files taking precedence last.
+        """
+        for mofile in reversed(self.files):
+            for item in mofile.iteritems():
+                yield item
+
+
+class MappedMoCatalog(MoCatalog):
+    """A :class:`MoCatalog` whose files are memory mapped, so that all the
+    processes loading them share their pages. The files must only be
+    replaced by renaming new files over them, see :class:`MoFile`.
+    """
+    mapped = True
+
+
+def _own_table(translations):
+    """Returns the lookup table of a catalog without fallbacks, see
+    :func:`_lookup_table`.
+    """
+    if getattr(translations, '_fallback', None) is None:
+        return _lookup_table(translations)
+    return None
+
+
+def _finders(translations):
+    """Returns the functions looking a singular and a plural message up in
+    the catalog, without its fallbacks, which return None if the catalog
+    has no translation.
+    """
+    table = _own_table(translations)
+    if table is not None:
+        plural = getattr(translations, 'plural', _default_plural)
+        return table.get, lambda msgid1, n: table.get((msgid1, plural(n)))
+    if hasattr(translations, 'find'):
+        return translations.find, translations.find_plural
+
+    # Any other catalog, a message translated to itself is not found
+    def find(message):
+        result = translations.ugettext(message)
+        if result != message:
+            return result
+
+    def find_plural(msgid1, n):
+        result = translations.ungettext(msgid1, msgid1, n)
+        if result != msgid1:
+            return result
+    return find, find_plural
+
+
+class DomainCatalog(gettext.NullTranslations):
+    """The catalogs of all the domains loaded for a language, kept apart
+    instead of being merged into a single one.
+
+    A message is looked up in the catalogs in the reverse order they were
+    added, so that the catalogs added last take precedence as if they had
+    been merged. The lookup order is computed when a catalog is added: the
+    dictionaries of consecutive gettext catalogs are combined into a few
+    lookup dictionaries. The messages of the catalog added are copied to
+    the newest one, which is merged with the one before once it is as
+    large, so that adding a catalog costs only its own size (amortised)
+    and a message is looked up in a few dictionaries at most.
+
+    >>> app, plugin = gettext.GNUTranslations(), gettext.GNUTranslations()
+    >>> app._catalog = {u'Welcome': u'Bienvenue', u'Save': u'Enregistrer'}
+    >>> plugin._catalog = {u'Save': u'Sauvegarder'}
+    >>> catalog = DomainCatalog()
+    >>> catalog.add('messages', app)
+    >>> catalog.add('plugin', plugin)
+    >>> catalog.ugettext(u'Welcome'), catalog.ugettext(u'Save')
+    (u'Bienvenue', u'Sauvegarder')
+    >>> catalog.dugettext('messages', u'Save')
+    u'Enregistrer'
+    """
+    def __init__(self):
+        gettext.NullTranslations.__init__(self)
+        #: (source, domain, catalog) in the order they were added
+        self.catalogs = []
+        self._clear()
+
+    def _clear(self):
+        # Singular lookup functions, the first one taking precedence
+        self._lookups = ()
+        # Dictionaries combining the gettext catalogs added last, the first
+        # one taking precedence, looked up before the _rest. They are never
+        # changed once shared with a copy
+        self._layers = ()
+        # The first layer if this catalog may still change it, or None
+        self._own = None
+        # Singular lookup functions of the catalogs added before the layers
+        self._rest = ()
+        # (find, find_plural) of each catalog, the first taking precedence
+        self._order = ()
+        # domain -> (find, find_plural) of its catalogs
+        self._domains = {}
+
+    def add(self, domain, translations, source=None):
+        """Adds the catalog of a domain. A catalog added again for the same
+        `source`, the domain by default, replaces the previous one.
+        """
+        if source is None:
+            source = domain
+        for index, (previous, _, _) in enumerate(self.catalogs):
+            if previous == source:
+                catalogs = list(self.catalogs)
+                catalogs[index] = (source, domain, translations)
+                self._rebuild(catalogs)
+                return
+        self.catalogs.append((source, domain, translations))
+
+        finders = _finders(translations)
+        table = _own_table(translations)
+        if table is None:
+            self._rest = (finders[0],) + self._lookups
+            self._layers = ()
+            self._own = None
+        else:
+            if self._own is None:
+                self._own = {}
+                self._layers = (self._own,) + self._layers
+            self._own.update(table)
+            self._merge_layers()
+        self._lookups = tuple(
+            [layer.get for layer in self._layers]
+        ) + self._rest
+        self._order = (finders,) + self._order
+        domains = dict(self._domains)
+        domains[domain] = (finders,) + domains.get(domain, ())
+        self._domains = domains
+
+    def remove(self, source):
+        """Removes the catalog added for a `source`, if there is one.
+
+        >>> catalog = DomainCatalog()
+        >>> catalog.add('messages', DictCatalog({u'Save': u'Enregistrer'}))
+        >>> catalog.remove('messages')
+        >>> catalog.ugettext(u'Save'), len(catalog)
+        (u'Save', 0)
+        """
+        catalogs = [entry for entry in self.catalogs if entry[0] != source]
+        if len(catalogs) != len(self.catalogs):
+            self._rebuild(catalogs)
+
+    def _rebuild(self, catalogs):
+        """Computes the lookup order of the given catalogs again. The
+        catalogs are not loaded again and the shared layers are left alone.
+        """
+        self.catalogs = []
+        self._clear()
+        for source, domain, translations in catalogs:
+            self.add(domain, translations, source)
+
+    def _merge_layers(self):
+        """Merges the first layer into the next one while it is as large"""
+        layers = self._layers
+        while len(layers) > 1 and len(layers[0]) >= len(layers[1]):
+            merged = dict(layers[1])
+            merged.update(layers[0])
+            layers = (merged,) + layers[2:]
+        self._layers = layers
+        self._own = layers[0]
+
+    def copy(self):
+        """Returns a catalog of the same catalogs, to which catalogs could be
+        added without changing this one. The lookup dictionaries are shared
+        rather than copied.
+        """
+        catalog = DomainCatalog()
+        catalog._fallback = self._fallback
+        catalog.catalogs = list(self.catalogs)
+        catalog._order = self._order
+        catalog._domains = self._domains
+        catalog._lookups = self._lookups
+        catalog._layers = self._layers
+        catalog._rest = self._rest
+        # Neither catalog changes the shared layers anymore
+        self._own = None
+        return catalog
+
+    def overlay(self, domain, translations, source=None):
+        """Returns a catalog looking messages up in the given catalog of a
+        domain first and then in the catalogs of this one, which are shared
+        instead of being copied. An overlay costs only the size of its own
+        catalog, however large this catalog is.
+
+        >>> base = DomainCatalog()
+        >>> base.add('messages', DictCatalog({u'Save': u'Enregistrer'}))
+        >>> tenant = base.overlay('tenant', DictCatalog({u'Save': u'Garder'}))
+        >>> tenant.ugettext(u'Save'), base.ugettext(u'Save')
+        (u'Garder', u'Enregistrer')
+        """
+        if source is None:
+            source = domain
+        finders = _finders(translations)
+        catalog = DomainCatalog()
+        catalog._fallback = self._fallback
+        catalog.catalogs = self.catalogs + [(source, domain, translations)]
+        # The dictionaries of this catalog are left alone, the ones added to
+        # the overlay are not combined with them
+        catalog._rest = catalog._lookups = (finders[0],) + self._lookups
+        catalog._order = (finders,) + self._order
+        domains = dict(self._domains)
+        domains[domain] = (finders,) + domains.get(domain, ())
+        catalog._domains = domains
+        return catalog
+
+    @property
+    def domains(self):
+        """The names of the domains of the catalogs"""
+        return sorted(self._domains)
+
+    @property
+    def plural(self):
+        if self.catalogs:
+            return getattr(self.catalogs[0][2], 'plural', _default_plural)
+        return _default_plural
+
+    def ugettext(self, message):
+        for find in self._lookups:
+            result = find(message)
+            if result is not None:
+                return result
+        if self._fallback:
+            return self._fallback.ugettext(message)
+        return unicode(message)
+
+    def ungettext(self, msgid1, msgid2, n):
+        for _, find_plural in self._order:
+            result = find_plural(msgid1, n)
+            if result is not None:
+                return result
+        if self._fallback:
+            return self._fallback.ungettext(msgid1, msgid2, n)
+        if n == 1:
+            return unicode(msgid1)
+        return unicode(msgid2)
+
+    def dugettext(self, domain, message):
+        """Translates the message with the catalogs of the domain only"""
+        for find, _ in self._domains.get(domain, ()):
+            result = find(message)
+            if result is not None:
+                return result
+        return unicode(message)
+
+    def dungettext(self, domain, msgid1, msgid2, n):
+        """Translates the plural message with the catalogs of the domain
+        only.
+        """
+        for _, find_plural in self._domains.get(domain, ()):
+            result = find_plural(msgid1, n)
+            if result is not None:
+                return result
+        if n == 1:
+            return unicode(msgid1)
+        return unicode(msgid2)
+
+    def ugettext_many(self, messages):
+        """Translates the messages in one pass over each catalog, see
+        :func:`ugettext_many`.
+        """
+        messages = list(messages)
+        results = [None] * len(messages)
+        pending = range(len(messages))
+        for find in self._lookups:
+            if not pending:
+                break
+            missing = []
+            for index in pending:
+                result = find(messages[index])
+                if result is None:
+                    missing.append(index)
+                else:
+                    results[index] = result
+            pending = missing
+        if pending and self._fallback:
+            translations = ugettext_many(
+                self._fallback, [messages[index] for index in pending]
+            )
+            for index, result in zip(pending, translations):
+                results[index] = result
+        else:
+            for index in pending:
+                results[index] = unicode(messages[index])
+        return results
+
+    def iteritems(self):
+        """Iterates over the messages of all the catalogs, the ones of the
+        catalogs taking precedence last.
+        """
+        for _, _, translations in self.catalogs:
+            for item in iter_messages(translations):
+                yield item
+
+    def __len__(self):
+        return len(self.catalogs)
+
+
+def _lookup_table(translations):
+    """Returns the dictionary the messages of a catalog are looked up in by
+    its ``ugettext`` and ``ungettext`` methods, before its fallback, or
+    None if the catalog looks them up some other way.
+    """
+    ugettext = getattr(translations.__class__.ugettext, 'im_func', None)
+    if ugettext is gettext.GNUTranslations.ugettext.im_func:
+        return translations._catalog
+    if ugettext is gettext.NullTranslations.ugettext.im_func:
+        return {}
+    return None
+
+
+def ugettext_many(translations, messages):
+    """Returns the list of the translations of the given messages, as
+    ``translations.ugettext`` would return them one by one.
+
+    The messages are looked up in one pass over each catalog of the
+    fallback chain, only the messages which are not found in a catalog
+    being looked up in the next one.
+
+    >>> translations = gettext.NullTranslations()
+    >>> translations._catalog = {u'Apple': u'Pomme'}
+    >>> ugettext_many(CompiledCatalog(translations), [u'Apple', u'Pear'])
+    [u'Pomme', u'Pear']
+    """
+    messages = list(messages)
+    if isinstance(translations, DomainCatalog):
+        return translations.ugettext_many(messages)
+    if isinstance(translations, CompiledCatalog):
+        get = translations.messages.get
+        results = []
+        for message in messages:
+            result = get(message)
+            results.append(unicode(message) if result is None else result)
+        return results
+
+    results = [None] * len(messages)
+    pending = range(len(messages))
+    while translations is not None and pending:
+        table = _lookup_table(translations)
+        if table is None:
+            # The catalog handles its fallbacks itself
+            ugettext = translations.ugettext
+            for index in pending:
+                results[index] = ugettext(messages[index])
+            return results
+        missing = []
+        for index in pending:
+            result = table.get(messages[index])
+            if result is None:
+                missing.append(index)
+            else:
+                results[index] = result
+        pending = missing
+        translations = translations._fallback
+    for index in pending:
+        results[index] = unicode(messages[index])
+    return results
+
+
+def ungettext_many(translations, messages):
+    """Returns the list of the translations of the given ``(singular,
+    plural, count)`` tuples, as ``translations.ungettext`` would return
+    them one by one, see :func:`ugettext_many`.
+    """
+    messages = list(messages)
+    if isinstance(translations, CompiledCatalog):
+        ungettext = translations.ungettext
+        return [ungettext(*message) for message in messages]
+
+    results = [None] * len(messages)
+    pending = range(len(messages))
+    while translations is not None and pending:
+        table = _lookup_table(translations)
+        if table is None:
+            ungettext = translations.ungettext
+            for index in pending:
+                results[index] = ungettext(*messages[index])
+            return results
+        plural = getattr(translations, 'plural', _default_plural)
+        missing = []
+        for index in pending:
+            msgid1, _, count = messages[index]
+            result = table.get((msgid1, plural(count)))
+            if result is None:
+                missing.append(index)
+            else:
+                results[index] = result
+        pending = missing
+        translations = translations._fallback
+    for index in pending:
+        msgid1, msgid2, count = messages[index]
+        results[index] = unicode(msgid1 if count == 1 else msgid2)
+    return results
+
+
+def compile_catalog(translations):
+    """Returns a :class:`CompiledCatalog` for the given translations, or the
+    translations as such if there are no messages to compile (for example
+    a :class:`gettext.NullTranslations`).
+    """
+    if type(translations) is gettext.NullTranslations:
+        return translations
+    return CompiledCatalog(translations)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
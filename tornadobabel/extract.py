@@ -8,6 +8,11 @@
     :license: BSD, see LICENSE for more details.
 """
 import ast
+import cPickle as pickle
+import hashlib
+import os
+import re
+import tempfile
 
 from tornado import escape
 from tornado.template import (_UNSET, _DEFAULT_AUTOESCAPE, _TemplateReader,
@@ -16,6 +21,37 @@ from tornado.template import (_UNSET, _DEFAULT_AUTOESCAPE, _TemplateReader,
 
 GETTEXT_FUNCTIONS = ('_', '_N', 'gettext', 'ngettext')
 
+#: Bumped whenever the extraction changes, to invalidate the cached results
+CACHE_VERSION = 1
+
+
+def make_call_pattern(gettext_functions=GETTEXT_FUNCTIONS):
+    """Returns a regular expression matching the calls to any of the gettext
+    functions in a python expression. Expressions which do not match it
+    cannot contain a localizable string.
+
+    >>> pattern = make_call_pattern()
+    >>> bool(pattern.search("_('Hello')")), bool(pattern.search("a_b(c)"))
+    (True, False)
+    """
+    return re.compile(r'(?<![\w.])(?:%s)\s*\(' % '|'.join(
+        re.escape(function) for function in gettext_functions
+    ))
+
+
+#: The patterns made for the sets of gettext functions extracted
+_call_patterns = {
+    frozenset(GETTEXT_FUNCTIONS): make_call_pattern(),
+}
+
+
+def _get_call_pattern(gettext_functions):
+    key = frozenset(gettext_functions)
+    pattern = _call_patterns.get(key)
+    if pattern is None:
+        pattern = _call_patterns[key] = make_call_pattern(sorted(key))
+    return pattern
+
 
 class DummyTemplate(object):
     """A template object just used to parse the template string.
@@ -47,11 +83,20 @@ def walk(node):
     >>> len(list(walk(t.file)))
     5
     """
-    for child in node.each_child():
-        if child.each_child():
-            for grandchild in walk(child):
-                yield grandchild
-        yield child
+    # Iterative version of a post order traversal, every node is yielded
+    # after its descendants
+    stack = [(iter(node.each_child()), None)]
+    while stack:
+        children, parent = stack[-1]
+        for child in children:
+            if child.each_child():
+                stack.append((iter(child.each_child()), child))
+                break
+            yield child
+        else:
+            stack.pop()
+            if parent is not None:
+                yield parent
 
 
 def extract_from_node(expression, gettext_functions=None):
@@ -96,6 +141,72 @@ def extract_from_node(expression, gettext_functions=None):
             yield expression.line, node.func.id, strings
 
 
+def extract_from_template(template_string, name="<string>",
+        gettext_functions=None):
+    """Extract localizable strings from the source of a template
+
+    Expressions which do not call any of the gettext functions are not
+    parsed.
+
+    :param gettext_functions: the names of the gettext functions whose
+                              calls are extracted, the
+                              :data:`GETTEXT_FUNCTIONS` by default
+    :return: a list of ``(lineno, funcname, message)`` tuples
+    """
+    if gettext_functions is None:
+        gettext_functions = GETTEXT_FUNCTIONS
+    if not gettext_functions:
+        return []
+    template = DummyTemplate(template_string, name)
+    search = _get_call_pattern(gettext_functions).search
+    messages = []
+    for node in walk(template.file):
+        if isinstance(node, _Expression) and search(node.expression):
+            messages.extend(extract_from_node(node, gettext_functions))
+    return messages
+
+
+def _cache_path(cache_dir, template_string, gettext_functions):
+    if isinstance(template_string, unicode):
+        template_string = template_string.encode('utf-8')
+    digest = hashlib.sha1(template_string)
+    # The messages extracted depend on the functions too
+    digest.update('\0' + ','.join(sorted(gettext_functions)))
+    return os.path.join(
+        cache_dir, '%s-%d.pickle' % (digest.hexdigest(), CACHE_VERSION)
+    )
+
+
+def extract_cached(template_string, name="<string>", cache_dir=None,
+        gettext_functions=None):
+    """Same as :func:`extract_from_template`, but the result is cached in
+    `cache_dir` (if given) by the hash of the template source and of the
+    gettext functions, so that an unchanged template is not parsed again.
+    """
+    if not cache_dir:
+        return extract_from_template(template_string, name, gettext_functions)
+
+    if gettext_functions is None:
+        gettext_functions = GETTEXT_FUNCTIONS
+    path = _cache_path(cache_dir, template_string, gettext_functions)
+    try:
+        with open(path, 'rb') as cached:
+            return pickle.load(cached)
+    except (IOError, EOFError, pickle.UnpicklingError):
+        pass
+
+    messages = extract_from_template(template_string, name, gettext_functions)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    # Write to a temporary file first, so that concurrent extractions never
+    # read a partially written cache entry
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, 'wb') as cached:
+        pickle.dump(messages, cached, pickle.HIGHEST_PROTOCOL)
+    os.rename(temp_path, path)
+    return messages
+
+
 def extract_tornado(fileobj, keywords, comment_tags, options):
     """Extract messages from Python source code.
 
@@ -103,21 +214,26 @@ def extract_tornado(fileobj, keywords, comment_tags, options):
     :param fileobj: the seekable, file-like object the messages should be
 	            extracted from
     :param keywords: a list of keywords (i.e. function names) that should be
-	            recognized as translation functions
+	            recognized as translation functions, the
+	            :data:`GETTEXT_FUNCTIONS` if None
     :param comment_tags: a list of translator tags to search for and include
 	            in the results. (Not implemented yet)
-    :param options: a dictionary of additional options (optional)
+    :param options: a dictionary of additional options (optional). The
+                    results are cached by the hash of the template in the
+                    directory given by the ``cache_dir`` option, or the
+                    ``TORNADOBABEL_EXTRACT_CACHE`` environment variable.
     :return: an iterator over ``(lineno, funcname, message, comments)`` tuples
     :rtype: ``iterator``
     """
-    template = DummyTemplate(
-        fileobj.read(),
-        file.name or options.get('name', '<string>'),
+    name = getattr(fileobj, 'name', None) or options.get('name', '<string>')
+    cache_dir = options.get(
+        'cache_dir', os.environ.get('TORNADOBABEL_EXTRACT_CACHE')
     )
 
-    for node in walk(template.file):
-        if isinstance(node, _Expression):
-            for lineno, func, message in extract_from_node(node):
-                # TODO: Implement the comment feature, right now an empty 
-                # iterable is returned
-                yield lineno, func, message, []
+    if keywords is not None:
+        keywords = list(keywords)
+    for lineno, func, message in extract_cached(
+            fileobj.read(), name, cache_dir, keywords):
+        # TODO: Implement the comment feature, right now an empty
+        # iterable is returned
+        yield lineno, func, message, []
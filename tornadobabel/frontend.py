@@ -0,0 +1,760 @@
+# -*- coding: utf-8 -*-
+"""
+    frontend
+
+    Command line interface of tornadobabel
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import cPickle as pickle
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool, cpu_count
+from optparse import OptionParser
+
+from babel.messages.catalog import PYTHON_FORMAT, Catalog
+from babel.messages.extract import DEFAULT_KEYWORDS, DEFAULT_MAPPING, \
+    extract_from_file
+from babel.messages.frontend import parse_keywords, parse_mapping
+from babel.messages.mofile import write_mo
+from babel.messages.plurals import get_plural
+from babel.messages.pofile import read_po, write_po
+from babel.util import pathmatch, relpath
+
+from tornadobabel.store import build_store
+
+
+log = logging.getLogger('tornadobabel')
+
+
+def iter_mapped_files(dirname, method_map, options_map):
+    """Returns an iterator over the files of a directory which have an
+    extraction method in the mapping, as ``(filename, method, options)``
+    tuples. Files are returned in the same order as babel's
+    `extract_from_dir` extracts them, with filenames relative to `dirname`.
+    """
+    # Mirrors babel.messages.extract.extract_from_dir
+    absname = os.path.abspath(dirname)
+    for root, dirnames, filenames in os.walk(absname):
+        for subdir in dirnames:
+            if subdir.startswith('.') or subdir.startswith('_'):
+                dirnames.remove(subdir)
+        dirnames.sort()
+        filenames.sort()
+        for filename in filenames:
+            filename = relpath(
+                os.path.join(root, filename).replace(os.sep, '/'),
+                dirname
+            )
+            for pattern, method in method_map:
+                if pathmatch(pattern, filename):
+                    options = {}
+                    for opattern, odict in options_map.items():
+                        if pathmatch(opattern, filename):
+                            options = odict
+                    yield filename, method, options
+                    break
+
+
+def _job_config(job):
+    """Returns everything but the path of an extraction job, which the
+    messages extracted from the file depend on.
+    """
+    method, _, keywords, comment_tags, options, strip = job
+    return (
+        method, sorted(keywords.items()), list(comment_tags),
+        sorted(options.items()), strip
+    )
+
+
+def _extract_file(args):
+    """Extracts the messages of a single file in a worker process"""
+    method, filepath, keywords, comment_tags, options, strip = args
+    return extract_from_file(
+        method, filepath, keywords=keywords, comment_tags=comment_tags,
+        options=options, strip_comment_tags=strip
+    )
+
+
+class ExtractionManifest(object):
+    """Remembers the messages extracted from every file along with the
+    modification time, size and hash of the file, so that only the files
+    which changed since the previous extraction are extracted again.
+
+    The manifest is stored as a pickle at `path`.
+    """
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.hits = self.misses = 0
+        try:
+            with open(path, 'rb') as fileobj:
+                version, entries = pickle.load(fileobj)
+        except (IOError, EOFError, ValueError, pickle.UnpicklingError):
+            return
+        if version == self.VERSION:
+            self.entries = entries
+
+    @staticmethod
+    def _digest(filepath):
+        with open(filepath, 'rb') as fileobj:
+            return hashlib.sha1(fileobj.read()).hexdigest()
+
+    def get(self, filepath, config):
+        """Returns the messages extracted from the file with the given
+        extraction configuration, or None if the file changed.
+        """
+        entry = self.entries.get(filepath)
+        if entry is not None and entry['config'] == config:
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                stat = None
+            if stat is not None:
+                if (entry['mtime'], entry['size']) == \
+                        (stat.st_mtime, stat.st_size):
+                    self.hits += 1
+                    return entry['messages']
+                if entry['digest'] == self._digest(filepath):
+                    # Touched but unchanged
+                    entry['mtime'] = stat.st_mtime
+                    self.hits += 1
+                    return entry['messages']
+        self.misses += 1
+        return None
+
+    def set(self, filepath, config, messages):
+        stat = os.stat(filepath)
+        self.entries[filepath] = {
+            'config': config,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'digest': self._digest(filepath),
+            'messages': messages,
+        }
+
+    def prune(self, filepaths):
+        """Drops the entries of the files not in `filepaths`"""
+        for filepath in set(self.entries) - set(filepaths):
+            del self.entries[filepath]
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as fileobj:
+            pickle.dump(
+                (self.VERSION, self.entries), fileobj, pickle.HIGHEST_PROTOCOL
+            )
+        os.rename(temp_path, self.path)
+
+
+def extract_parallel(dirnames, method_map=DEFAULT_MAPPING, options_map=None,
+        keywords=DEFAULT_KEYWORDS, comment_tags=(), strip_comment_tags=False,
+        processes=None, manifest=None):
+    """Extracts the messages of the files in the given directories with a
+    pool of processes.
+
+    The messages are returned in the same order as a serial extraction
+    with babel, so the catalog built from them is identical.
+
+    :param processes: the number of worker processes, the number of CPUs
+                      by default
+    :param manifest: an :class:`ExtractionManifest`, if given only the files
+                     which changed since it was saved are extracted and it
+                     is saved again with the new results
+    :return: an iterator over ``(filepath, lineno, message, comments)``
+             tuples, where `filepath` is the path of the file relative to
+             the current directory
+    """
+    if options_map is None:
+        options_map = {}
+    jobs = []
+    filepaths = []
+    for dirname in dirnames:
+        for filename, method, options in iter_mapped_files(
+                dirname, method_map, options_map):
+            if method == 'ignore':
+                continue
+            filepath = os.path.normpath(os.path.join(dirname, filename))
+            jobs.append((
+                method, os.path.join(os.path.abspath(dirname), filename),
+                keywords, comment_tags, options, strip_comment_tags
+            ))
+            filepaths.append(filepath)
+
+    results = [None] * len(jobs)
+    pending = []
+    for index, job in enumerate(jobs):
+        if manifest is not None:
+            results[index] = manifest.get(job[1], _job_config(job))
+        if results[index] is None:
+            log.info('extracting messages from %s', filepaths[index])
+            pending.append(index)
+
+    if processes is None:
+        processes = cpu_count()
+    pending_jobs = [jobs[index] for index in pending]
+    if processes > 1 and len(pending_jobs) > 1:
+        pool = Pool(min(processes, len(pending_jobs)))
+        try:
+            chunksize = max(1, len(pending_jobs) // (processes * 4))
+            extracted = pool.map(_extract_file, pending_jobs, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        extracted = map(_extract_file, pending_jobs)
+    for index, messages in zip(pending, extracted):
+        results[index] = messages
+
+    if manifest is not None:
+        for index, messages in zip(pending, extracted):
+            manifest.set(jobs[index][1], _job_config(jobs[index]), messages)
+        manifest.prune([job[1] for job in jobs])
+        manifest.save()
+
+    for filepath, messages in zip(filepaths, results):
+        for lineno, message, comments in messages:
+            yield filepath, lineno, message, comments
+
+
+def iter_po_files(directory, domains=None):
+    """Returns an iterator over the ``.po`` files of a locale tree, laid out
+    as ``<lang>/LC_MESSAGES/<domain>.po``, as ``(lang, domain, filepath)``
+    tuples sorted by language and domain.
+
+    :param domains: the domains to return the files of, all the domains
+                    found by default
+    """
+    for lang in sorted(os.listdir(directory)):
+        dirname = os.path.join(directory, lang, 'LC_MESSAGES')
+        if lang.startswith('.') or not os.path.isdir(dirname):
+            continue
+        for filename in sorted(os.listdir(dirname)):
+            domain, extension = os.path.splitext(filename)
+            if extension != '.po':
+                continue
+            if domains is not None and domain not in domains:
+                continue
+            yield lang, domain, os.path.join(dirname, filename)
+
+
+#: Conversion types which format the same values
+_FORMAT_TYPES = {
+    'i': 'd', 'u': 'd', 'X': 'x', 'F': 'f', 'g': 'f', 'G': 'f',
+    'e': 'f', 'E': 'f', 'r': 's',
+}
+
+
+def _placeholders(string):
+    """Returns the named placeholders of a format string, as a set of
+    ``(name, type)`` tuples, and the types of its positional ones.
+
+    A conversion with the space flag followed by a letter, like in
+    ``"Save 50% off"``, is taken for a percent sign before a word.
+    """
+    named, positional = set(), []
+    for match in PYTHON_FORMAT.finditer(string):
+        name, flags, typechar = match.groups()
+        if typechar == '%' and name is None:
+            continue
+        if name is None and flags == ' ' and \
+                string[match.end():match.end() + 1].isalnum():
+            continue
+        if name is None:
+            positional.append(_FORMAT_TYPES.get(typechar, typechar))
+        else:
+            named.add((name, _FORMAT_TYPES.get(typechar, typechar)))
+    return named, positional
+
+
+def check_placeholders(msgid, msgstr):
+    """Returns what is wrong with the placeholders of a translation, or
+    `None` if it formats the same values as its message.
+
+    A translation may leave named placeholders out, but it must not use
+    any name the message does not have, and it must have as many
+    positional placeholders as the message, of the same types.
+
+    >>> check_placeholders('%(count)d new messages', '%(count)d nouveaux')
+    >>> check_placeholders('Hello %(name)s', 'Bonjour %(nom)s')
+    'unknown placeholder %(nom)s'
+    >>> check_placeholders('%(count)d new', '%(count)s nouveaux')
+    'placeholder %(count)s is %(count)d in the message'
+    >>> check_placeholders('%s of %d', '%s sur')
+    'expected 2 positional placeholders, found 1'
+    """
+    named, positional = _placeholders(msgid)
+    translated_named, translated_positional = _placeholders(msgstr)
+    if translated_named and positional or translated_positional and named:
+        return 'named and positional placeholders mixed up'
+    types = dict(named)
+    for name, typechar in sorted(translated_named - named):
+        if name not in types:
+            return 'unknown placeholder %%(%s)%s' % (name, typechar)
+        return 'placeholder %%(%s)%s is %%(%s)%s in the message' % (
+            name, typechar, name, types[name]
+        )
+    if len(translated_positional) != len(positional):
+        return 'expected %d positional placeholders, found %d' % (
+            len(positional), len(translated_positional)
+        )
+    for index, (expected, found) in enumerate(
+            zip(positional, translated_positional)):
+        if expected != found:
+            return 'positional placeholder %d is %%%s instead of %%%s' % (
+                index + 1, found, expected
+            )
+
+
+def _check_message(catalog, message):
+    """Returns the problems of the translations of a message. Placeholders
+    are only checked if the message is a python format string.
+    """
+    msgstrs = message.string
+    if not isinstance(msgstrs, (list, tuple)):
+        msgstrs = (msgstrs,)
+    problems = []
+    if message.pluralizable:
+        # read_po pads the missing forms with empty strings
+        forms = len([msgstr for msgstr in msgstrs if msgstr])
+        if not forms:
+            return problems
+        if forms != catalog.num_plurals:
+            problems.append('expected %d plural forms, found %d' % (
+                catalog.num_plurals, forms
+            ))
+        msgid, msgid_plural = message.id[:2]
+    elif len(msgstrs) > 1:
+        return ['plural forms for a message without a plural']
+    else:
+        msgid = msgid_plural = message.id
+    if not message.python_format or \
+            _placeholders(msgid) == _placeholders(msgid_plural) == \
+            (set(), []):
+        return problems
+    for msgstr in msgstrs:
+        if not msgstr:
+            continue
+        # The forms of a plural message are checked against its plural,
+        # some forms may have the placeholders of the singular instead,
+        # with the count left out or added
+        problem = check_placeholders(msgid_plural, msgstr)
+        if problem is not None and msgid != msgid_plural and \
+                check_placeholders(msgid, msgstr) is None:
+            problem = None
+        if problem is not None:
+            problems.append(problem)
+    return problems
+
+
+def _compile_file(args):
+    """Validates a ``.po`` file and compiles it to its ``.mo`` file in a
+    worker process, unless something is wrong with its translations.
+
+    :return: a ``(status, errors, plural, singular, nplurals, seconds)``
+             tuple, where `errors` is a list of ``(lineno, msgid, problem)``
+             tuples and `plural` and `singular` the msgids of the messages
+             with and without a plural
+    """
+    lang, domain, po_path, use_fuzzy = args
+    started = time.time()
+    try:
+        with open(po_path, 'rb') as fileobj:
+            catalog = read_po(fileobj, lang, domain)
+    except Exception, error:
+        return 'invalid', [(None, None, 'could not be read: %s' % error)], \
+            (), (), None, time.time() - started
+    if catalog.fuzzy and not use_fuzzy:
+        return 'fuzzy', [], (), (), None, time.time() - started
+
+    errors = []
+    plural, singular = [], []
+    for message in catalog:
+        if not message.id:
+            continue
+        if message.pluralizable:
+            plural.append(message.id[0])
+        else:
+            singular.append(message.id)
+        if message.fuzzy and not use_fuzzy:
+            continue
+        for problem in _check_message(catalog, message):
+            msgid = message.id
+            if isinstance(msgid, (list, tuple)):
+                msgid = msgid[0]
+            errors.append((message.lineno, msgid, problem))
+    if errors:
+        return 'invalid', errors, plural, singular, catalog.num_plurals, \
+            time.time() - started
+
+    mo_path = po_path[:-3] + '.mo'
+    # Renamed over the .mo file so that it is never read half written,
+    # opened rather than made by mkstemp to get the permissions of the umask
+    temp_path = '%s.%d.tmp' % (mo_path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as fileobj:
+            write_mo(fileobj, catalog, use_fuzzy=use_fuzzy)
+        os.rename(temp_path, mo_path)
+    finally:
+        # Only left if the file could not be written or renamed
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return 'compiled', [], plural, singular, catalog.num_plurals, \
+        time.time() - started
+
+
+class CompileReport(object):
+    """What :func:`compile_parallel` did with the ``.po`` files of a locale
+    tree. Paths are the paths of the ``.po`` files.
+
+    .. attribute:: compiled
+
+        ``(path, seconds)`` tuples of the files compiled, with the time
+        taken to validate and compile each of them
+
+    .. attribute:: skipped
+
+        paths of the files whose ``.mo`` file was up to date, or which are
+        fuzzy
+
+    .. attribute:: errors
+
+        ``(path, lineno, msgid, problem)`` tuples of the translations which
+        kept their file from being compiled
+
+    .. attribute:: warnings
+
+        ``(path, msgid, problem)`` tuples of what differs between the
+        locales of a domain, `msgid` is `None` for a whole file
+
+    .. attribute:: elapsed
+
+        time taken to compile the whole tree, in seconds
+    """
+
+    def __init__(self):
+        self.compiled = []
+        self.skipped = []
+        self.errors = []
+        self.warnings = []
+        self.elapsed = 0.0
+
+
+def compile_parallel(directory, domains=None, processes=None, force=False,
+        use_fuzzy=False):
+    """Compiles the ``.po`` files of a locale tree to ``.mo`` files next to
+    them with a pool of processes, as ``pybabel compile`` would.
+
+    The files whose ``.mo`` file is newer are skipped. The others are
+    validated first, and left uncompiled if the translation of a python
+    format string has placeholders its message does not have, or if a
+    translation has not as many plural forms as the ``Plural-Forms``
+    header of its file. Across the locales of a domain
+    which were compiled, messages with a plural in some locales but not in
+    others and headers declaring another number of plural forms than the
+    locale has are reported as warnings. The files skipped as up to date
+    are not read, and left out of these warnings: pass `force` to check
+    the whole tree.
+
+    :param domains: the domains to compile, all the domains by default
+    :param processes: the number of worker processes, the number of CPUs
+                      by default
+    :param force: compile the files whose ``.mo`` file is up to date too
+    :param use_fuzzy: compile the fuzzy translations and files too
+    :return: a :class:`CompileReport`
+    """
+    started = time.time()
+    report = CompileReport()
+    jobs = []
+    for lang, domain, po_path in iter_po_files(directory, domains):
+        mo_path = po_path[:-3] + '.mo'
+        if not force and os.path.exists(mo_path) and \
+                os.path.getmtime(mo_path) >= os.path.getmtime(po_path):
+            report.skipped.append(po_path)
+            continue
+        log.info('compiling catalog %s', po_path)
+        jobs.append((lang, domain, po_path, use_fuzzy))
+
+    if processes is None:
+        processes = cpu_count()
+    if processes > 1 and len(jobs) > 1:
+        pool = Pool(min(processes, len(jobs)))
+        try:
+            chunksize = max(1, len(jobs) // (processes * 4))
+            results = pool.map(_compile_file, jobs, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(_compile_file, jobs)
+
+    # Domain -> msgid -> paths of the files with and without a plural
+    plurals = {}
+    for job, result in zip(jobs, results):
+        lang, domain, po_path = job[:3]
+        status, errors, plural, singular, nplurals, seconds = result
+        if status == 'fuzzy':
+            log.info('catalog %s is marked as fuzzy, skipping', po_path)
+            report.skipped.append(po_path)
+            continue
+        for lineno, msgid, problem in errors:
+            report.errors.append((po_path, lineno, msgid, problem))
+        if status == 'compiled':
+            report.compiled.append((po_path, seconds))
+        if nplurals is None:
+            continue
+        expected = get_plural(lang).num_plurals
+        if nplurals != expected:
+            report.warnings.append((
+                po_path, None, 'declares %d plural forms, %s has %d' % (
+                    nplurals, lang, expected
+                )
+            ))
+        messages = plurals.setdefault(domain, {})
+        for index, msgids in enumerate((plural, singular)):
+            for msgid in msgids:
+                messages.setdefault(msgid, ([], []))[index].append(po_path)
+
+    for domain in sorted(plurals):
+        messages = plurals[domain]
+        for msgid in sorted(messages):
+            with_plural, without_plural = messages[msgid]
+            if with_plural and without_plural:
+                for po_path in without_plural:
+                    report.warnings.append((
+                        po_path, msgid, 'has no plural, unlike in %s' %
+                        ', '.join(with_plural)
+                    ))
+    report.elapsed = time.time() - started
+    return report
+
+
+def extract(argv):
+    """Extracts messages like ``pybabel extract``, using all the CPUs"""
+    parser = OptionParser(
+        usage='%prog extract [options] dir1 <dir2> ...',
+        description='extract messages from source files and generate a '
+                    'POT file, with a pool of processes'
+    )
+    parser.add_option('--charset', dest='charset',
+                      help='charset to use in the output (default '
+                           '"%default")')
+    parser.add_option('-k', '--keyword', dest='keywords', action='append',
+                      help='keywords to look for in addition to the '
+                           'defaults')
+    parser.add_option('--no-default-keywords', dest='no_default_keywords',
+                      action='store_true',
+                      help="do not include the default keywords")
+    parser.add_option('--mapping', '-F', dest='mapping_file',
+                      help='path to the extraction mapping file')
+    parser.add_option('--no-location', dest='no_location',
+                      action='store_true',
+                      help='do not include location comments with filename '
+                           'and line number')
+    parser.add_option('--omit-header', dest='omit_header',
+                      action='store_true',
+                      help='do not include msgid "" entry in header')
+    parser.add_option('-o', '--output', dest='output',
+                      help='path to the output POT file')
+    parser.add_option('-w', '--width', dest='width', type='int',
+                      help="set output line width (default 76)")
+    parser.add_option('--sort-output', dest='sort_output',
+                      action='store_true',
+                      help='generate sorted output (default False)')
+    parser.add_option('--sort-by-file', dest='sort_by_file',
+                      action='store_true',
+                      help='sort output by file location (default False)')
+    parser.add_option('--project', dest='project',
+                      help='set project name in output')
+    parser.add_option('--version', dest='version',
+                      help='set project version in output')
+    parser.add_option('--add-comments', '-c', dest='comment_tags',
+                      metavar='TAG', action='append',
+                      help='place comment block with TAG (or those '
+                           'preceding keyword lines) in output file')
+    parser.add_option('--strip-comment-tags', '-s',
+                      dest='strip_comment_tags', action='store_true',
+                      help='strip the comment tags from the comments')
+    parser.add_option('-j', '--processes', dest='processes', type='int',
+                      help='number of worker processes (default: number '
+                           'of CPUs)')
+    parser.add_option('--manifest', dest='manifest', metavar='FILE',
+                      help='only extract the files changed since the '
+                           'previous extraction recorded in FILE')
+    parser.set_defaults(charset='utf-8', keywords=[],
+                        no_default_keywords=False, no_location=False,
+                        omit_header=False, width=76, sort_output=False,
+                        sort_by_file=False, comment_tags=[],
+                        strip_comment_tags=False)
+    options, args = parser.parse_args(argv)
+    if not args:
+        parser.error('incorrect number of arguments')
+    for dirname in args:
+        if not os.path.isdir(dirname):
+            parser.error('%r is not a directory' % dirname)
+
+    keywords = DEFAULT_KEYWORDS.copy()
+    if options.no_default_keywords:
+        if not options.keywords:
+            parser.error('you must specify new keywords if you disable the '
+                         'default ones')
+        keywords = {}
+    if options.keywords:
+        keywords.update(parse_keywords(options.keywords))
+
+    if options.mapping_file:
+        fileobj = open(options.mapping_file, 'U')
+        try:
+            method_map, options_map = parse_mapping(fileobj)
+        finally:
+            fileobj.close()
+    else:
+        method_map, options_map = DEFAULT_MAPPING, {}
+
+    manifest = None
+    if options.manifest:
+        manifest = ExtractionManifest(options.manifest)
+
+    catalog = Catalog(project=options.project, version=options.version,
+                      charset=options.charset)
+    for filepath, lineno, message, comments in extract_parallel(
+            args, method_map, options_map, keywords, options.comment_tags,
+            options.strip_comment_tags, options.processes, manifest):
+        catalog.add(message, None, [(filepath, lineno)],
+                    auto_comments=comments)
+    if manifest is not None:
+        log.info('%d files unchanged, %d extracted', manifest.hits,
+                 manifest.misses)
+
+    if options.output not in (None, '-'):
+        log.info('writing PO template file to %s', options.output)
+        outfile = open(options.output, 'w')
+    else:
+        outfile = sys.stdout
+    try:
+        write_po(outfile, catalog, width=options.width,
+                 no_location=options.no_location,
+                 omit_header=options.omit_header,
+                 sort_output=options.sort_output,
+                 sort_by_file=options.sort_by_file)
+    finally:
+        if outfile is not sys.stdout:
+            outfile.close()
+
+
+def build(argv):
+    """Compiles a locale tree into a catalog store"""
+    parser = OptionParser(
+        usage='%prog build [options] <locale dir>',
+        description='compile the .mo files of a locale tree into a single '
+                    'catalog store, loaded with load_catalog_store'
+    )
+    parser.add_option('-o', '--output', dest='output',
+                      help='path to the output catalog store')
+    parser.add_option('-D', '--domain', dest='domains', action='append',
+                      help='domain to compile, in the order they take '
+                           'precedence, the last first (default: all the '
+                           'domains)')
+    options, args = parser.parse_args(argv)
+    if len(args) != 1:
+        parser.error('incorrect number of arguments')
+    if not os.path.isdir(args[0]):
+        parser.error('%r is not a directory' % args[0])
+    if not options.output:
+        parser.error('you must specify the output file')
+
+    started = time.time()
+    count = build_store(args[0], options.output, options.domains)
+    log.info('compiled %d catalogs to %s in %.3fs', count, options.output,
+             time.time() - started)
+
+
+def compile_catalogs(argv):
+    """Compiles the ``.po`` files of a locale tree like ``pybabel compile``,
+    using all the CPUs, after validating them.
+
+    :return: 1 if some files were left uncompiled because of their
+             translations
+    """
+    parser = OptionParser(
+        usage='%prog compile [options] <locale dir>',
+        description='validate and compile the .po files of a locale tree '
+                    'whose .mo files are out of date, with a pool of '
+                    'processes'
+    )
+    parser.add_option('-D', '--domain', dest='domains', action='append',
+                      help='domain to compile (default: all the domains)')
+    parser.add_option('-j', '--processes', dest='processes', type='int',
+                      help='number of worker processes (default: number '
+                           'of CPUs)')
+    parser.add_option('-f', '--force', dest='force', action='store_true',
+                      help='compile the files whose .mo file is up to '
+                           'date too')
+    parser.add_option('--use-fuzzy', dest='use_fuzzy', action='store_true',
+                      help='also include fuzzy translations')
+    parser.add_option('--statistics', dest='statistics',
+                      action='store_true',
+                      help='print the time taken by each file')
+    parser.set_defaults(force=False, use_fuzzy=False, statistics=False)
+    options, args = parser.parse_args(argv)
+    if len(args) != 1:
+        parser.error('incorrect number of arguments')
+    if not os.path.isdir(args[0]):
+        parser.error('%r is not a directory' % args[0])
+
+    report = compile_parallel(args[0], options.domains, options.processes,
+                              options.force, options.use_fuzzy)
+    if options.statistics:
+        for po_path, seconds in report.compiled:
+            log.info('%8.3fs %s', seconds, po_path)
+    for po_path, msgid, problem in report.warnings:
+        if msgid is None:
+            log.warning('warning: %s: %s', po_path, problem)
+        else:
+            log.warning('warning: %s: %r %s', po_path, msgid, problem)
+    for po_path, lineno, msgid, problem in report.errors:
+        if msgid is None:
+            log.error('error: %s: %s', po_path, problem)
+        else:
+            log.error('error: %s:%s: %r %s', po_path, lineno, msgid, problem)
+    invalid = len(set(error[0] for error in report.errors))
+    log.info('compiled %d catalogs in %.3fs (%.3fs of work), %d up to '
+             'date, %d invalid', len(report.compiled), report.elapsed,
+             sum(seconds for _, seconds in report.compiled),
+             len(report.skipped), invalid)
+    if invalid:
+        return 1
+
+
+#: Name of the command -> function handling its arguments
+COMMANDS = {
+    'extract': extract,
+    'build': build,
+    'compile': compile_catalogs,
+}
+
+
+def main(argv=None):
+    """Entry point of the ``tornadobabel`` command"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv or argv[0] not in COMMANDS:
+        sys.stderr.write(
+            'usage: tornadobabel <command> [options]\n\n'
+            'commands: %s\n' % ', '.join(sorted(COMMANDS))
+        )
+        return 2
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    return COMMANDS[argv[0]](argv[1:]) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -24,94 +24,1291 @@
 """
 import gettext
 import logging
+from datetime import date as date_, datetime as datetime_, time as time_
 import os
+import re
+import sys
+import threading
+import time
+from functools import partial
+from operator import itemgetter
+from multiprocessing.pool import ThreadPool
 
 from babel.support import Translations
 from babel.core import Locale as BabelCoreLocale
 from babel import dates, numbers
+from tornado import stack_context
+from tornado.ioloop import IOLoop
 
-_default_locale = "en_US"
-_translations = {}
-_supported_locales = frozenset([_default_locale])
-_use_gettext = False
+from tornadobabel.catalog import DictCatalog, DomainCatalog, \
+    compile_catalog, ugettext_many, ungettext_many
+from tornadobabel.stats import Stats
+from tornadobabel.store import CatalogStore, write_store
+from tornadobabel.utils import LRUCache
 
+#: Counters and timings, None unless enabled by set_instrumentation
+_stats = None
 
-def get(*locale_codes):
-    """Returns the closest match for the given locale codes.
 
-    We iterate over all given locale codes in order. If we have a tight
-    or a loose match for the code (e.g., "en" for "en_US"), we return
-    the locale. Otherwise we move to the next code in the list.
+def _list_languages(directory):
+    """Returns the languages of a locale tree"""
+    langs = []
+    for lang in os.listdir(directory):
+        if lang.startswith('.'):
+            continue  # skip .svn, etc
+        if os.path.isfile(os.path.join(directory, lang)):
+            continue
+        langs.append(lang)
+    return langs
 
-    By default we return en_US if no translations are found for any of
-    the specified locales. You can change the default locale with
-    set_default_locale() below.
-    """
-    return Locale.get_closest(*locale_codes)
 
+def _load_translation(directory, lang, domain, catalog_class):
+    """Loads the translations of a language and times it.
+
+    :return: a tuple of the language, the translations, the time taken and
+             the exception raised while loading if any
+    """
+    started = time.time()
+    try:
+        translation = catalog_class.load(directory, [lang], domain)
+    except Exception, e:
+        return lang, None, time.time() - started, e
+    elapsed = time.time() - started
+    logging.debug("Loaded '%s' for '%s' in %.3fs", domain, lang, elapsed)
+    return lang, translation, elapsed, None
 
-def set_default_locale(code):
-    """Sets the default locale, used in get_closest_locale().
 
-    The default locale is assumed to be the language used for all strings
-    in the system. The translations loaded from disk are mappings from
-    the default locale to the destination locale. Consequently, you don't
-    need to create a translation file for the default locale.
+def _load_translations(source, langs, workers=None):
+    """Loads the catalogs of the languages from a source, see
+    :func:`_load_translation`.
     """
-    global _default_locale
-    global _supported_locales
-    _default_locale = code
-    _supported_locales = frozenset(_translations.keys() + [_default_locale])
+    directory, domain, catalog_class = source
 
+    def load(lang):
+        return _load_translation(directory, lang, domain, catalog_class)
 
-def load_gettext_translations(directory, domain):
-    """Loads translations from gettext's locale tree"""
-    global _translations
-    global _supported_locales
-    global _use_gettext
-    for lang in os.listdir(directory):
-        if lang.startswith('.'):
-            continue  # skip .svn, etc
-        if os.path.isfile(os.path.join(directory, lang)):
-            continue
+    if workers and workers > 1 and len(langs) > 1:
+        pool = ThreadPool(min(workers, len(langs)))
         try:
-            translation = Translations.load(directory, [lang], domain)
-            if lang in _translations:
-                _translations[lang].merge(translation)
+            return pool.map(load, langs)
+        finally:
+            pool.close()
+    return map(load, langs)
+
+
+def _add_catalog(catalog, translation, source):
+    """Adds the catalog of a source to a DomainCatalog, unless there was no
+    catalog in the source.
+    """
+    if type(translation) is not gettext.NullTranslations:
+        catalog.add(source[1], translation, source)
+
+
+def _extend_catalog(catalog, translation, source):
+    """Returns a copy of a :class:`~tornadobabel.catalog.DomainCatalog` (or
+    a new one if `catalog` is None) to which the catalog loaded from a
+    source is added.
+    """
+    if catalog is None:
+        catalog = DomainCatalog()
+    else:
+        catalog = catalog.copy()
+    _add_catalog(catalog, translation, source)
+    return catalog
+
+
+def _reraise(exc_info):
+    raise exc_info[0], exc_info[1], exc_info[2]
+
+
+def _normalise(code):
+    return code.replace("-", "_").lower()
+
+
+def build_resolution_index(codes):
+    """Returns a dictionary which maps the spellings of a locale code to
+    the supported code it resolves to.
+
+    Every code is indexed as given, in its normalised form (lower case,
+    underscore separated) and in its hyphenated forms. Codes with a script
+    (e.g. ``zh_Hant_TW``) are also indexed without the script so that
+    ``zh-TW`` resolves to them, unless that code is supported on its own.
+
+    >>> index = build_resolution_index(['en_US', 'zh_Hant_TW'])
+    >>> index['en-us'], index['zh_tw'], index['zh-Hant-TW']
+    ('en_US', 'zh_Hant_TW', 'zh_Hant_TW')
+    """
+    index = {}
+    aliases = {}
+    for code in codes:
+        normalised = _normalise(code)
+        for variant in (code, code.replace("_", "-"), normalised,
+                normalised.replace("_", "-")):
+            index[variant] = code
+        parts = normalised.split("_")
+        if len(parts) == 3:
+            aliases[parts[0] + "_" + parts[2]] = code
+    for alias, code in aliases.iteritems():
+        index.setdefault(alias, code)
+    return index
+
+
+def resolve_locale_code(code, index=None):
+    """Returns the supported locale code for the given code or None if
+    neither the code nor any of its prefixes is supported.
+
+    The subtags of the code are dropped one at a time from the right, as
+    in the lookup of RFC 4647, along with a singleton (like the ``u`` of an
+    extension or the ``x`` of a private use part) which is left last.
+
+    >>> index = build_resolution_index(['zh_Hant_TW', 'pt'])
+    >>> resolve_locale_code('zh-Hant-TW-u-ca-chinese', index)
+    'zh_Hant_TW'
+    >>> resolve_locale_code('pt-BR-x-foo', index)
+    'pt'
+
+    :param code: a locale code like ``fr-FR``, ``pt_br`` or ``zh_Hant_TW``
+    :param index: the index built by :func:`build_resolution_index`, by
+                  default the one for the locales currently supported by
+                  the :data:`default_registry`
+    """
+    if index is None:
+        index = default_registry.resolution_index
+    supported = index.get(code)
+    if supported is not None:
+        return supported
+    parts = _normalise(code).split("_")
+    while parts:
+        supported = index.get("_".join(parts))
+        if supported is not None:
+            return supported
+        parts.pop()
+        if parts and len(parts[-1]) == 1:
+            parts.pop()
+    return None
+
+
+#: An element of an Accept-Language header: the language range and the
+#: value of its ``q`` parameter if any. Other parameters are ignored.
+_language_element = re.compile(
+    r'[ \t]*([A-Za-z]{1,8}(?:[-_][A-Za-z0-9]{1,8})*|\*)[ \t]*'
+    r'(?:;[ \t]*[qQ][ \t]*=[ \t]*([^; \t]*)[ \t]*)?(?:;[^;]*)*$'
+).match
+
+
+def _qvalues():
+    """Returns the dictionary of the quality values of RFC 7231 as they are
+    written -> their value.
+    """
+    qvalues = {'0': 0.0, '0.': 0.0, '1': 1.0, '1.': 1.0}
+    for digits in (1, 2, 3):
+        for value in xrange(10 ** digits):
+            qvalues['0.%0*d' % (digits, value)] = value / 10.0 ** digits
+        qvalues['1.' + '0' * digits] = 1.0
+    return qvalues
+
+#: Quality value as written -> its value
+_QVALUES = _qvalues()
+
+#: Element of an Accept-Language header -> (quality, language range), the
+#: quality being None if the element is malformed. Headers are made of few
+#: distinct elements, like ``en;q=0.9``, which are parsed only once.
+_elements = {}
+_MAX_ELEMENTS = 4096
+
+
+def _parse_element(element):
+    """Returns the quality and the language range of an element of an
+    Accept-Language header, see :data:`_elements`.
+    """
+    match = _language_element(element)
+    if match is None:
+        parsed = None, None
+    else:
+        language, quality = match.groups()
+        if quality is None:
+            parsed = 1.0, language
+        else:
+            parsed = _QVALUES.get(quality), language
+    if len(_elements) >= _MAX_ELEMENTS:
+        _elements.clear()
+    _elements[element] = parsed
+    return parsed
+
+
+def _parse_ranges(header):
+    """Returns the language ranges of an Accept-Language header ordered by
+    their quality value, and the ranges with a quality value of 0.
+    """
+    weighted = []
+    excluded = []
+    elements = _elements
+    for element in header.split(','):
+        parsed = elements.get(element)
+        if parsed is None:
+            parsed = _parse_element(element)
+        if parsed[0]:
+            weighted.append(parsed)
+        elif parsed[0] is not None:
+            excluded.append(parsed[1])
+    if len(weighted) > 1:
+        # The sort is stable, ties keep the order of the header
+        weighted.sort(key=itemgetter(0), reverse=True)
+    return [language for _, language in weighted], excluded
+
+
+def parse_accept_language(header):
+    """Returns the language ranges of an Accept-Language header ordered by
+    their quality value, the ranges of equal quality in the order of the
+    header.
+
+    See http://tools.ietf.org/html/rfc7231#section-5.3.5
+
+    Ranges which are not acceptable (``q=0``) are left out, as are the
+    malformed elements of the header and the ranges with a malformed
+    quality value, instead of being given some quality. The wildcard range
+    ``*`` is kept.
+
+    >>> parse_accept_language('da, en-gb;q=0.8, en;q=0.7')
+    ['da', 'en-gb', 'en']
+    >>> parse_accept_language('fr;q=0.5, *;q=0.1, de;q=0, en;q=x, 12, ')
+    ['fr', '*']
+    """
+    return _parse_ranges(header)[0]
+
+
+class _Snapshot(object):
+    """The state of a :class:`LocaleRegistry` read by the lookups. It is
+    never changed, the registry replaces it as a whole.
+    """
+    __slots__ = (
+        # The default locale code
+        'default_locale',
+        # Language -> its DomainCatalog
+        'translations',
+        # Frozenset of the supported locale codes
+        'supported',
+        # The resolution index of the supported codes
+        'index',
+        # Locale code -> Locale object
+        'locales',
+        # Changed with everything but the Locale objects, the negotiated
+        # locales cached for another version are stale
+        'version',
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    def replace(self, **changes):
+        fields = dict((name, getattr(self, name)) for name in self.__slots__)
+        fields.update(changes)
+        return _Snapshot(**fields)
+
+
+class LocaleRegistry(object):
+    """The catalogs of the languages loaded by an application and the
+    Locale objects using them.
+
+    The catalogs, the supported locales, the index the locale codes are
+    resolved with and the Locale objects are kept in a snapshot which is
+    never changed. Every change builds a new snapshot, with copies of the
+    catalogs it changes, and swaps it in at once under a lock only the
+    changes take. A Locale is looked up in the current snapshot without any
+    lock, and never sees half of a directory loaded.
+
+    The functions of this module are the methods of the
+    :data:`default_registry`. Other registries are independent of it, an
+    application serving several sites could have one for each of them::
+
+        registry = LocaleRegistry()
+        registry.load_gettext_translations('locales', 'messages')
+        registry.get('fr_FR').translate('Welcome')
+
+    :param default_locale: the default locale code, see
+                           :meth:`set_default_locale`
+    :param locale_class: the class of the Locale objects created, a
+                         subclass of :class:`Locale`
+    """
+    def __init__(self, default_locale="en_US", locale_class=None):
+        self.locale_class = locale_class or Locale
+        #: Taken to change the registry, never to read it
+        self._lock = threading.RLock()
+        self._compile_catalogs = False
+        #: Every (directory, domain, catalog_class) loaded, in order
+        self._sources = []
+        #: Languages loaded on first use ->
+        #: [(directory, domain, catalog_class)]
+        self._lazy_sources = {}
+        #: Locale eviction policy, see set_locale_eviction
+        self._max_locales = None
+        self._max_idle = None
+        self._last_used = None
+        #: Accept-Language header value -> (snapshot version, negotiated
+        #: Locale or None)
+        self._negotiation_cache = LRUCache(512)
+        supported = frozenset([default_locale])
+        self._state = _Snapshot(
+            default_locale=default_locale, translations={},
+            supported=supported, index=build_resolution_index(supported),
+            locales={}, version=object(),
+        )
+
+    def _publish(self, translations=None, default_locale=None, locales=None):
+        """Swaps in a new snapshot of the registry with the given catalogs
+        or default locale, to be called with the lock held.
+
+        The Locale objects of the languages whose catalog changed are
+        dropped, unless `locales` is given, so that those in use keep the
+        catalog they were created with.
+        """
+        state = self._state
+        if translations is None:
+            translations = state.translations
+        if default_locale is None:
+            default_locale = state.default_locale
+        if locales is None:
+            locales = {}
+            for code, locale in state.locales.iteritems():
+                if translations.get(code) is state.translations.get(code):
+                    locales[code] = locale
+        supported = frozenset(
+            self._supported_codes(translations) + [default_locale]
+        )
+        self._state = _Snapshot(
+            default_locale=default_locale, translations=translations,
+            supported=supported, index=build_resolution_index(supported),
+            locales=locales, version=object(),
+        )
+        self._negotiation_cache.clear()
+
+    def _supported_codes(self, translations):
+        """Returns the locale codes supported with the given catalogs"""
+        return translations.keys() + self._lazy_sources.keys()
+
+    def _catalogs(self):
+        """Returns the dictionary of the catalogs loaded into the registry,
+        which the loads copy, extend and hand to :meth:`_set_catalogs`.
+        """
+        return self._state.translations
+
+    def _set_catalogs(self, translations):
+        """Replaces the catalogs loaded into the registry, to be called
+        with the lock held.
+        """
+        self._publish(translations)
+
+    @property
+    def default_locale(self):
+        return self._state.default_locale
+
+    @property
+    def translations(self):
+        """The dictionary of the language -> its catalog. It is a snapshot
+        which must not be changed.
+        """
+        return self._state.translations
+
+    @property
+    def supported_locales(self):
+        """The frozenset of the supported locale codes"""
+        return self._state.supported
+
+    @property
+    def resolution_index(self):
+        """The index of the supported locale codes, see
+        :func:`build_resolution_index`
+        """
+        return self._state.index
+
+    @property
+    def sources(self):
+        """The ``(directory, domain, catalog_class)`` loaded, in order"""
+        return list(self._sources)
+
+    def get_closest(self, *locale_codes):
+        """Returns the closest match for the given locale codes.
+
+        We iterate over all given locale codes in order. If we have a tight
+        or a loose match for the code (e.g., "en" for "en_US"), we return
+        the locale. Otherwise we move to the next code in the list.
+
+        By default we return en_US if no translations are found for any of
+        the specified locales. You can change the default locale with
+        set_default_locale() below.
+        """
+        state = self._state
+        for code in locale_codes:
+            if not code:
+                continue
+            supported = resolve_locale_code(code, state.index)
+            if supported is not None:
+                return self.get(supported)
+        if _stats is not None:
+            _stats.incr('locale.fallbacks')
+        return self.get(state.default_locale)
+
+    def get(self, code):
+        """Returns the Locale for the given supported locale code."""
+        locale = self._state.locales.get(code)
+        if _stats is not None:
+            if locale is None:
+                _stats.incr('locale.cache_misses')
             else:
-                _translations[lang] = translation
-                
-        except Exception, e:
-            logging.error("Cannot load translation for '%s': %s", lang, str(e))
-            continue
-    _supported_locales = frozenset(_translations.keys() + [_default_locale])
-    _use_gettext = True
-    logging.info("Supported locales: %s", sorted(_supported_locales))
+                _stats.incr('locale.cache_hits')
+        if locale is None:
+            locale = self._create_locale(code)
+        last_used = self._last_used
+        if last_used is not None:
+            last_used[code] = time.time()
+        return locale
+
+    def _create_locale(self, code):
+        with self._lock:
+            locale = self._state.locales.get(code)
+            if locale is not None:
+                return locale
+            assert code in self._state.supported
+            # Loads the catalog of a lazy language, changing the snapshot
+            locale = self._new_locale(code)
+            state = self._state
+            locales = dict(state.locales)
+            locales[code] = locale
+            self._state = state.replace(locales=locales)
+            if self._last_used is not None and code in self._lazy_sources:
+                self._last_used[code] = time.time()
+                self.evict_locales()
+        return locale
+
+    def _new_locale(self, code):
+        """Returns a new Locale object for the given supported code"""
+        locale = self.locale_class.parse(code)
+        locale.translations = self._get_catalog(code)
+        return locale
+
+    def _get_catalog(self, code):
+        """Returns the catalog to be used by the Locale of the given code"""
+        if code in self._lazy_sources and code not in self._catalogs():
+            self._load_lazy_translations(code)
+        translations = self._state.translations.get(
+            code, gettext.NullTranslations()
+        )
+        if self._compile_catalogs:
+            return compile_catalog(translations)
+        return translations
+
+    def set_default_locale(self, code):
+        """Sets the default locale, used in get_closest_locale().
+
+        The default locale is assumed to be the language used for all
+        strings in the system. The translations loaded from disk are
+        mappings from the default locale to the destination locale.
+        Consequently, you don't need to create a translation file for the
+        default locale.
+        """
+        with self._lock:
+            self._publish(default_locale=code)
+
+    def load_gettext_translations(self, directory, domain, workers=None,
+            catalog_class=Translations, lazy=False):
+        """Loads translations from gettext's locale tree
+
+        The catalog of the domain is added to the
+        :class:`~tornadobabel.catalog.DomainCatalog` of each language, where
+        it takes precedence over the domains loaded before. Loading the same
+        directory and domain again replaces its catalog.
+
+        The catalogs are parsed without holding the lock of the registry,
+        which is only taken to install all of them at once. Locale objects
+        already in use keep the catalog they were created with.
+
+        :param directory: the root of the locale tree
+        :param domain: the message domain
+        :param workers: the number of threads used to read the catalogs
+                        of the languages concurrently. The catalogs are
+                        serially loaded if it is not specified. As the
+                        catalogs are parsed holding the GIL, this only
+                        speeds up loads waiting on slow reads, from a
+                        network filesystem for instance.
+        :param catalog_class: the class used to load the catalog of a
+                              language, babel's `Translations` by default.
+                              Use :class:`~tornadobabel.catalog.MoCatalog`
+                              to have the ``.mo`` files searched in place
+                              instead of parsed, or
+                              :class:`~tornadobabel.catalog.MappedMoCatalog`
+                              to have them memory mapped too.
+        :param lazy: if True, only the languages in the directory are
+                     registered and the catalog of a language is loaded by
+                     the first :meth:`get` for it. Such catalogs could be
+                     evicted again, see :meth:`set_locale_eviction`.
+        :return: a dictionary with the `total` time spent and the time spent
+                 on each of the `locales`, in seconds
+        """
+        started = time.time()
+        langs = []
+        source = (directory, domain, catalog_class)
+        with self._lock:
+            if source not in self._sources:
+                self._sources.append(source)
+            registered = False
+            translations = self._catalogs()
+            for lang in _list_languages(directory):
+                if lang in self._lazy_sources or \
+                        (lazy and lang not in translations):
+                    # The catalog of a lazy language is defined by its
+                    # sources, it is only loaded now if it is already in use
+                    self._lazy_sources.setdefault(lang, []).append(source)
+                    registered = True
+                    if lang not in translations:
+                        continue
+                langs.append(lang)
+            if registered:
+                self._publish()
+
+        results = _load_translations(source, langs, workers)
+        loaded = []
+        timings = {}
+        with self._lock:
+            translations = dict(self._catalogs())
+            # Merge in the order of the directory listing, as a serial load
+            # would
+            for lang, translation, elapsed, error in results:
+                timings[lang] = elapsed
+                if error is not None:
+                    logging.error(
+                        "Cannot load translation for '%s': %s",
+                        lang, str(error)
+                    )
+                    continue
+                if lang in self._lazy_sources and lang not in translations:
+                    continue  # evicted meanwhile, will be loaded when needed
+                translations[lang] = _extend_catalog(
+                    translations.get(lang), translation, source
+                )
+                loaded.append(lang)
+            self._set_catalogs(translations)
+        return self._loaded(domain, loaded, timings, started)
+
+    def load_gettext_translations_async(self, directory, domain,
+            callback=None, workers=None, catalog_class=Translations,
+            io_loop=None):
+        """Loads translations from gettext's locale tree like
+        :meth:`load_gettext_translations`, without blocking the IOLoop of a
+        running application.
+
+        The directory is scanned and the catalogs are loaded in a thread,
+        and the new catalogs of all the languages are then installed at once
+        on the IOLoop, so a request never sees some languages of the
+        directory loaded and others not. Locale objects already in use keep
+        the catalog they were created with.
+
+        Languages registered as lazy by a previous load are only registered
+        with the new source, as :meth:`load_gettext_translations` would.
+
+        It could be used with ``tornado.gen``::
+
+            result = yield gen.Task(
+                locale.load_gettext_translations_async, 'locales', 'plugin'
+            )
+
+        :param callback: called on the IOLoop with the timings returned by
+                         :meth:`load_gettext_translations` once the catalogs
+                         are installed. An error raised while loading is
+                         raised on the IOLoop, in the stack context of the
+                         caller.
+        :param io_loop: the IOLoop to install the catalogs on, the global
+                        one by default
+        """
+        io_loop = io_loop or IOLoop.instance()
+        started = time.time()
+        source = (directory, domain, catalog_class)
+        install = stack_context.wrap(partial(
+            self._install_loaded, source, started, callback
+        ))
+        fail = stack_context.wrap(_reraise)
+
+        def load():
+            try:
+                catalogs = self._catalogs()
+                langs, lazy = [], []
+                for lang in _list_languages(directory):
+                    # Lazy languages not in use only get the new source
+                    if lang in self._lazy_sources and lang not in catalogs:
+                        lazy.append(lang)
+                    else:
+                        langs.append(lang)
+                results = []
+                for lang, translation, elapsed, error in _load_translations(
+                        source, langs, workers):
+                    current = catalog = None
+                    if error is not None:
+                        logging.error(
+                            "Cannot load translation for '%s': %s",
+                            lang, str(error)
+                        )
+                        translation = None
+                    else:
+                        current = catalogs.get(lang)
+                        catalog = _extend_catalog(
+                            current, translation, source
+                        )
+                    results.append(
+                        (lang, translation, elapsed, current, catalog)
+                    )
+                io_loop.add_callback(partial(install, lazy, results))
+            except Exception:
+                io_loop.add_callback(partial(fail, sys.exc_info()))
+
+        thread = threading.Thread(target=load)
+        thread.daemon = True
+        thread.start()
+
+    def _install_loaded(self, source, started, callback, lazy, results):
+        """Installs the catalogs loaded by
+        :meth:`load_gettext_translations_async`, on the IOLoop, and
+        registers the source with the `lazy` languages which were not
+        loaded.
+        """
+        directory, domain, _ = source
+        loaded = []
+        timings = {}
+        with self._lock:
+            if source not in self._sources:
+                self._sources.append(source)
+            translations = dict(self._catalogs())
+            for lang in lazy:
+                if lang in self._lazy_sources:
+                    self._lazy_sources[lang].append(source)
+                    # Loaded meanwhile without the source, loaded again
+                    # with it when needed
+                    translations.pop(lang, None)
+            for lang, translation, elapsed, previous, catalog in results:
+                timings[lang] = elapsed
+                if lang in self._lazy_sources:
+                    self._lazy_sources[lang].append(source)
+                    if lang not in translations:
+                        continue  # evicted meanwhile
+                if translation is None:
+                    continue
+                current = translations.get(lang)
+                if current is not previous:
+                    # The catalog changed while this one was loaded
+                    catalog = _extend_catalog(current, translation, source)
+                translations[lang] = catalog
+                loaded.append(lang)
+            self._set_catalogs(translations)
+        result = self._loaded(domain, loaded, timings, started)
+        if callback is not None:
+            callback(result)
+
+    def _loaded(self, domain, loaded, timings, started):
+        """Records and logs a load, returns its timings"""
+        total = time.time() - started
+        if _stats is not None:
+            _stats.timing('load', total)
+            for elapsed in timings.itervalues():
+                _stats.timing('load.locale', elapsed)
+        logging.info("Supported locales: %s", sorted(self.supported_locales))
+        logging.info(
+            "Loaded domain '%s' for %d locales in %.3fs",
+            domain, len(loaded), total
+        )
+        return {'total': total, 'locales': timings}
+
+    def _build_translations(self, lang, sources=None):
+        """Loads a new catalog for the language from all the sources it was
+        loaded from (or the given ones), without changing the loaded
+        translations. Returns None if no catalog could be loaded.
+        """
+        translations = None
+        if sources is None:
+            sources = [
+                source for source in self.sources
+                if os.path.isdir(os.path.join(source[0], lang))
+            ]
+        for source in sources:
+            directory, domain, catalog_class = source
+            _, translation, _, error = _load_translation(
+                directory, lang, domain, catalog_class
+            )
+            if error is not None:
+                logging.error(
+                    "Cannot load translation for '%s': %s", lang, str(error)
+                )
+                continue
+            if translations is None:
+                translations = DomainCatalog()
+            _add_catalog(translations, translation, source)
+        return translations
+
+    def _install_translations(self, catalogs):
+        """Replaces the loaded catalogs of the languages by the given ones.
+        The Locale objects using the previous catalogs keep them.
+        """
+        with self._lock:
+            translations = dict(self._catalogs())
+            for lang, catalog in catalogs.iteritems():
+                if catalog is None:
+                    continue
+                if lang in self._lazy_sources and lang not in translations:
+                    continue  # evicted meanwhile, will be loaded when needed
+                translations[lang] = catalog
+            self._set_catalogs(translations)
+
+    def _load_lazy_translations(self, lang):
+        """Loads the catalog of a lazy language from all its sources"""
+        with self._lock:
+            if lang in self._catalogs():
+                return
+            started = time.time()
+            catalog = self._build_translations(lang, self._lazy_sources[lang])
+            if catalog is not None:
+                translations = dict(self._catalogs())
+                translations[lang] = catalog
+                self._set_catalogs(translations)
+            if _stats is not None:
+                _stats.timing('load.lazy', time.time() - started)
+
+    def reload_translations(self, *codes):
+        """Reloads the catalogs of the given languages from all the sources
+        they were loaded from.
+
+        Locale objects already in use keep the catalog they were created
+        with, the new catalog is used by the Locale objects created
+        afterwards.
+        """
+        catalogs = {}
+        for code in codes:
+            catalogs[code] = self._build_translations(code)
+        self._install_translations(catalogs)
+
+    def save_catalog_store(self, path):
+        """Writes the catalogs of all the loaded languages, lazy ones
+        included, to a :mod:`~tornadobabel.store` file which could be loaded
+        with :meth:`load_catalog_store`. A store could also be built from a
+        locale tree with :func:`~tornadobabel.store.build_store`, or the
+        ``tornadobabel build`` command.
+        """
+        with self._lock:
+            for lang in list(self._lazy_sources):
+                self._load_lazy_translations(lang)
+            catalogs = self.translations
+        write_store(path, catalogs)
+
+    def load_catalog_store(self, path):
+        """Replaces the loaded catalogs by the catalogs of a store file
+        written by :meth:`save_catalog_store`, which are looked up in place
+        in the file mapped read only. Opening the store is all it takes to
+        load the catalogs of every language and domain in it.
+
+        Load the store before forking the worker processes (or in each of
+        them) and the pages of the store are shared by all of them, instead
+        of every process holding its own copy of the catalogs.
+
+        :return: the :class:`~tornadobabel.store.CatalogStore`
+        """
+        store = CatalogStore(path)
+        with self._lock:
+            translations = dict(self._catalogs())
+            for lang in store.languages:
+                translations[lang] = store.catalog(lang)
+                self._lazy_sources.pop(lang, None)
+            self._set_catalogs(translations)
+        return store
+
+    def set_compiled_catalogs(self, enabled=True):
+        """Enables or disables the compiled catalog mode.
+
+        In this mode the translations of every locale, merged from all the
+        loaded domains, are flattened into a
+        :class:`~tornadobabel.catalog.CompiledCatalog` which is what
+        :meth:`Locale.translate` looks messages up in. The catalogs are
+        recompiled by every call to :meth:`load_gettext_translations`.
+        """
+        with self._lock:
+            self._compile_catalogs = enabled
+            self._publish(locales={})
+
+    def clear(self):
+        """Unloads all the catalogs and forgets the sources they were
+        loaded from. The default locale and the policies are kept.
+        """
+        with self._lock:
+            del self._sources[:]
+            self._lazy_sources.clear()
+            if self._last_used is not None:
+                self._last_used.clear()
+            self._set_catalogs({})
+
+    def set_locale_eviction(self, max_locales=None, max_idle=None):
+        """Sets the policy used to evict the catalogs of lazily loaded
+        languages (see the `lazy` argument of
+        :meth:`load_gettext_translations`) once they are not used anymore.
+        They are loaded again by the next :meth:`get` for them.
+
+        :param max_locales: the maximum number of lazy languages kept
+                            loaded, the least recently used are evicted
+                            first
+        :param max_idle: the number of seconds after which a lazy language
+                         that was not used is evicted
+
+        The policy is applied whenever a lazy language is loaded, and could
+        be applied periodically with :meth:`evict_locales`. Calling the
+        method without arguments disables the eviction.
+        """
+        with self._lock:
+            self._max_locales, self._max_idle = max_locales, max_idle
+            if max_locales is None and max_idle is None:
+                self._last_used = None
+            elif self._last_used is None:
+                self._last_used = dict.fromkeys(
+                    self._state.locales, time.time()
+                )
+
+    def evict_locales(self):
+        """Evicts the lazy languages as per :meth:`set_locale_eviction`.
+
+        :return: the codes of the evicted languages
+        """
+        last_used = self._last_used
+        if last_used is None:
+            return []
+        with self._lock:
+            translations = self._catalogs()
+            loaded = [
+                (last_used.get(code, 0), code) for code in translations
+                if code in self._lazy_sources
+            ]
+            loaded.sort()
+            evicted = []
+            if self._max_idle is not None:
+                threshold = time.time() - self._max_idle
+                while loaded and loaded[0][0] <= threshold:
+                    evicted.append(loaded.pop(0)[1])
+            max_locales = self._max_locales
+            if max_locales is not None and len(loaded) > max_locales:
+                evicted.extend(
+                    code for _, code in loaded[:-max_locales or None]
+                )
+            if evicted:
+                translations = dict(translations)
+                for code in evicted:
+                    del translations[code]
+                    last_used.pop(code, None)
+                self._set_catalogs(translations)
+        if evicted:
+            logging.info("Evicted locales: %s", sorted(evicted))
+        return evicted
+
+    def negotiate(self, header):
+        """Returns the closest Locale for the value of an Accept-Language
+        header, or None if the header does not name any locale.
+
+        The supported locale is looked up for the ranges of the header in
+        order of preference as in the lookup of RFC 4647: each range is
+        resolved by :func:`resolve_locale_code`, which drops its subtags
+        one by one until one is supported. The wildcard range ``*`` stands
+        for the default locale, and the locales of the ranges with ``q=0``
+        are never returned. The default locale is returned if none of the
+        ranges is supported.
+
+        The result is memoised per header string in a bounded LRU cache
+        whose entries are stale once the supported locales or their catalogs
+        change. Use :meth:`set_negotiation_cache_size` to change the size of
+        the cache and :meth:`get_negotiation_cache_info` to inspect it.
+        """
+        return self._negotiate(header)[0]
+
+    def negotiate_ranked(self, header):
+        """Returns the Locale negotiated for the value of an Accept-Language
+        header, see :meth:`negotiate`, and the tuple of the supported locale
+        codes the ranges of the header resolve to, most preferred first.
+
+        >>> registry = LocaleRegistry()
+        >>> registry.negotiate_ranked('de-CH, *;q=0.5, en-GB;q=0.2')
+        (<Locale "en_US">, ('en_US',))
+        """
+        return self._negotiate(header, True)
+
+    def _negotiate(self, header, ranked=False):
+        stats = _stats
+        if stats is not None:
+            started = time.time()
+        version = self._state.version
+        cache = self._negotiation_cache
+        entry = cache.get(header)
+        if entry is not None and entry[0] is version and \
+                (entry[2] or not ranked):
+            result = entry[1]
+        else:
+            result = self._lookup(header, ranked)
+            cache.set(header, (version, result, ranked))
+        if stats is not None:
+            stats.timing('negotiation', time.time() - started)
+            if result[0] is None:
+                stats.incr('negotiation.unmatched')
+        return result
+
+    def _lookup(self, header, ranked=False):
+        """Returns the Locale negotiated for an Accept-Language header and
+        the ranked supported codes, see :meth:`negotiate_ranked`. Unless
+        `ranked` is True, the ranges after the first supported one are not
+        looked up and only its code is returned.
+        """
+        ranges, excluded = _parse_ranges(header)
+        if not ranges:
+            return None, ()
+        state = self._state
+        index = state.index
+        if excluded:
+            # Only the locale a range names is excluded, not the ones it
+            # would fall back to: "fr-CH;q=0, fr" accepts fr
+            excluded = set(
+                index.get(language) or index.get(_normalise(language))
+                for language in excluded
+            )
+        codes = []
+        for language in ranges:
+            code = index.get(language)
+            if code is None:
+                if language == '*':
+                    code = state.default_locale
+                else:
+                    code = resolve_locale_code(language, index)
+            if code is not None and code not in codes and \
+                    code not in excluded:
+                codes.append(code)
+                if not ranked:
+                    break
+        if codes:
+            return self.get(codes[0]), tuple(codes)
+        if _stats is not None:
+            _stats.incr('locale.fallbacks')
+        return self.get(state.default_locale), ()
+
+    def set_negotiation_cache_size(self, size):
+        """Sets the number of Accept-Language headers for which the
+        negotiated locale is remembered. A size of 0 disables the cache.
+        """
+        self._negotiation_cache.resize(size)
+
+    def get_negotiation_cache_info(self):
+        """Returns a dictionary with the `hits`, `misses`, `maxsize` and
+        current `size` of the negotiation cache.
+        """
+        return self._negotiation_cache.info()
+
+
+class OverlayRegistry(LocaleRegistry):
+    """A registry of the messages a tenant overrides in the catalogs of a
+    base registry, for applications serving many tenants from the same
+    catalogs.
+
+    The catalogs loaded into the overlay, with
+    :meth:`~LocaleRegistry.load_gettext_translations` or
+    :meth:`add_messages`, are laid in front of the catalogs of the base
+    registry for the same language (see
+    :meth:`~tornadobabel.catalog.DomainCatalog.overlay`). The catalogs of
+    the base are shared by all its overlays instead of being copied, and
+    the overlays follow what is loaded into the base. The languages a tenant
+    does not override use the Locale objects of the base, so an overlay
+    costs only the size of its overrides::
+
+        acme = OverlayRegistry(locale.default_registry)
+        acme.add_messages('fr_FR', {u'Welcome': u'Bienvenue chez Acme'})
+        acme.load_gettext_translations('tenants/acme', 'messages')
+        acme.get('fr_FR').translate('Welcome')
+
+    :param base: the registry whose catalogs are overridden, the
+                 :data:`default_registry` by default
+    :param default_locale: the default locale code, the one of the base by
+                           default
+    :param locale_class: the class of the Locale objects created, the one
+                         of the base by default
+    """
+    def __init__(self, base=None, default_locale=None, locale_class=None):
+        self.base = base or default_registry
+        #: Language -> DomainCatalog of the catalogs loaded into the overlay
+        self._overrides = {}
+        #: The version of the snapshot of the base the overrides were laid
+        #: over
+        self._base_version = None
+        LocaleRegistry.__init__(
+            self, default_locale or self.base.default_locale,
+            locale_class or self.base.locale_class
+        )
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Lays the overrides over the current catalogs of the base, to be
+        called with the lock held.
+        """
+        base = self.base._state
+        translations = dict(base.translations)
+        for lang, overrides in self._overrides.iteritems():
+            catalog = translations.get(lang)
+            if catalog is None:
+                catalog = DomainCatalog()
+            for source, domain, translation in overrides.catalogs:
+                catalog = catalog.overlay(domain, translation, source)
+            translations[lang] = catalog
+        self._base_version = base.version
+        self._publish(translations)
+
+    def _sync(self):
+        """Lays the overrides over the catalogs of the base again if they
+        changed.
+        """
+        if self.base._state.version is not self._base_version:
+            with self._lock:
+                if self.base._state.version is not self._base_version:
+                    self._rebuild()
+
+    def _supported_codes(self, translations):
+        return LocaleRegistry._supported_codes(self, translations) + \
+            list(self.base.supported_locales)
+
+    def _catalogs(self):
+        return self._overrides
+
+    def _set_catalogs(self, translations):
+        self._overrides = translations
+        self._rebuild()
+
+    def _new_locale(self, code):
+        base = self.base
+        if code not in self._overrides and code not in self._lazy_sources \
+                and code in base.supported_locales \
+                and self.locale_class is base.locale_class \
+                and self._compile_catalogs == base._compile_catalogs:
+            # Nothing is overridden, the Locale of the base is shared
+            locale = base.get(code)
+            self._sync()
+            return locale
+        return LocaleRegistry._new_locale(self, code)
+
+    def _get_catalog(self, code):
+        if code not in self._state.translations and \
+                code in self.base.supported_locales:
+            # Loads the catalog of a lazy language of the base
+            self.base.get(code)
+            self._sync()
+        return LocaleRegistry._get_catalog(self, code)
+
+    @property
+    def translations(self):
+        """The dictionary of the language -> its catalog, the overrides laid
+        over the catalogs of the base. It is a snapshot which must not be
+        changed.
+        """
+        self._sync()
+        return self._state.translations
+
+    @property
+    def supported_locales(self):
+        self._sync()
+        return self._state.supported
+
+    @property
+    def resolution_index(self):
+        self._sync()
+        return self._state.index
+
+    def get_closest(self, *locale_codes):
+        self._sync()
+        return LocaleRegistry.get_closest(self, *locale_codes)
+
+    def get(self, code):
+        self._sync()
+        return LocaleRegistry.get(self, code)
+
+    def _negotiate(self, header, ranked=False):
+        self._sync()
+        return LocaleRegistry._negotiate(self, header, ranked)
+
+    def _build_translations(self, lang, sources=None):
+        translations = LocaleRegistry._build_translations(self, lang, sources)
+        current = self._overrides.get(lang)
+        if current is not None:
+            # Keeps the messages added with add_messages
+            for source, domain, translation in current.catalogs:
+                if source[0] is None:
+                    if translations is None:
+                        translations = DomainCatalog()
+                    translations.add(domain, translation, source)
+        return translations
+
+    def add_messages(self, code, messages, domain='overrides'):
+        """Overrides messages of a language with the messages of a
+        dictionary, which replace the ones added before for the same domain.
+
+        :param code: the locale code of the language
+        :param messages: a dictionary of the messages, see
+                         :class:`~tornadobabel.catalog.DictCatalog`
+        :param domain: the domain of the messages
+        """
+        with self._lock:
+            base = self.base.translations.get(code)
+            catalog = DictCatalog(messages, getattr(base, 'plural', None))
+            translations = dict(self._overrides)
+            translations[code] = _extend_catalog(
+                translations.get(code), catalog, (None, domain, DictCatalog)
+            )
+            self._set_catalogs(translations)
+
+
+def set_instrumentation(enabled=True, callback=None):
+    """Enables or disables the instrumentation of tornadobabel.
+
+    When enabled, the following counters and timings are recorded. They
+    can be read with :func:`get_stats`:
+
+    * ``translate.lookups`` and ``translate.misses``: messages translated by
+      a :class:`Locale` and the ones which were not found in its catalog
+      (or were translated to themselves)
+    * ``locale.fallbacks``: :meth:`Locale.get_closest` calls which returned
+      the default locale as none of the codes was supported
+    * ``locale.cache_hits`` and ``locale.cache_misses``: :meth:`Locale.get`
+      calls which found a Locale object already created or not
+    * ``negotiation.unmatched``: Accept-Language headers which did not
+      name any locale
+    * ``negotiation``, ``load``, ``load.locale`` and ``load.lazy``:
+      histograms of the time taken by :func:`negotiate`, by every call to
+      :func:`load_gettext_translations`, by the load of each of its locales
+      and by the load of each lazy locale
+
+    The values are recorded for all the registries.
+
+    Disabling the instrumentation discards the values recorded, and its
+    overhead is then a single test of a global per hook.
+
+    :param callback: a function called with ``(kind, name, value)`` for
+                     every value recorded, `kind` being ``"counter"`` or
+                     ``"timing"``, to forward them to a metrics system
+    """
+    global _stats
+    if enabled:
+        _stats = Stats(callback)
+    else:
+        _stats = None
+
+
+def _hit_rate(hits, misses):
+    if hits + misses:
+        return float(hits) / (hits + misses)
+    return None
+
+
+def get_stats():
+    """Returns a dictionary with the `counters` and `timings` recorded since
+    the instrumentation was enabled, see :func:`set_instrumentation`, and
+    the state of the `caches` of the :data:`default_registry`. The
+    dictionary is empty if the instrumentation is disabled.
+
+    Each timing is a dictionary with the `count`, `total` and `max` of the
+    durations in seconds and the `counts` of the durations below each of
+    the `buckets`, the last count being the durations above all of them.
+    """
+    if _stats is None:
+        return {}
+    stats = _stats.as_dict()
+    counters = stats['counters']
+    negotiation = default_registry.get_negotiation_cache_info()
+    negotiation['hit_rate'] = _hit_rate(
+        negotiation['hits'], negotiation['misses']
+    )
+    locales = {
+        'hits': counters.get('locale.cache_hits', 0),
+        'misses': counters.get('locale.cache_misses', 0),
+    }
+    locales['hit_rate'] = _hit_rate(locales['hits'], locales['misses'])
+    stats['caches'] = {'negotiation': negotiation, 'locale': locales}
+    return stats
+
+
+def _record_lookups(messages, results, plural=False):
+    """Counts the lookups of messages and the misses among them, the
+    results identical to the untranslated message being misses.
+    """
+    misses = 0
+    for message, result in zip(messages, results):
+        if plural:
+            msgid1, msgid2, count = message
+            message = msgid1 if count == 1 else msgid2
+        if result == message:
+            misses += 1
+    _stats.incr('translate.lookups', len(results))
+    if misses:
+        _stats.incr('translate.misses', misses)
+
+
+def _datetime_value(datetime, tzinfo):
+    """Converts the value to format like `babel.dates.format_datetime`"""
+    if datetime is None:
+        datetime = datetime_.utcnow()
+    elif isinstance(datetime, (int, long)):
+        datetime = datetime_.utcfromtimestamp(datetime)
+    elif isinstance(datetime, time_):
+        datetime = datetime_.combine(date_.today(), datetime)
+    if datetime.tzinfo is None:
+        datetime = datetime.replace(tzinfo=dates.UTC)
+    if tzinfo is not None:
+        datetime = datetime.astimezone(tzinfo)
+        if hasattr(tzinfo, 'normalize'):  # pytz
+            datetime = tzinfo.normalize(datetime)
+    return datetime
+
+
+def _date_value(date):
+    """Converts the value to format like `babel.dates.format_date`"""
+    if date is None:
+        return date_.today()
+    elif isinstance(date, datetime_):
+        return date.date()
+    return date
+
+
+def _time_value(time, tzinfo):
+    """Converts the value to format like `babel.dates.format_time`"""
+    if time is None:
+        time = datetime_.utcnow()
+    elif isinstance(time, (int, long)):
+        time = datetime_.utcfromtimestamp(time)
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=dates.UTC)
+    if isinstance(time, datetime_):
+        if tzinfo is not None:
+            time = time.astimezone(tzinfo)
+            if hasattr(tzinfo, 'normalize'):  # pytz
+                time = tzinfo.normalize(time)
+        time = time.timetz()
+    elif tzinfo is not None:
+        time = time.replace(tzinfo=tzinfo)
+    return time
 
 
 class Locale(BabelCoreLocale):
     """Object representing a locale.
 
     After calling one of `load_translations` or `load_gettext_translations`,
-    call `get` or `get_closest` to get a Locale object.
+    call `get` or `get_closest` to get a Locale object. They are the Locale
+    objects of the :data:`default_registry`, see :class:`LocaleRegistry`.
     """
+    def __init__(self, *args, **kwargs):
+        BabelCoreLocale.__init__(self, *args, **kwargs)
+        #: (kind, format) -> parsed date/time pattern, see _date_pattern
+        self._date_patterns = {}
+        #: (kind, format) -> parsed number pattern, see _number_pattern
+        self._number_patterns = {}
+
     @classmethod
     def get_closest(cls, *locale_codes):
-        """Returns the closest match for the given locale code."""
-        for code in locale_codes:
-            if not code:
-                continue
-            code = code.replace("-", "_")
-            parts = code.split("_")
-            if len(parts) > 2:
-                continue
-            elif len(parts) == 2:
-                code = parts[0].lower() + "_" + parts[1].upper()
-            if code in _supported_locales:
-                return cls.get(code)
-            if parts[0].lower() in _supported_locales:
-                return cls.get(parts[0].lower())
-        return cls.get(_default_locale)
+        """Returns the closest match for the given locale code, see
+        :meth:`LocaleRegistry.get_closest`.
+        """
+        return default_registry.get_closest(*locale_codes)
 
     @classmethod
     def get(cls, code):
@@ -119,22 +1316,100 @@ class Locale(BabelCoreLocale):
 
         If it is not supported, we raise an exception.
         """
-        if not hasattr(cls, "_cache"):
-            cls._cache = {}
-        if code not in cls._cache:
-            assert code in _supported_locales
-            translations = _translations.get(code, gettext.NullTranslations())
-            locale = cls.parse(code)
-            locale.translations = translations
-            cls._cache[code] = locale
-        return cls._cache[code]
+        return default_registry.get(code)
 
     def translate(self, message, plural_message=None, count=None):
         if plural_message is not None:
             assert count is not None
-            return self.translations.ungettext(message, plural_message, count)
+            result = self.translations.ungettext(
+                message, plural_message, count
+            )
+            if _stats is not None:
+                _record_lookups(
+                    [(message, plural_message, count)], [result], True
+                )
         else:
-            return self.translations.ugettext(message)
+            result = self.translations.ugettext(message)
+            if _stats is not None:
+                _record_lookups([message], [result])
+        return result
+
+    def dtranslate(self, domain, message, plural_message=None, count=None):
+        """Translates the message with the catalogs of the given domain
+        only, see :meth:`translate`.
+        """
+        translations = self.translations
+        if plural_message is not None:
+            assert count is not None
+            if hasattr(translations, 'dungettext'):
+                return translations.dungettext(
+                    domain, message, plural_message, count
+                )
+            return translations.ungettext(message, plural_message, count)
+        if hasattr(translations, 'dugettext'):
+            return translations.dugettext(domain, message)
+        return translations.ugettext(message)
+
+    def translate_many(self, messages):
+        """Translates many messages at once, in one pass over the catalog.
+
+        :param messages: a list of messages, or a dictionary of messages
+        :return: the list of the translations in the same order, or a
+                 dictionary with the same keys if `messages` is one
+        """
+        if isinstance(messages, dict):
+            keys = messages.keys()
+            return dict(zip(keys, self.translate_many(
+                [messages[key] for key in keys]
+            )))
+        messages = list(messages)
+        results = ugettext_many(self.translations, messages)
+        if _stats is not None:
+            _record_lookups(messages, results)
+        return results
+
+    def translate_plurals(self, messages):
+        """Translates many plural messages at once, see
+        :meth:`translate_many`.
+
+        :param messages: a list of ``(message, plural_message, count)``
+                         tuples, or a dictionary of such tuples
+        """
+        if isinstance(messages, dict):
+            keys = messages.keys()
+            return dict(zip(keys, self.translate_plurals(
+                [messages[key] for key in keys]
+            )))
+        messages = list(messages)
+        results = ungettext_many(self.translations, messages)
+        if _stats is not None:
+            _record_lookups(messages, results, True)
+        return results
+
+    def _date_pattern(self, kind, format):
+        """Returns the parsed pattern of a `kind` ("date", "time" or
+        "datetime") of format. Named formats of datetimes are returned as a
+        tuple of the datetime format, the time and the date patterns.
+        """
+        key = (kind, format)
+        try:
+            return self._date_patterns[key]
+        except KeyError:
+            pass
+        if format not in ('full', 'long', 'medium', 'short'):
+            pattern = dates.parse_pattern(format)
+        elif kind == 'date':
+            pattern = dates.parse_pattern(dates.get_date_format(format, self))
+        elif kind == 'time':
+            pattern = dates.parse_pattern(dates.get_time_format(format, self))
+        else:
+            pattern = (
+                dates.get_datetime_format(format, self),
+                self._date_pattern('time', format),
+                self._date_pattern('date', format),
+            )
+        self._date_patterns[key] = pattern
+        return pattern
 
     def format_datetime(self, datetime=None, format='medium', tzinfo=None):
         """
@@ -154,7 +1429,14 @@ class Locale(BabelCoreLocale):
         >>> locale.format_datetime(dt)
         u'01/04/2007 15:30:00'
         """
-        return dates.format_datetime(datetime, format, tzinfo, self)
+        datetime = _datetime_value(datetime, tzinfo)
+        pattern = self._date_pattern('datetime', format)
+        if isinstance(pattern, tuple):
+            datetime_format, time_pattern, date_pattern = pattern
+            return datetime_format \
+                .replace('{0}', time_pattern.apply(datetime.timetz(), self)) \
+                .replace('{1}', date_pattern.apply(datetime.date(), self))
+        return pattern.apply(datetime, self)
 
     def format_date(self, date=None, format='medium'):
         """
@@ -165,7 +1447,9 @@ class Locale(BabelCoreLocale):
         :param format: one of "full", "long", "medium", or "short", or a
                        custom date/time pattern
         """
-        return dates.format_date(date, format, self)
+        return self._date_pattern('date', format).apply(
+            _date_value(date), self
+        )
 
     def format_time(self, time=None, format='medium', tzinfo=None):
         """
@@ -177,7 +1461,33 @@ class Locale(BabelCoreLocale):
                        custom date/time pattern
         :param tzinfo: the time-zone to apply to the time for display
         """
-        return dates.format_time(time, format, tzinfo, self)
+        return self._date_pattern('time', format).apply(
+            _time_value(time, tzinfo), self
+        )
+
+    def format_datetimes(self, datetimes, format='medium', tzinfo=None):
+        """
+        Return a list of the given datetimes formatted according to the
+        given pattern, see :meth:`format_datetime`.
+        """
+        format_datetime = self.format_datetime
+        return [format_datetime(value, format, tzinfo) for value in datetimes]
+
+    def format_dates(self, dates, format='medium'):
+        """
+        Return a list of the given dates formatted according to the locale,
+        see :meth:`format_date`.
+        """
+        apply = self._date_pattern('date', format).apply
+        return [apply(_date_value(value), self) for value in dates]
+
+    def format_times(self, times, format='medium', tzinfo=None):
+        """
+        Return a list of the given times formatted according to the locale,
+        see :meth:`format_time`.
+        """
+        apply = self._date_pattern('time', format).apply
+        return [apply(_time_value(value, tzinfo), self) for value in times]
 
     def format_timedelta(self, delta, granularity='second',
                 threshold=0.84999999999999998):
@@ -195,6 +1505,156 @@ class Locale(BabelCoreLocale):
         """
         return dates.format_timedelta(delta, granularity, threshold, self)
 
+    def _number_pattern(self, kind, format=None):
+        """Returns the parsed number pattern of a `kind` ("decimal",
+        "currency", "percent" or "scientific") of format, the default format
+        of the kind in the locale if `format` is None.
+        """
+        key = (kind, format)
+        try:
+            return self._number_patterns[key]
+        except KeyError:
+            pass
+        if not format:
+            format = getattr(self, kind + '_formats').get(None)
+        pattern = numbers.parse_pattern(format)
+        self._number_patterns[key] = pattern
+        return pattern
+
+    def format_number(self, number):
+        """
+        Return the given number formatted for the locale.
+
+        >>> Locale.parse('de_DE').format_number(1099)
+        u'1.099'
+        """
+        return self._number_pattern('decimal').apply(number, self)
+
+    def format_decimal(self, number, format=None):
+        """
+        Return the given decimal number formatted for the locale.
+
+        :param number: the number to format
+        :param format: a custom number pattern, the decimal format of the
+                       locale by default
+
+        >>> Locale.parse('en_US').format_decimal(1.2345)
+        u'1.234'
+        >>> Locale.parse('en_US').format_decimal(12345, '#,##0.00')
+        u'12,345.00'
+        """
+        return self._number_pattern('decimal', format).apply(number, self)
+
+    def format_currency(self, number, currency, format=None):
+        """
+        Return the given number formatted as an amount of the currency.
+
+        :param number: the number to format
+        :param currency: the ISO 4217 code of the currency
+        :param format: a custom number pattern, the currency format of the
+                       locale by default
+
+        >>> Locale.parse('en_US').format_currency(1099.98, 'USD')
+        u'$1,099.98'
+        """
+        return self._number_pattern('currency', format).apply(
+            number, self, currency=currency
+        )
+
+    def format_percent(self, number, format=None):
+        """
+        Return the given number formatted as a percentage.
+
+        :param number: the number to format, 1 being 100%
+        :param format: a custom number pattern, the percent format of the
+                       locale by default
+
+        >>> Locale.parse('en_US').format_percent(0.34)
+        u'34%'
+        """
+        return self._number_pattern('percent', format).apply(number, self)
+
+    def format_scientific(self, number, format=None):
+        """
+        Return the given number formatted in scientific notation.
+
+        :param number: the number to format
+        :param format: a custom number pattern, the scientific format of the
+                       locale by default
+        """
+        return self._number_pattern('scientific', format).apply(number, self)
+
+    def format_decimals(self, values, format=None):
+        """
+        Return a list of the given numbers formatted for the locale, see
+        :meth:`format_decimal`. `values` could be any iterable of numbers,
+        like a list or an `array`.
+        """
+        apply = self._number_pattern('decimal', format).apply
+        return [apply(value, self) for value in values]
+
+    def format_currencies(self, values, currency, format=None):
+        """
+        Return a list of the given numbers formatted as amounts of the
+        currency, see :meth:`format_currency`.
+        """
+        apply = self._number_pattern('currency', format).apply
+        return [apply(value, self, currency) for value in values]
+
+    def format_percents(self, values, format=None):
+        """
+        Return a list of the given numbers formatted as percentages, see
+        :meth:`format_percent`.
+        """
+        apply = self._number_pattern('percent', format).apply
+        return [apply(value, self) for value in values]
+
+    def parse_number(self, string):
+        """
+        Parse a number formatted for the locale into a long integer, see
+        `babel.numbers.parse_number`.
+
+        :raise `babel.numbers.NumberFormatError`: if the string is not a
+                                                  valid number
+
+        >>> Locale.parse('de_DE').parse_number('1.099')
+        1099L
+        """
+        return numbers.parse_number(string, self)
+
+    def parse_decimal(self, string):
+        """
+        Parse a decimal number formatted for the locale into a float, see
+        `babel.numbers.parse_decimal`.
+
+        :raise `babel.numbers.NumberFormatError`: if the string is not a
+                                                  valid decimal number
+
+        >>> Locale.parse('de_DE').parse_decimal('1.099,98')
+        1099.98
+        """
+        return numbers.parse_decimal(string, self)
+
+
+#: The registry the functions of this module are the methods of
+default_registry = LocaleRegistry()
+
+get = default_registry.get_closest
+set_default_locale = default_registry.set_default_locale
+load_gettext_translations = default_registry.load_gettext_translations
+load_gettext_translations_async = \
+    default_registry.load_gettext_translations_async
+reload_translations = default_registry.reload_translations
+save_catalog_store = default_registry.save_catalog_store
+load_catalog_store = default_registry.load_catalog_store
+set_compiled_catalogs = default_registry.set_compiled_catalogs
+set_locale_eviction = default_registry.set_locale_eviction
+evict_locales = default_registry.evict_locales
+negotiate = default_registry.negotiate
+negotiate_ranked = default_registry.negotiate_ranked
+set_negotiation_cache_size = default_registry.set_negotiation_cache_size
+get_negotiation_cache_info = default_registry.get_negotiation_cache_info
+
 
 if __name__ == '__main__':
     import doctest
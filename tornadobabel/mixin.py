@@ -8,14 +8,56 @@
     :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
     :license: BSD, see LICENSE for more details.
 """
-from speaklater import is_lazy_string, make_lazy_string
+from speaklater import is_lazy_string, make_lazy_string, _LazyString
 from tornadobabel import locale
 
 
-def make_lazy_gettext(lookup_func):
+_MISSING = object()
+_NO_KWARGS = {}
+
+
+class MemoizedLazyString(_LazyString):
+    """A lazy string which calls its function with the message, and the
+    other arguments if any, only once, when its value is first needed, and
+    then keeps the value.
+
+    The message is kept apart from the other arguments, so that a string
+    without any other argument allocates no tuple or dictionary.
+
+    >>> x = MemoizedLazyString({u'Yes': u'Ja'}.get, u'Yes')
+    >>> x
+    lu'Ja'
+    """
+    __slots__ = ('_value', '_message')
+
+    def __init__(self, func, message, args=(), kwargs=_NO_KWARGS):
+        _LazyString.__init__(self, func, args, kwargs)
+        self._message = message
+        self._value = _MISSING
+
+    @property
+    def value(self):
+        value = self._value
+        if value is _MISSING:
+            value = self._value = self._func(
+                self._message, *self._args, **self._kwargs
+            )
+        return value
+
+    def __getstate__(self):
+        return self._func, self._message, self._args, self._kwargs
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+def make_lazy_gettext(lookup_func, memoize=False):
     """Creates a lazy gettext function dispatches to a gettext
     function as returned by `lookup_func`.
 
+    If `memoize` is True, the strings returned are translated only once,
+    see :class:`MemoizedLazyString`.
+
     :copyright: (c) 2010 by Armin Ronacher.
 
     Example:
@@ -29,6 +71,15 @@ def make_lazy_gettext(lookup_func):
     >>> x
     lu'Si'
     """
+    if memoize:
+        def lazy_gettext(string, *args, **kwargs):
+            if is_lazy_string(string):
+                return string
+            return MemoizedLazyString(
+                lookup_func(), string, args, kwargs or _NO_KWARGS
+            )
+        return lazy_gettext
+
     def lazy_gettext(string, *args, **kwargs):
         if is_lazy_string(string):
             return string
@@ -44,37 +95,92 @@ class TornadoBabelMixin(object):
     If your application handles locales, then you should implement the
     `get_user_locale` method.
     """
+    #: If False, :meth:`_` translates strings right away instead of
+    #: returning lazy strings
+    lazy_gettext = True
+
+    #: The :class:`~tornadobabel.locale.LocaleRegistry` the browser locale
+    #: is negotiated with, the default registry if None
+    locale_registry = None
 
     @property
     def _(self):
         """
         A helper to easily get lazy version ugettext
+
+        The function is created once per request. The lazy strings it
+        returns are translated once, with the locale of the request, and
+        are the only object allocated by a call.
+        """
+        try:
+            return self._gettext
+        except AttributeError:
+            if self.lazy_gettext:
+                self._gettext = make_lazy_gettext(
+                    self._locale_translate, memoize=True
+                )
+            else:
+                self._gettext = self.locale.translate
+            return self._gettext
+
+    def _locale_translate(self):
+        """Returns the translate method of the locale of the request, bound
+        once for all the lazy strings of the request.
+        """
+        try:
+            return self._translate
+        except AttributeError:
+            self._translate = self.locale.translate
+            return self._translate
+
+    def translate_many(self, messages):
+        """Translates a list (or a dictionary) of messages with the locale of
+        the request in one call, for example all the strings a template
+        needs. See :meth:`tornadobabel.locale.Locale.translate_many`.
+        """
+        return self.locale.translate_many(messages)
+
+    def translate_plurals(self, messages):
+        """Translates a list (or a dictionary) of ``(message,
+        plural_message, count)`` tuples with the locale of the request. See
+        :meth:`tornadobabel.locale.Locale.translate_plurals`.
+        """
+        return self.locale.translate_plurals(messages)
+
+    def get_locale_registry(self):
+        """Returns the :class:`~tornadobabel.locale.LocaleRegistry` the
+        locale of the request is looked up in, the :attr:`locale_registry`
+        of the handler or the default registry.
+
+        Override it to select the registry per request, like the
+        :class:`~tornadobabel.locale.OverlayRegistry` of a tenant, and look
+        the locale of the user up in it in `get_user_locale`::
+
+            class Handler(TornadoBabelMixin, RequestHandler):
+                def get_locale_registry(self):
+                    return tenants[self.request.host]
+
+                def get_user_locale(self):
+                    if self.current_user:
+                        return self.get_locale_registry().get_closest(
+                            self.current_user.locale
+                        )
         """
-        return make_lazy_gettext(lambda: self.locale.translate)
+        return self.locale_registry or locale.default_registry
 
     def get_browser_locale(self, default="en_US"):
         """Determines the user's locale from Accept-Language header.
 
         See http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.4
         """
+        registry = self.get_locale_registry()
         if "Accept-Language" in self.request.headers:
-            languages = self.request.headers["Accept-Language"].split(",")
-            locales = []
-            for language in languages:
-                parts = language.strip().split(";")
-                if len(parts) > 1 and parts[1].startswith("q="):
-                    try:
-                        score = float(parts[1][2:])
-                    except (ValueError, TypeError):
-                        score = 0.0
-                else:
-                    score = 1.0
-                locales.append((parts[0], score))
-            if locales:
-                locales.sort(key=lambda (l, s): s, reverse=True)
-                codes = [l[0] for l in locales]
-                return locale.get(*codes)
-        return locale.get(default)
+            _locale = registry.negotiate(
+                self.request.headers["Accept-Language"]
+            )
+            if _locale is not None:
+                return _locale
+        return registry.get_closest(default)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+    stats
+
+    Counters and timing histograms of what tornadobabel does, see
+    :func:`tornadobabel.locale.set_instrumentation`.
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+from bisect import bisect_left
+from threading import Lock
+
+
+#: Upper bounds, in seconds, of the buckets of the timing histograms
+TIMING_BUCKETS = (
+    0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0,
+)
+
+
+class Histogram(object):
+    """Counts the values below each bound of `buckets`, the last count
+    being the values above all of them.
+
+    >>> histogram = Histogram((1, 10))
+    >>> for value in (0.5, 2, 3, 20):
+    ...     histogram.add(value)
+    >>> histogram.counts, histogram.count, histogram.max
+    ([1, 2, 1], 4, 20)
+    """
+    def __init__(self, buckets=TIMING_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def as_dict(self):
+        return {
+            'buckets': self.buckets,
+            'counts': list(self.counts),
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+        }
+
+
+class Stats(object):
+    """Named counters and timing histograms.
+
+    Every value recorded is also passed to the `callback`, if any, as
+    ``callback(kind, name, value)`` where `kind` is ``"counter"`` or
+    ``"timing"``, so that they could be forwarded to a metrics system.
+
+    >>> events = []
+    >>> stats = Stats(lambda *event: events.append(event))
+    >>> stats.incr('translate.lookups', 2)
+    >>> stats.counters
+    {'translate.lookups': 2}
+    >>> events
+    [('counter', 'translate.lookups', 2)]
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.counters = {}
+        self.timings = {}
+        self._lock = Lock()
+
+    def incr(self, name, value=1):
+        """Adds `value` to the counter `name`"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback is not None:
+            self.callback('counter', name, value)
+
+    def timing(self, name, seconds):
+        """Records a duration in the histogram `name`"""
+        with self._lock:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = Histogram()
+            histogram.add(seconds)
+        if self.callback is not None:
+            self.callback('timing', name, seconds)
+
+    def as_dict(self):
+        with self._lock:
+            timings = {}
+            for name, histogram in self.timings.iteritems():
+                timings[name] = histogram.as_dict()
+            return {'counters': dict(self.counters), 'timings': timings}
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
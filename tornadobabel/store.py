@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+"""
+    store
+
+    An immutable file holding the catalogs of all the languages and domains
+    of an application, which is opened instead of parsing every ``.mo``
+    file on startup. The worker processes of a pre-forked application map it
+    read only instead of each holding its own copy of the catalogs.
+
+    The file starts with a header and an index of the catalogs, in the order
+    they take precedence in for a language, the last one first. The catalog
+    of a domain is stored as a ``.mo`` image of its messages, sorted and
+    carrying its plural rules in its header, so that it could be read in
+    place with :class:`~tornadobabel.catalog.MoFile`. Each catalog has a
+    perfect hash index of its msgids, see :func:`perfect_hash`, whose slots
+    hold the lengths and offsets in the file of the msgid and translation of
+    their message, so that a lookup reads the strings directly::
+
+        magic "TBCS", version, number of catalogs, offset of the index
+        index: (language length, language offset, domain length,
+                domain offset, catalog length, catalog offset,
+                hash offset, number of buckets, number of slots)
+        languages, domains, catalogs and their hash indexes
+        hash index: displacements of the buckets,
+                    slots: (msgid length, msgid offset,
+                            translation length, translation offset)
+
+    All the integers are unsigned 32 bits little endian ones, but the
+    displacements of the hash indexes which are signed.
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import mmap
+import os
+import struct
+import tempfile
+from zlib import adler32, crc32
+
+from tornadobabel.catalog import DomainCatalog, MoCatalog, MoFile, \
+    iter_messages
+
+
+MAGIC = 'TBCS'
+VERSION = 3
+
+_header = struct.Struct('<4sIII')
+_entry = struct.Struct('<9I')
+_signed = struct.Struct('<i')
+_slot = struct.Struct('<4I')
+
+DEFAULT_PLURAL_FORMS = 'nplurals=2; plural=(n != 1);'
+
+#: Slot of the hash index without any message
+EMPTY_SLOT = 0xffffffff
+
+#: Displacements tried for a bucket of the hash index before the table is
+#: grown
+MAX_DISPLACEMENT = 1 << 12
+
+
+def _hashes(key):
+    # adler32 alone spreads similar short strings badly, it is seeded with
+    # the crc32 of the key
+    first = crc32(key) & 0xffffffff
+    return first, adler32(key, first) & 0xffffffff
+
+
+def perfect_hash(keys):
+    """Builds a perfect hash index of byte strings, with the hash and
+    displace method: the keys are split in buckets by a first hash, and the
+    keys of each bucket are placed in the free slots of the table given by
+    a second hash and the displacement found for the bucket.
+
+    :return: the list of the displacements of the buckets and the list of
+             the index of the key in each slot, see :func:`hash_slot`
+    :raises ValueError: if some keys could not be told apart by the hashes
+
+    >>> keys = ['', 'Welcome', 'Goodbye', 'Save']
+    >>> displacements, slots = perfect_hash(keys)
+    >>> [slots[hash_slot(key, displacements, len(slots))] for key in keys]
+    [0, 1, 2, 3]
+    """
+    hashes = [_hashes(key) for key in keys]
+    for size in xrange(max(len(keys), 1), 2 * len(keys) + 16):
+        index = _place(hashes, size)
+        if index is not None:
+            return index
+    raise ValueError('The keys could not be hashed apart')
+
+
+def _place(hashes, size):
+    """Places the keys in a table of `size` slots, returns None if some
+    bucket could not be placed.
+    """
+    buckets = [[] for _ in xrange(size)]
+    for key, (first, _) in enumerate(hashes):
+        buckets[first % size].append(key)
+    order = sorted(
+        xrange(size), key=lambda bucket: len(buckets[bucket]), reverse=True
+    )
+
+    displacements = [0] * size
+    slots = [EMPTY_SLOT] * size
+    for position, bucket in enumerate(order):
+        keys = buckets[bucket]
+        if len(keys) < 2:
+            break
+        for displacement in xrange(1, MAX_DISPLACEMENT):
+            placed = set()
+            for key in keys:
+                first, second = hashes[key]
+                slot = (first + displacement * second) % size
+                if slot in placed or slots[slot] != EMPTY_SLOT:
+                    break
+                placed.add(slot)
+            else:
+                for key in keys:
+                    first, second = hashes[key]
+                    slots[(first + displacement * second) % size] = key
+                displacements[bucket] = displacement
+                break
+        else:
+            return None
+    else:
+        position = size
+
+    # The buckets of a single key point at a free slot directly
+    free = [slot for slot in xrange(size) if slots[slot] == EMPTY_SLOT]
+    for bucket in order[position:]:
+        keys = buckets[bucket]
+        if not keys:
+            break
+        slot = free.pop()
+        slots[slot] = keys[0]
+        displacements[bucket] = -slot - 1
+    return displacements, slots
+
+
+def hash_slot(key, displacements, size):
+    """Returns the slot of the table of a :func:`perfect_hash` index the
+    key would be in. A key which is not in the index could be given any
+    slot, or None.
+    """
+    first = crc32(key) & 0xffffffff
+    displacement = displacements[first % len(displacements)]
+    if displacement < 0:
+        return -displacement - 1
+    if displacement == 0:
+        return None
+    second = adler32(key, first) & 0xffffffff
+    return (first + displacement * second) % size
+
+
+def plural_forms(translations):
+    """Returns the ``Plural-Forms`` header of a catalog, or None if it is
+    not known.
+    """
+    info = getattr(translations, '_info', None)
+    if info and 'plural-forms' in info:
+        return info['plural-forms']
+    if isinstance(translations, MoCatalog):
+        for mofile in translations.files:
+            if mofile.plural_forms:
+                return mofile.plural_forms
+    for entry in getattr(translations, 'catalogs', ()):
+        # The plural of a DomainCatalog is the one of its first catalog
+        return plural_forms(entry[2])
+    source = getattr(translations, 'source', None)
+    if source is not None and source is not translations:
+        return plural_forms(source)
+    return None
+
+
+def mo_entries(translations):
+    """Returns the sorted ``(original, message)`` byte strings of the
+    ``.mo`` image of a catalog, with its messages merged from its fallbacks
+    and encoded in UTF-8.
+    """
+    chain = []
+    while translations is not None:
+        chain.append(translations)
+        translations = getattr(translations, '_fallback', None)
+
+    messages = {}
+    plurals = {}
+    for translations in reversed(chain):
+        for key, value in iter_messages(translations):
+            if isinstance(key, tuple):
+                plurals.setdefault(key[0], {})[key[1]] = value
+            elif key:
+                messages[key] = value
+    header = 'Content-Type: text/plain; charset=UTF-8\nPlural-Forms: %s\n' % (
+        plural_forms(chain[0]) or DEFAULT_PLURAL_FORMS
+    )
+
+    entries = {'': ('', header)}
+    for msgid, message in messages.iteritems():
+        msgid = msgid.encode('utf-8')
+        entries[msgid] = (msgid, message.encode('utf-8'))
+    for msgid, forms in plurals.iteritems():
+        msgid = msgid.encode('utf-8')
+        # The plural msgid is not kept by gettext, only the NUL matters
+        entries[msgid] = (msgid + '\0', '\0'.join(
+            forms.get(index, u'').encode('utf-8')
+            for index in xrange(max(forms) + 1)
+        ))
+    return [entries[key] for key in sorted(entries)]
+
+
+def mo_image(entries):
+    """Returns the ``.mo`` image of the ``(original, message)`` entries"""
+    count = len(entries)
+    originals_start = 28
+    translations_start = originals_start + 8 * count
+    strings_start = translations_start + 8 * count
+    originals, translated = [], []
+    strings = []
+    offset = strings_start
+    for original, message in entries:
+        originals.append((len(original), offset))
+        strings.append(original + '\0')
+        offset += len(original) + 1
+    for original, message in entries:
+        translated.append((len(message), offset))
+        strings.append(message + '\0')
+        offset += len(message) + 1
+
+    output = [struct.pack(
+        '<7I', MoFile.LE_MAGIC, 0, count, originals_start,
+        translations_start, 0, strings_start
+    )]
+    for pair in originals + translated:
+        output.append(struct.pack('<II', *pair))
+    output.extend(strings)
+    return ''.join(output)
+
+
+def _domain_catalogs(translations):
+    """Returns the ``(domain, catalog)`` of each catalog of a translations
+    object, in the order they were added.
+    """
+    catalogs = getattr(translations, 'catalogs', None)
+    if isinstance(catalogs, list):
+        return [(domain, catalog) for _, domain, catalog in catalogs]
+    source = getattr(translations, 'source', None)
+    if source is not None and source is not translations:
+        return _domain_catalogs(source)
+    domain = getattr(translations, 'domain', None) or 'messages'
+    return [(domain, translations)]
+
+
+def _pad(size):
+    """Returns the padding aligning an offset on 4 bytes"""
+    return '\0' * (-size % 4)
+
+
+def _hash_slots(slots, image, offset):
+    """Returns the slots of the hash index of a ``.mo`` image at `offset`
+    in the store, see :data:`_slot`. The empty slots are zeroed, only the
+    empty msgid could match them and it is always in the index.
+    """
+    count, originals, translations = struct.unpack_from('<3I', image, 8)
+    output = []
+    for index in slots:
+        if index == EMPTY_SLOT:
+            output.append(_slot.pack(0, 0, 0, 0))
+            continue
+        length, start = struct.unpack_from(
+            '<II', image, originals + 8 * index
+        )
+        translation_length, translation_start = struct.unpack_from(
+            '<II', image, translations + 8 * index
+        )
+        output.append(_slot.pack(
+            length, offset + start,
+            translation_length, offset + translation_start
+        ))
+    return ''.join(output)
+
+
+def _write(path, catalogs):
+    """Writes a store of the ``(language, domain, catalog)`` catalogs"""
+    index = []
+    data = []
+    offset = _header.size + _entry.size * len(catalogs)
+    for lang, domain, translations in catalogs:
+        lang, domain = lang.encode('ascii'), domain.encode('ascii')
+        entries = mo_entries(translations)
+        displacements, slots = perfect_hash([
+            original.split('\0')[0] for original, _ in entries
+        ])
+        names = lang + domain
+        names += _pad(offset + len(names))
+        image = mo_image(entries)
+        image += _pad(len(image))
+        lang_offset = offset
+        catalog_offset = offset + len(names)
+        hash_offset = catalog_offset + len(image)
+        index.append(_entry.pack(
+            len(lang), lang_offset, len(domain), lang_offset + len(lang),
+            len(image), catalog_offset, hash_offset, len(displacements),
+            len(slots)
+        ))
+        # Packed little endian, whatever the byte order of the host
+        hashes = struct.pack('<%di' % len(displacements), *displacements) + \
+            _hash_slots(slots, image, catalog_offset)
+        data.extend((names, image, hashes))
+        offset = hash_offset + len(hashes)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'wb') as fileobj:
+        fileobj.write(_header.pack(
+            MAGIC, VERSION, len(catalogs), _header.size
+        ))
+        fileobj.write(''.join(index))
+        fileobj.write(''.join(data))
+    os.rename(temp_path, path)
+
+
+def write_store(path, catalogs):
+    """Writes the catalogs of the languages to a store file, each of their
+    domains apart. The file is replaced atomically, so processes which
+    mapped the previous one keep reading it.
+
+    :param catalogs: a dictionary of the language code -> its catalog
+    """
+    entries = []
+    for lang in sorted(catalogs):
+        for domain, translations in _domain_catalogs(catalogs[lang]):
+            entries.append((lang, domain, translations))
+    _write(path, entries)
+
+
+def build_store(directory, path, domains=None):
+    """Compiles the ``.mo`` files of a locale tree, laid out as
+    :func:`~tornadobabel.locale.load_gettext_translations` expects it, into
+    a store file.
+
+    :param domains: the domains to compile, in the order they are loaded in
+                    (so that the last one takes precedence), all the domains
+                    in alphabetical order by default
+    :return: the number of catalogs written
+    """
+    entries = []
+    files = []
+    try:
+        for lang in sorted(os.listdir(directory)):
+            dirname = os.path.join(directory, lang, 'LC_MESSAGES')
+            if lang.startswith('.') or not os.path.isdir(dirname):
+                continue
+            names = domains
+            if names is None:
+                names = sorted(
+                    filename[:-3] for filename in os.listdir(dirname)
+                    if filename.endswith('.mo')
+                )
+            for domain in names:
+                filename = os.path.join(dirname, domain + '.mo')
+                if not os.path.isfile(filename):
+                    continue
+                mofile = MoFile(filename)
+                files.append(mofile)
+                entries.append((lang, domain, MoCatalog([mofile], domain)))
+        _write(path, entries)
+    finally:
+        for mofile in files:
+            mofile.close()
+    return len(entries)
+
+
+class IndexedMoFile(MoFile):
+    """A catalog of a store file, whose messages are looked up with its
+    perfect hash index instead of a binary search.
+    """
+    def __init__(self, filename, buffer, offset, hash_offset, buckets,
+                 slots):
+        self._displacements = hash_offset
+        self._slots = hash_offset + 4 * buckets
+        self._buckets = buckets
+        self._size = slots
+        # The images written to a store are sorted
+        MoFile.__init__(self, filename, buffer, offset, presorted=True)
+
+    def lookup(self, msgid):
+        # Unpacking a slice of the mapping is faster than unpacking the
+        # mapping itself
+        buf = self._map
+        first = crc32(msgid) & 0xffffffff
+        position = self._displacements + 4 * (first % self._buckets)
+        displacement, = _signed.unpack(buf[position:position + 4])
+        if displacement < 0:
+            slot = -displacement - 1
+        elif displacement == 0:
+            return None
+        else:
+            second = adler32(msgid, first) & 0xffffffff
+            slot = (first + displacement * second) % self._size
+        position = self._slots + 16 * slot
+        length, offset, translation_length, translation_offset = \
+            _slot.unpack(buf[position:position + 16])
+        # The msgid, or the msgid of a plural message followed by a NUL
+        size = len(msgid)
+        if length != size and (length < size or buf[offset + size] != '\0'):
+            return None
+        if buf[offset:offset + size] != msgid:
+            return None
+        return buf[translation_offset:translation_offset + translation_length]
+
+
+class IndexedMoCatalog(MoCatalog):
+    """The catalog of a single :class:`IndexedMoFile`, which looks messages
+    up in its file directly instead of searching a list of files. The
+    messages are not kept, the memory of a store is shared.
+    """
+    cache = False
+
+    def __init__(self, mofile, domain=None):
+        MoCatalog.__init__(self, [mofile], domain)
+        self._file = mofile
+
+    def find(self, message):
+        mofile = self._file
+        if isinstance(message, unicode):
+            message = message.encode(mofile.charset)
+        translation = mofile.lookup(message)
+        if translation is None or '\0' in translation:
+            return None
+        return unicode(translation, mofile.charset)
+
+
+class CatalogStore(object):
+    """A store file mapped read only. The pages of the mapping are shared
+    by all the processes mapping the file, and by the processes forked
+    after it was opened. The store must only be replaced by renaming a new
+    file over it, as :func:`build_store` does, a process whose store is
+    rewritten in place is killed by a bus error.
+
+    >>> store = CatalogStore('catalogs.store')   # doctest: +SKIP
+    >>> store.catalog('fr_FR').ugettext(u'Welcome')   # doctest: +SKIP
+    u'Bienvenue'
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fileobj:
+            self._map = mmap.mmap(
+                fileobj.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        magic, version, count, index = _header.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise IOError(0, 'Not a catalog store', path)
+        if version != VERSION:
+            raise IOError(0, 'Unsupported catalog store version', path)
+        #: (language, domain, catalog offset, hash offset, buckets, slots)
+        #: of the catalogs, in the order they were written
+        self.entries = []
+        for position in xrange(count):
+            lang_length, lang_offset, domain_length, domain_offset, _, \
+                offset, hash_offset, buckets, slots = _entry.unpack_from(
+                    self._map, index + position * _entry.size
+                )
+            self.entries.append((
+                self._map[lang_offset:lang_offset + lang_length],
+                self._map[domain_offset:domain_offset + domain_length],
+                offset, hash_offset, buckets, slots
+            ))
+
+    @property
+    def languages(self):
+        return sorted(set(entry[0] for entry in self.entries))
+
+    def catalog(self, lang):
+        """Returns a :class:`~tornadobabel.catalog.DomainCatalog` of the
+        catalogs of the domains of the language, whose messages are looked
+        up in the mapping.
+        """
+        catalog = DomainCatalog()
+        for position, entry in enumerate(self.entries):
+            if entry[0] != lang:
+                continue
+            mofile = IndexedMoFile(self.path, self._map, *entry[2:])
+            catalog.add(
+                entry[1], IndexedMoCatalog(mofile, entry[1]),
+                (self.path, position)
+            )
+        return catalog
+
+    def close(self):
+        self._map.close()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+    template
+
+    Templates compiled for a locale, with the translation of the static
+    strings in them resolved once when they are compiled instead of every
+    time they are rendered.
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import ast
+import os
+import threading
+import tokenize
+import weakref
+from StringIO import StringIO
+
+from tornado.escape import utf8, xhtml_escape
+from tornado.template import Loader, Template, _ChunkList, _Expression, \
+    _Node
+
+from tornadobabel.extract import walk
+
+
+#: Functions whose calls with a string literal are translated at compile time
+STATIC_GETTEXT_FUNCTIONS = ('_', 'gettext')
+
+#: The escape functions applied to the translated strings at compile time,
+#: by the name the ``autoescape`` setting of templates gives them
+ESCAPE_FUNCTIONS = {'xhtml_escape': xhtml_escape}
+
+
+def translate_expression(expression, translate,
+        gettext_functions=STATIC_GETTEXT_FUNCTIONS):
+    """Replaces the calls to the gettext functions with a single string
+    literal argument in a python expression by the literal of their
+    translation. The other calls are left untouched.
+
+    >>> translate_expression("_('Hello') + name", lambda s: s.upper())
+    "'HELLO' + name"
+    >>> translate_expression("_(greeting) + _('a', 'b', 2)", None)
+    "_(greeting) + _('a', 'b', 2)"
+    """
+    try:
+        tokens = list(tokenize.generate_tokens(StringIO(expression).readline))
+    except (tokenize.TokenError, IndentationError):
+        return expression
+
+    replacements = []
+    for index, token in enumerate(tokens):
+        if token[0] != tokenize.NAME or token[1] not in gettext_functions:
+            continue
+        if index and tokens[index - 1][1] == '.':
+            continue    # an attribute of some other object
+        if index + 1 >= len(tokens) or tokens[index + 1][1] != '(':
+            continue
+        end = index + 2
+        while end < len(tokens) and tokens[end][0] == tokenize.STRING:
+            end += 1
+        if end == index + 2 or end >= len(tokens) or tokens[end][1] != ')':
+            continue
+        message = ast.literal_eval(
+            ' '.join(string[1] for string in tokens[index + 2:end])
+        )
+        replacements.append(
+            (token[2], tokens[end][3], repr(translate(message)))
+        )
+
+    if not replacements:
+        return expression
+
+    # Offsets of the lines, to turn the (row, col) positions into offsets
+    offsets = [0]
+    for line in expression.splitlines(True):
+        offsets.append(offsets[-1] + len(line))
+    for (srow, scol), (erow, ecol), literal in reversed(replacements):
+        start = offsets[srow - 1] + scol
+        end = offsets[erow - 1] + ecol
+        expression = expression[:start] + literal + expression[end:]
+    return expression
+
+
+class _StaticText(_Node):
+    """The output of an expression which was evaluated, and escaped, when the
+    template was compiled.
+    """
+    def __init__(self, value, line):
+        self.value = value
+        self.line = line
+
+    def generate(self, writer):
+        writer.write_line("_append(%r)" % self.value, self.line)
+
+
+class TranslatedTemplate(Template):
+    """A template in which the static strings are translated with the given
+    locale when the template is compiled. An expression left with nothing
+    but the string literal of a translation is written out as text, escaped
+    already.
+
+    The template does not keep a reference to the locale once compiled.
+    """
+    def __init__(self, template_string, name="<string>", loader=None,
+                 locale=None, **kwargs):
+        self._translate = locale.translate if locale is not None else None
+        try:
+            super(TranslatedTemplate, self).__init__(
+                template_string, name, loader, **kwargs
+            )
+        finally:
+            self._translate = None
+
+    def _static_output(self, expression):
+        """Returns the escaped output of an expression which is a string
+        literal, or None for any other expression or when the escape
+        function is not known until the template is rendered.
+        """
+        if self.autoescape is None:
+            escape_function = None
+        elif self.autoescape in self.namespace or \
+                self.autoescape not in ESCAPE_FUNCTIONS:
+            return None
+        else:
+            escape_function = ESCAPE_FUNCTIONS[self.autoescape]
+        try:
+            value = ast.literal_eval(expression.strip())
+        except (SyntaxError, ValueError):
+            return None
+        if not isinstance(value, basestring):
+            return None
+        value = utf8(value)
+        if escape_function is not None:
+            value = utf8(escape_function(value))
+        return value
+
+    def _generate_python(self, loader, compress_whitespace):
+        if self._translate is not None:
+            for node in walk(self.file):
+                if not isinstance(node, _ChunkList):
+                    continue
+                for index, chunk in enumerate(node.chunks):
+                    # Exactly expressions, the modules subclass them
+                    if type(chunk) is not _Expression:
+                        continue
+                    chunk.expression = translate_expression(
+                        chunk.expression, self._translate
+                    )
+                    if chunk.raw:
+                        value = None
+                    else:
+                        value = self._static_output(chunk.expression)
+                    if value is not None:
+                        node.chunks[index] = _StaticText(value, chunk.line)
+        return super(TranslatedTemplate, self)._generate_python(
+            loader, compress_whitespace
+        )
+
+
+class LocaleLoader(Loader):
+    """A template loader which compiles the templates for a single locale.
+
+    Only a weak reference to the locale is kept, so that the loaders of the
+    translations a registry dropped can be forgotten.
+    """
+    def __init__(self, root_directory, locale, **kwargs):
+        super(LocaleLoader, self).__init__(root_directory, **kwargs)
+        self.locale_ref = weakref.ref(locale)
+
+    @property
+    def locale(self):
+        return self.locale_ref()
+
+    def _create_template(self, name):
+        path = os.path.join(self.root, name)
+        with open(path, "rb") as fileobj:
+            return TranslatedTemplate(
+                fileobj.read(), name=name, loader=self, locale=self.locale
+            )
+
+
+class LocalizedTemplate(object):
+    """The template returned by a :class:`TranslatingLoader`. When generated,
+    it renders the template compiled for the ``locale`` in the namespace,
+    which tornado's `RequestHandler` always provides.
+    """
+    def __init__(self, loader, name):
+        self.loader = loader
+        self.name = name
+
+    def generate(self, **kwargs):
+        locale = kwargs.get("locale")
+        if getattr(locale, "translations", None) is not None:
+            template = self.loader.for_locale(locale).load(self.name)
+        else:
+            # Not a tornadobabel locale, nothing to translate with
+            template = self.loader.untranslated.load(self.name)
+        return template.generate(**kwargs)
+
+
+class TranslatingLoader(Loader):
+    """A template loader which compiles the templates for each locale they
+    are rendered in, with the static strings already translated.
+
+    Set it as the ``template_loader`` of the application::
+
+        application = web.Application(handlers,
+            template_loader=TranslatingLoader('templates'))
+    """
+    def __init__(self, root_directory, **kwargs):
+        super(TranslatingLoader, self).__init__(root_directory, **kwargs)
+        self.loader_kwargs = kwargs
+        self.untranslated = Loader(root_directory, **kwargs)
+        self.locale_loaders = weakref.WeakKeyDictionary()
+        self.locale_lock = threading.RLock()
+
+    def _create_template(self, name):
+        return LocalizedTemplate(self, name)
+
+    def for_locale(self, locale):
+        """Returns the :class:`LocaleLoader` of the translations of the given
+        locale. Locales with the same code but translations of their own, like
+        those of the tenants of an :class:`~locale.OverlayRegistry`, each
+        get their loader, and the loader of translations which are no longer
+        used is dropped with them.
+        """
+        translations = locale.translations
+        loader = self.locale_loaders.get(translations)
+        if loader is None or loader.locale is None:
+            with self.locale_lock:
+                loader = self.locale_loaders.get(translations)
+                if loader is None:
+                    loader = LocaleLoader(
+                        self.root, locale, **self.loader_kwargs
+                    )
+                    self.locale_loaders[translations] = loader
+                elif loader.locale is None:
+                    # The locale it was made for is gone, not its translations
+                    loader.locale_ref = weakref.ref(locale)
+        return loader
+
+    def reset(self):
+        super(TranslatingLoader, self).reset()
+        self.untranslated.reset()
+        with self.locale_lock:
+            self.locale_loaders = weakref.WeakKeyDictionary()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
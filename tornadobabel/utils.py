@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+    utils
+
+    Small helpers shared by the tornadobabel modules
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+from threading import Lock
+
+
+_KEY, _VALUE, _REFERENCED = 0, 1, 2
+
+
+class LRUCache(object):
+    """A bounded mapping which discards a least recently used entry once
+    `maxsize` entries are stored. Hits and misses are counted so that the
+    effectiveness of the cache can be inspected.
+
+    The recency of the entries is approximated with the CLOCK algorithm so
+    that reading the cache takes no lock: a hit only flags its entry as
+    referenced, and the entries are kept in a ring which a hand sweeps when
+    an entry has to be evicted, giving the referenced entries a second
+    chance. Only storing an entry takes the lock. The counters are not
+    locked either, so concurrent reads could miss a few counts.
+
+    >>> cache = LRUCache(2)
+    >>> cache.set('a', 1)
+    >>> cache.set('b', 2)
+    >>> cache.get('a')
+    1
+    >>> cache.set('c', 3)
+    >>> cache.get('b') is None
+    True
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._lock = Lock()
+        self._clear()
+
+    def _clear(self):
+        # The dictionary is replaced, not cleared, for the readers without
+        # the lock
+        self._data = {}
+        # [key, value, referenced] of the entries, and the position of the
+        # next entry to consider for eviction
+        self._ring = []
+        self._hand = 0
+
+    def get(self, key, default=None):
+        """Returns the value stored for `key` and marks it as recently used.
+        """
+        link = self._data.get(key)
+        if link is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        link[_REFERENCED] = True
+        return link[_VALUE]
+
+    def set(self, key, value):
+        """Stores `value` for `key`, evicting an old entry if needed"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            data = self._data
+            link = data.get(key)
+            if link is not None:
+                link[_VALUE] = value
+                link[_REFERENCED] = True
+                return
+            link = [key, value, False]
+            ring = self._ring
+            if len(ring) < self.maxsize:
+                ring.append(link)
+            else:
+                hand = self._hand
+                while ring[hand][_REFERENCED]:
+                    ring[hand][_REFERENCED] = False
+                    hand = (hand + 1) % len(ring)
+                del data[ring[hand][_KEY]]
+                ring[hand] = link
+                self._hand = (hand + 1) % len(ring)
+            data[key] = link
+
+    def resize(self, maxsize):
+        """Changes the size of the cache, dropping all stored entries"""
+        with self._lock:
+            self.maxsize = maxsize
+            self._clear()
+
+    def clear(self):
+        """Drops all the entries, the counters are left untouched"""
+        with self._lock:
+            self._clear()
+
+    def info(self):
+        """Returns a dictionary with the counters and size of the cache"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'maxsize': self.maxsize,
+            'size': len(self._data),
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+    watcher
+
+    Reloads the translations of a running application when their ``.mo``
+    files change, without restarting it.
+
+    :copyright: (c) 2012 by Openlabs Technologies & Consulting (P) Limited
+    :license: BSD, see LICENSE for more details.
+"""
+import logging
+import os
+import threading
+from functools import partial
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from tornadobabel import locale
+from tornadobabel.catalog import DomainCatalog
+
+
+class TranslationsWatcher(object):
+    """Watches the ``.mo`` files of the translations loaded with
+    :func:`~tornadobabel.locale.load_gettext_translations`. The catalog of
+    a file which changed is loaded again and replaces the previous one in
+    the catalog of its language, and the catalog of a removed file is
+    dropped from it. The catalogs of the other files are kept as they are.
+
+    The files are polled for changes of their modification time and size
+    every `interval` milliseconds from a thread, which also loads the new
+    catalogs. The catalogs are then swapped in on the IOLoop, so nothing is
+    done on the request path and requests being served keep the catalog
+    they started with.
+
+    Example::
+
+        locale.load_gettext_translations('locales', 'messages')
+        TranslationsWatcher().start()
+        IOLoop.instance().start()
+
+    :param registry: the :class:`~tornadobabel.locale.LocaleRegistry` whose
+                     translations are watched, the default one by default
+    """
+    def __init__(self, io_loop=None, interval=1000, registry=None):
+        self.io_loop = io_loop or IOLoop.instance()
+        self.registry = registry or locale.default_registry
+        self._callback = PeriodicCallback(self.poll, interval, self.io_loop)
+        self._stats = None
+        self._checking = False
+
+    def start(self):
+        """Takes a snapshot of the files and starts watching them"""
+        self._stats = self.scan()
+        self._callback.start()
+
+    def stop(self):
+        self._callback.stop()
+
+    def scan(self):
+        """Returns a dictionary of the `(source, language, mtime, size)` of
+        every ``.mo`` file of the loaded translations, by path.
+        """
+        stats = {}
+        for source in self.registry.sources:
+            directory, domain, _ = source
+            try:
+                langs = os.listdir(directory)
+            except OSError:
+                continue
+            for lang in langs:
+                path = os.path.join(
+                    directory, lang, 'LC_MESSAGES', domain + '.mo'
+                )
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                stats[path] = (source, lang, stat.st_mtime, stat.st_size)
+        return stats
+
+    def poll(self):
+        """Checks the files for changes in a thread, unless a check is
+        already in progress.
+        """
+        if self._checking:
+            return
+        self._checking = True
+        thread = threading.Thread(target=self.check)
+        thread.daemon = True
+        thread.start()
+
+    def check(self):
+        """Loads the changed files, and schedules the installation of the
+        catalogs of their languages on the IOLoop. Only the catalogs of the
+        changed files are loaded again, the catalogs of removed files are
+        dropped.
+        """
+        try:
+            stats = self.scan()
+            changes = {}
+            for path in set(stats) | set(self._stats):
+                stat, previous = stats.get(path), self._stats.get(path)
+                if stat != previous:
+                    source, lang = (stat or previous)[:2]
+                    changes.setdefault(lang, []).append((source, stat))
+            self._stats = stats
+            catalogs = {}
+            for lang, changed in changes.iteritems():
+                current = self.registry.translations.get(lang)
+                if current is None:
+                    continue  # not loaded, nothing to reload
+                if not isinstance(current, DomainCatalog):
+                    # Not loaded from the sources alone
+                    catalogs[lang] = (
+                        current, None,
+                        self.registry._build_translations(lang)
+                    )
+                    continue
+                updates = []
+                for source, stat in changed:
+                    translation = None
+                    if stat is not None:
+                        directory, domain, catalog_class = source
+                        _, translation, _, error = locale._load_translation(
+                            directory, lang, domain, catalog_class
+                        )
+                        if error is not None:
+                            logging.error(
+                                "Cannot load translation for '%s': %s",
+                                lang, str(error)
+                            )
+                            continue
+                    updates.append((source, translation))
+                if updates:
+                    catalogs[lang] = (
+                        current, updates, self._update(current, updates)
+                    )
+            if catalogs:
+                self.io_loop.add_callback(partial(self._install, catalogs))
+        except Exception:
+            logging.error("Error checking translations", exc_info=True)
+        finally:
+            self._checking = False
+
+    def _update(self, catalog, updates):
+        """Returns a copy of a catalog in which the catalogs of the updated
+        sources are replaced, or removed for those updated with None. The
+        catalogs of the other sources are shared, not loaded again.
+        """
+        catalog = catalog.copy()
+        for source, translation in updates:
+            if translation is None:
+                catalog.remove(source)
+            else:
+                locale._add_catalog(catalog, translation, source)
+
+        # The catalog of a new file was added last, the catalogs take
+        # precedence in the order of their sources
+        sources = self.registry.sources
+        entries = sorted(catalog.catalogs, key=lambda entry: (
+            sources.index(entry[0]) if entry[0] in sources else -1
+        ))
+        if entries != catalog.catalogs:
+            catalog = DomainCatalog()
+            for source, domain, translations in entries:
+                catalog.add(domain, translations, source)
+        return catalog
+
+    def _install(self, catalogs):
+        with self.registry._lock:
+            translations = {}
+            for lang, (previous, updates, catalog) in catalogs.iteritems():
+                current = self.registry.translations.get(lang)
+                if current is None:
+                    continue  # evicted meanwhile
+                if current is not previous and updates is not None:
+                    # Loaded again meanwhile, the updates still apply
+                    catalog = self._update(current, updates)
+                translations[lang] = catalog
+            self.registry._install_translations(translations)
+        logging.info("Reloaded translations: %s", sorted(translations))